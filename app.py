@@ -1,15 +1,25 @@
 import os
 import logging
 from logging.handlers import RotatingFileHandler
-from flask import Flask
+from flask import Flask, current_app, g
 from flask_moment import Moment
 from flask_login import LoginManager
 from flask_sqlalchemy import SQLAlchemy
 from flask_migrate import Migrate
 
 from config import Config
-from models.user import User
-from models.database import init_database
+from models.user import User, configure_user_cache
+from models.api_token import ApiToken, configure_api_tokens
+from models.query_log import configure_query_log
+from services.passwords import configure_password_hasher
+from services.geocoder import configure_geocoder
+from services.dispatch import configure_dispatch
+from services.dashboard import configure_dashboard
+from services.live_board import configure_live_board
+from models.events import configure_events
+from models.database import (
+    init_database, bind_engine, configure_database, prepare_engine_options, release_db_connection
+)
 
 # --- Initialize Extensions (globally) ---
 db = SQLAlchemy()
@@ -20,23 +30,75 @@ login_manager.login_view = 'auth.login'
 
 @login_manager.user_loader
 def load_user(user_id):
-    """Flask-Login hook to load a user from the database."""
-    return User.get(user_id)
+    """Flask-Login hook; served from the user cache, and deactivated users get no session."""
+    user = User.get(user_id)
+    if user is None or not user.is_active:
+        return None
+    return user
+
+@login_manager.request_loader
+def load_user_from_request(request):
+    """
+    Bearer-token auth for API clients: one keyed hash and a cache lookup, no
+    password check. Only scope_required views accept tokens; pages and admin
+    views see an anonymous user.
+    """
+    scheme, _, token = request.headers.get('Authorization', '').partition(' ')
+    if scheme.lower() != 'bearer':
+        return None
+    view = current_app.view_functions.get(request.endpoint)
+    if not getattr(view, 'accepts_api_token', False):
+        return None
+    api_token = ApiToken.authenticate(token.strip())
+    if api_token is None:
+        return None
+    user = load_user(api_token.user_id)
+    if user is not None:
+        g.api_token = api_token
+    return user
 
 # --- App Factory ---
 def create_app(config_class=Config):
     app = Flask(__name__)
-    app.config.from_object(config_class)
+    if isinstance(config_class, dict):
+        # Tests pass a mapping of overrides on top of the base Config
+        app.config.from_object(Config)
+        app.config.from_mapping(config_class)
+    else:
+        app.config.from_object(config_class)
+    prepare_engine_options(app.config)
+    configure_query_log(threshold_ms=app.config.get('SLOW_QUERY_MS', 100), logger=app.logger)
+    configure_user_cache(max_size=app.config.get('USER_CACHE_SIZE'), ttl=app.config.get('USER_CACHE_TTL'))
+    configure_password_hasher(app.config)
+    configure_geocoder(app.config)
+    configure_dispatch(app.config)
+    configure_dashboard(app.config)
+    configure_events(app.config)
+    configure_live_board(app.config)
+    configure_api_tokens(app.config.get('API_TOKEN_SECRET') or app.config.get('SECRET_KEY'),
+                         cache_size=app.config.get('API_TOKEN_CACHE_SIZE'),
+                         cache_ttl=app.config.get('API_TOKEN_CACHE_TTL'))
 
     # Initialize extensions with the app instance
     db.init_app(app)
     migrate.init_app(app, db)
     moment.init_app(app)
     login_manager.init_app(app)
+    app.teardown_appcontext(release_db_connection)
 
-    # Create database tables if they don't exist
+    # Serve get_db_connection() from the engine's pool, then apply any
+    # pending schema migrations (a no-op once the schema is current). The
+    # schema and queries are SQLite-only, so another backend leaves the data
+    # layer on the DATABASE_PATH file
     with app.app_context():
-        init_database()
+        if db.engine.dialect.name == 'sqlite':
+            bind_engine(db.engine)
+        else:
+            app.logger.warning('SQLALCHEMY_DATABASE_URI is %s; get_db_connection() stays on SQLite at %s',
+                               db.engine.dialect.name, app.config['DATABASE_PATH'])
+            configure_database(app.config['DATABASE_PATH'],
+                               max_size=app.config.get('DATABASE_POOL_SIZE', 8) + app.config.get('DATABASE_MAX_OVERFLOW', 0))
+        init_database(sample_data=app.config.get('SEED_SAMPLE_DATA', False))
 
     # --- Register All Blueprints ---
     from auth import auth as auth_blueprint
@@ -52,6 +114,9 @@ def create_app(config_class=Config):
     app.register_blueprint(quotes_blueprint)
     # --- End Blueprint Registration ---
 
+    from commands import register_commands
+    register_commands(app)
+
     # --- Configure Logging ---
     if not app.debug and not app.testing:
         if not os.path.exists('logs'):
@@ -1,13 +1,44 @@
 # auth.py
 
-from flask import Blueprint, render_template, redirect, url_for, flash, request
-from werkzeug.security import generate_password_hash, check_password_hash
-from flask_login import login_user, logout_user, login_required
+import time
+from functools import wraps
+from flask import Blueprint, render_template, redirect, url_for, flash, request, abort, g, jsonify
+from flask_login import login_user, logout_user, login_required, current_user
 from models.user import User
 from models.database import get_db_connection
+from services.passwords import password_hasher, HasherBusy
 
 auth = Blueprint('auth', __name__)
 
+def admin_required(view):
+    """Like login_required, but also rejects non-admin users (and any API token) with a 403."""
+    @wraps(view)
+    @login_required
+    def wrapped(*args, **kwargs):
+        if g.get('api_token') is not None or not current_user.is_admin:
+            abort(403)
+        return view(*args, **kwargs)
+    return wrapped
+
+def scope_required(scope):
+    """
+    For API routes: accepts a browser session or a bearer token carrying the
+    given scope. Unauthenticated callers get a JSON 401 instead of the login page.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapped(*args, **kwargs):
+            if not current_user.is_authenticated:
+                return jsonify({'success': False, 'error': 'Authentication required.'}), 401
+            api_token = g.get('api_token')
+            if api_token is not None and not api_token.allows(scope):
+                return jsonify({'success': False, 'error': f"Token lacks the '{scope}' scope."}), 403
+            return view(*args, **kwargs)
+        # The request loader only honours bearer tokens on views marked like this
+        wrapped.accepts_api_token = True
+        return wrapped
+    return decorator
+
 @auth.route('/login')
 def login():
     return render_template('login.html')
@@ -17,14 +48,35 @@ def login_post():
     email = request.form.get('email')
     password = request.form.get('password')
     remember = True if request.form.get('remember') else False
+    start = time.perf_counter()
 
     user = User.find_by_email(email)
 
-    if not user or not check_password_hash(user.password, password):
+    try:
+        verified = bool(user) and password_hasher.verify(user.password, password)
+    except HasherBusy:
+        flash('Too many sign-ins in progress. Please try again in a moment.', 'warning')
+        return render_template('login.html'), 503
+
+    if not verified:
+        password_hasher.record_login((time.perf_counter() - start) * 1000, success=False)
         flash('Please check your login details and try again.', 'danger')
         return redirect(url_for('auth.login'))
 
+    if not user.is_active:
+        flash('This account has been deactivated.', 'danger')
+        return redirect(url_for('auth.login'))
+
+    # Upgrade hashes made with older cost settings while the plaintext is at hand
+    if password_hasher.needs_rehash(user.password):
+        try:
+            User.set_password(user.id, password_hasher.hash(password))
+            password_hasher.count('rehashed')
+        except HasherBusy:
+            pass  # Try again on a later login
+
     login_user(user, remember=remember)
+    password_hasher.record_login((time.perf_counter() - start) * 1000, success=True)
     # --- THIS IS THE CORRECTED LINE ---
     return redirect(url_for('main.dashboard'))
 
@@ -41,7 +93,11 @@ def signup_post():
         flash('Email address already exists.', 'warning')
         return redirect(url_for('auth.signup'))
 
-    hashed_password = generate_password_hash(password, method='pbkdf2:sha256')
+    try:
+        hashed_password = password_hasher.hash(password)
+    except HasherBusy:
+        flash('The server is busy. Please try again in a moment.', 'warning')
+        return render_template('signup.html'), 503
 
     conn = get_db_connection()
     conn.execute('INSERT INTO users (email, password) VALUES (?, ?)', (email, hashed_password))
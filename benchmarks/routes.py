@@ -0,0 +1,176 @@
+"""
+Route-level benchmarks for the Flask blueprints.
+
+Seeds a fresh SQLite database per dataset size, then drives each route through
+the Flask test client and reports latency percentiles, queries per request and
+peak Python memory. Results can be saved as a baseline and later runs fail when
+a route regresses past the allowed percentage.
+
+    python -m benchmarks.routes --sizes tiny,small --save benchmarks/baseline.json
+    python -m benchmarks.routes --sizes tiny,small --baseline benchmarks/baseline.json --max-regression 20
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+
+from app import create_app, db
+from models.database import get_db_connection
+from models.query_log import query_log
+from services.data_generator import generate_dataset
+
+BENCH_USER = {'email': 'bench@example.com', 'password': 'bench-password'}
+
+
+def _routes(quote_id, customer_id):
+    """(name, method, path, json body) for every benchmarked route."""
+    return [
+        ('dashboard', 'GET', '/dashboard', None),
+        ('schedule', 'GET', '/schedule', None),
+        ('customers', 'GET', '/customers', None),
+        ('inventory', 'GET', '/inventory', None),
+        ('quotes', 'GET', '/quotes', None),
+        ('quote_detail', 'GET', f'/quotes/{quote_id}', None),
+        ('api_schedule_job', 'POST', '/api/schedule-job',
+         {'customer_id': customer_id, 'job_type': 'maintenance', 'priority': 3}),
+    ]
+
+
+def build_app(size, folder, seed=42):
+    """Create an app on a database in folder seeded with the given dataset size."""
+    path = os.path.join(folder, f'{size}.db')
+    app = create_app({
+        'TESTING': True,
+        'SQLALCHEMY_DATABASE_URI': f'sqlite:///{path}',
+        'SLOW_QUERY_MS': float('inf'),
+    })
+    generate_dataset(size, seed=seed)
+    return app
+
+
+def logged_in_client(app):
+    client = app.test_client()
+    client.post('/signup', data=BENCH_USER)
+    client.post('/login', data=BENCH_USER)
+    return client
+
+
+def measure(client, method, path, body, iterations, warmup=2):
+    """Time one route; returns a dict of metrics."""
+    for _ in range(warmup):
+        client.open(path, method=method, json=body)
+
+    timings = []
+    statements = 0
+    tracemalloc.start()
+    for _ in range(iterations):
+        before = query_log.total_statements
+        start = time.perf_counter()
+        response = client.open(path, method=method, json=body)
+        timings.append((time.perf_counter() - start) * 1000)
+        statements += query_log.total_statements - before
+        if response.status_code >= 500:
+            tracemalloc.stop()
+            raise RuntimeError(f"{method} {path} returned {response.status_code}")
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    p50, p95, p99 = np.percentile(timings, [50, 95, 99])
+    return {
+        'p50_ms': round(float(p50), 3),
+        'p95_ms': round(float(p95), 3),
+        'p99_ms': round(float(p99), 3),
+        'queries_per_request': round(statements / iterations, 2),
+        'peak_memory_kb': round(peak / 1024, 1),
+    }
+
+
+def run(sizes, iterations, seed=42, routes=None):
+    """Benchmark every route at every dataset size; returns {size: {route: metrics}}."""
+    results = {}
+    for size in sizes:
+        with tempfile.TemporaryDirectory(prefix='hvac-bench-') as folder:
+            app = build_app(size, folder, seed=seed)
+            try:
+                client = logged_in_client(app)
+                with get_db_connection() as conn:
+                    quote_id = conn.execute('SELECT MAX(id) FROM quotes').fetchone()[0]
+                    customer_id = conn.execute('SELECT MIN(id) FROM customers').fetchone()[0]
+                results[size] = {}
+                for name, method, path, body in _routes(quote_id, customer_id):
+                    if routes and name not in routes:
+                        continue
+                    results[size][name] = measure(client, method, path, body, iterations)
+            finally:
+                # Let go of the database so the folder can be removed (Windows refuses open files)
+                with app.app_context():
+                    db.engine.dispose()
+    return results
+
+
+def compare(results, baseline, max_regression):
+    """List human-readable regressions of p95 latency or query count against a baseline."""
+    regressions = []
+    for size, routes in results.items():
+        for route, metrics in routes.items():
+            base = baseline.get(size, {}).get(route)
+            if not base:
+                continue
+            limit = base['p95_ms'] * (1 + max_regression / 100.0)
+            if metrics['p95_ms'] > limit:
+                regressions.append(f"{size}/{route}: p95 {metrics['p95_ms']:.1f} ms "
+                                   f"vs baseline {base['p95_ms']:.1f} ms (+{max_regression:.0f}% allowed)")
+            if metrics['queries_per_request'] > base['queries_per_request']:
+                regressions.append(f"{size}/{route}: {metrics['queries_per_request']} queries/request "
+                                   f"vs baseline {base['queries_per_request']}")
+    return regressions
+
+
+def print_report(results):
+    header = f"{'size':<8}{'route':<18}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'queries':>9}{'peak KB':>10}"
+    print(header)
+    print('-' * len(header))
+    for size, routes in results.items():
+        for route, m in routes.items():
+            print(f"{size:<8}{route:<18}{m['p50_ms']:>9.2f}{m['p95_ms']:>9.2f}{m['p99_ms']:>9.2f}"
+                  f"{m['queries_per_request']:>9.1f}{m['peak_memory_kb']:>10.1f}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--sizes', default='tiny,small', help='Comma-separated dataset sizes.')
+    parser.add_argument('--iterations', type=int, default=30)
+    parser.add_argument('--routes', help='Comma-separated subset of routes to run.')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--save', help='Write results to this JSON file as the new baseline.')
+    parser.add_argument('--baseline', help='Compare against this baseline JSON file.')
+    parser.add_argument('--max-regression', type=float, default=20.0,
+                        help='Allowed p95 slowdown in percent before failing.')
+    args = parser.parse_args(argv)
+
+    results = run(args.sizes.split(','), args.iterations, seed=args.seed,
+                  routes=args.routes.split(',') if args.routes else None)
+    print_report(results)
+
+    if args.save:
+        with open(args.save, 'w') as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+        print(f"Baseline saved to {args.save}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(results, json.load(f), args.max_regression)
+        for line in regressions:
+            print(f"REGRESSION {line}")
+        if regressions:
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,277 @@
+"""
+Scheduling simulation: replay a stream of job requests against the scheduler
+and compare strategies.
+
+A dataset is seeded once, then each strategy runs in its own process on a
+private copy of that database, so strategies see identical customers,
+technicians and existing bookings and can run side by side. Simulated day k
+is the calendar day k + 1 days from today; requests arriving that day ask for
+that day plus their lead time. The stream is either synthetic or replayed
+from the seeded job history.
+
+    python -m benchmarks.scheduling --size small --days 5
+    python -m benchmarks.scheduling --size small --source history --strategies sequential,batch --save sim.json
+"""
+import argparse
+import json
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date, timedelta
+from multiprocessing import get_context
+
+import numpy as np
+
+from app import create_app, db
+from models.availability import job_duration, working_window
+from models.database import get_db_connection
+from models.scheduler import HVACScheduler, ACTIVE_TECHNICIANS_SQL
+from services.batch_scheduler import schedule_batch
+from services.data_generator import DATASET_SIZES, JOB_TYPES, SKILLS, generate_dataset
+from services.route_optimizer import optimise_day, parse_location, route_length, route_matrix, travel_minutes
+
+# Synthetic requests per technician per simulated day
+DEFAULT_LOAD = 4
+# Share of synthetic requests that need one specific skill
+SKILLED_SHARE = 0.2
+
+SIM_DAY_JOBS_SQL = """
+    SELECT j.technician_id, j.scheduled_date, j.scheduled_time, j.job_type, j.duration_minutes, c.lat, c.lon
+    FROM jobs j
+    JOIN customers c ON c.id = j.customer_id
+    WHERE j.scheduled_date BETWEEN ? AND ? AND j.technician_id IS NOT NULL AND j.status = 'scheduled'
+    ORDER BY j.technician_id, j.scheduled_date, j.scheduled_time
+"""
+
+
+def synthetic_stream(customer_ids, days, per_day, seed=42):
+    """Requests as schedule-batch fields plus 'day' (arrival) and 'lead' (days until wanted)."""
+    rng = np.random.default_rng(seed)
+    names = [name for name, _, _ in JOB_TYPES]
+    shares = [share for _, share, _ in JOB_TYPES]
+    stream = []
+    for day in range(days):
+        for _ in range(rng.poisson(per_day)):
+            job_type = str(rng.choice(names, p=shares))
+            priority = 1 if job_type == 'emergency' else int(rng.choice([2, 3])) if job_type == 'repair' \
+                else int(rng.choice([3, 4, 5]))
+            stream.append({
+                'day': day,
+                'lead': 0 if priority <= 2 else int(rng.integers(1, 4)),
+                'customer_id': int(rng.choice(customer_ids)),
+                'job_type': job_type,
+                'priority': priority,
+                'skills': [str(rng.choice(SKILLS))] if rng.random() < SKILLED_SHARE else [],
+            })
+    return stream
+
+
+def history_stream(conn, days, today=None):
+    """The last `days` days of recorded jobs, re-requested for the same relative day."""
+    today = today or date.today()
+    first = today - timedelta(days=days)
+    rows = conn.execute("SELECT customer_id, job_type, priority, duration_minutes, required_skills, scheduled_date "
+                        "FROM jobs WHERE scheduled_date >= ? AND scheduled_date < ? ORDER BY id",
+                        (first.isoformat(), today.isoformat())).fetchall()
+    return [{
+        'day': (date.fromisoformat(row['scheduled_date']) - first).days,
+        'lead': 0,
+        'customer_id': row['customer_id'],
+        'job_type': row['job_type'],
+        # Seeded history predates priorities; emergencies were always urgent
+        'priority': 1 if row['job_type'] == 'emergency' else row['priority'] or 3,
+        'duration_minutes': row['duration_minutes'],
+        'skills': json.loads(row['required_skills'] or '[]'),
+    } for row in rows]
+
+
+def _requests(stream, start):
+    """Stream entries -> schedule-batch requests, grouped by arrival day."""
+    by_day = {}
+    for item in stream:
+        request = {key: value for key, value in item.items() if key not in ('day', 'lead')}
+        request['preferred_date'] = (start + timedelta(days=item['day'] + item['lead'])).isoformat()
+        by_day.setdefault(item['day'], []).append(request)
+    return [by_day.get(day, []) for day in range(max(by_day) + 1 if by_day else 0)]
+
+
+def _sequential(days, scheduler, depot):
+    """One auto_schedule_job call per request, in arrival order (the /api/schedule-job path)."""
+    placed = 0
+    for requests in days:
+        for r in requests:
+            try:
+                job = scheduler.auto_schedule_job(r['customer_id'], r['job_type'], r['priority'],
+                                                  r['preferred_date'], skills=r['skills'],
+                                                  duration=r.get('duration_minutes'))
+            except ValueError:
+                job = None
+            placed += job is not None
+    return placed
+
+
+def _batch(days, scheduler, depot):
+    """Each simulated day's arrivals placed together (the /api/schedule-jobs path)."""
+    return sum(schedule_batch(requests, scheduler.business_hours)['scheduled'] for requests in days if requests)
+
+
+def _batch_routes(days, scheduler, depot):
+    """Batch placement, then every booked day re-sequenced by the route optimiser."""
+    placed = _batch(days, scheduler, depot)
+    with get_db_connection() as conn:
+        booked = [row[0] for row in conn.execute(
+            "SELECT DISTINCT scheduled_date FROM jobs WHERE scheduled_date >= ? AND status = 'scheduled'",
+            (date.today().isoformat(),))]
+    for day in booked:
+        optimise_day(date.fromisoformat(day), scheduler.business_hours, depot)
+    return placed
+
+
+STRATEGIES = {
+    'sequential': _sequential,
+    'batch': _batch,
+    'batch_routes': _batch_routes,
+}
+
+
+def _day_metrics(conn, first, last, business_hours, depot):
+    """Utilisation, drive minutes and job count over [first, last] from the booked schedule."""
+    available = 0
+    technicians = conn.execute(ACTIVE_TECHNICIANS_SQL).fetchall()
+    for offset in range((last - first).days + 1):
+        for technician in technicians:
+            window = working_window(technician['availability'], first + timedelta(days=offset), business_hours)
+            available += window[1] - window[0] if window else 0
+
+    routes, booked, jobs = {}, 0, 0
+    for row in conn.execute(SIM_DAY_JOBS_SQL, (first.isoformat(), last.isoformat())):
+        booked += job_duration(row['job_type'], row['duration_minutes'])
+        jobs += 1
+        if row['lat'] is not None:
+            routes.setdefault((row['technician_id'], row['scheduled_date']), []).append((row['lat'], row['lon']))
+    km = sum(route_length(range(len(stops)), route_matrix(*zip(*stops), depot)) for stops in routes.values())
+    return booked / available if available else 0.0, float(travel_minutes(km)), jobs
+
+
+def simulate(strategy, database_path, stream, start, depot=None):
+    """Run one strategy against a database copy; returns its metrics. Runs in a pool worker."""
+    app = create_app({
+        'TESTING': True,
+        'SQLALCHEMY_DATABASE_URI': f'sqlite:///{database_path}',
+        'SLOW_QUERY_MS': float('inf'),
+    })
+    depot = depot or parse_location(app.config.get('DEPOT_LOCATION'))
+    scheduler = HVACScheduler()
+    days = _requests(stream, start)
+    with get_db_connection() as conn:
+        first_new_id = (conn.execute('SELECT MAX(id) FROM jobs').fetchone()[0] or 0) + 1
+
+    started = time.perf_counter()
+    placed = STRATEGIES[strategy](days, scheduler, depot)
+    elapsed = time.perf_counter() - started
+
+    last = start + timedelta(days=max(len(days) - 1, 0))
+    with get_db_connection() as conn:
+        utilisation, drive, jobs = _day_metrics(conn, start, last, scheduler.business_hours, depot)
+        booked = [date.fromisoformat(row[0]) for row in conn.execute(
+            'SELECT scheduled_date FROM jobs WHERE id >= ?', (first_new_id,))]
+    days_out = [(day - start).days for day in booked]
+    return {
+        'requests': len(stream),
+        'placed': placed,
+        'unplaced': len(stream) - placed,
+        'placed_per_second': round(placed / elapsed, 1) if elapsed else None,
+        'elapsed_s': round(elapsed, 3),
+        'utilisation': round(utilisation, 4),
+        'drive_minutes': round(drive, 1),
+        'drive_minutes_per_job': round(drive / jobs, 2) if jobs else None,
+        'mean_days_out': round(float(np.mean(days_out)), 2) if days_out else None,
+    }
+
+
+def _copy_database(source, target):
+    """Consistent copy, including anything still in the WAL."""
+    src, dst = sqlite3.connect(source), sqlite3.connect(target)
+    try:
+        src.backup(dst)
+    finally:
+        dst.close()
+        src.close()
+
+
+def run(strategies, size='tiny', days=5, per_day=None, source='synthetic', seed=42, workers=None):
+    """Seed once, build the request stream, run each strategy in parallel; returns {strategy: metrics}."""
+    unknown = set(strategies) - set(STRATEGIES)
+    if unknown:
+        raise ValueError(f"Unknown strategies: {', '.join(sorted(unknown))}")
+    with tempfile.TemporaryDirectory(prefix='hvac-sim-') as folder:
+        base = os.path.join(folder, 'base.db')
+        app = create_app({'TESTING': True, 'SQLALCHEMY_DATABASE_URI': f'sqlite:///{base}'})
+        try:
+            generate_dataset(size, seed=seed)
+            with get_db_connection() as conn:
+                if source == 'history':
+                    stream = history_stream(conn, days)
+                else:
+                    customer_ids = [row[0] for row in conn.execute('SELECT id FROM customers')]
+                    per_day = per_day or DEFAULT_LOAD * DATASET_SIZES[size]['technicians']
+                    stream = synthetic_stream(customer_ids, days, per_day, seed=seed)
+        finally:
+            # Let go of base.db so the folder can be removed (Windows refuses open files)
+            with app.app_context():
+                db.engine.dispose()
+
+        start = date.today() + timedelta(days=1)
+        paths = []
+        for strategy in strategies:
+            paths.append(os.path.join(folder, f'{strategy}.db'))
+            _copy_database(base, paths[-1])
+        # Spawned workers start clean instead of inheriting this process's open connections
+        with ProcessPoolExecutor(max_workers=workers or len(strategies), mp_context=get_context('spawn')) as pool:
+            futures = [pool.submit(simulate, strategy, path, stream, start)
+                       for strategy, path in zip(strategies, paths)]
+            return {strategy: future.result() for strategy, future in zip(strategies, futures)}
+
+
+def print_report(results):
+    header = (f"{'strategy':<14}{'placed':>8}{'unplaced':>10}{'jobs/s':>9}{'util %':>8}"
+              f"{'drive min':>11}{'min/job':>9}{'days out':>10}")
+    print(header)
+    print('-' * len(header))
+    for strategy, m in results.items():
+        print(f"{strategy:<14}{m['placed']:>8}{m['unplaced']:>10}{m['placed_per_second'] or 0:>9.1f}"
+              f"{m['utilisation'] * 100:>8.1f}{m['drive_minutes']:>11.0f}{m['drive_minutes_per_job'] or 0:>9.1f}"
+              f"{m['mean_days_out'] or 0:>10.2f}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--size', default='tiny', choices=list(DATASET_SIZES))
+    parser.add_argument('--days', type=int, default=5, help='Simulated days of requests.')
+    parser.add_argument('--per-day', type=int, help=f'Synthetic requests per day (default: '
+                                                    f'{DEFAULT_LOAD} per technician).')
+    parser.add_argument('--source', choices=['synthetic', 'history'], default='synthetic')
+    parser.add_argument('--strategies', default=','.join(STRATEGIES), help='Comma-separated strategies.')
+    parser.add_argument('--workers', type=int, help='Pool size (default: one per strategy).')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--save', help='Write results to this JSON file.')
+    args = parser.parse_args(argv)
+
+    try:
+        results = run(args.strategies.split(','), size=args.size, days=args.days, per_day=args.per_day,
+                      source=args.source, seed=args.seed, workers=args.workers)
+    except ValueError as e:
+        parser.error(str(e))
+    print_report(results)
+    if args.save:
+        with open(args.save, 'w') as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+        print(f"Results saved to {args.save}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,153 @@
+import csv
+import importlib
+import json
+import time
+from datetime import date, timedelta
+
+import click
+from flask import current_app
+
+from models.api_token import API_SCOPES, ApiToken
+from models.user import User
+from models.database import find_full_scans, get_db_connection, rebuild_daily_job_stats, QUERY_REGISTRY
+from models.scheduler import HVACScheduler
+from services.data_generator import DATASET_SIZES, generate_dataset
+from services.route_optimizer import optimise_day, parse_location
+from services.geocoder import geocoder
+from services.batch_scheduler import schedule_batch
+
+# Modules that register hot queries but are not imported by the web app itself
+QUERY_MODULES = ['services.followup_system']
+
+
+@click.command('check-query-plans')
+def check_query_plans_command():
+    """Fail if any registered hot query falls back to a full table scan."""
+    for module in QUERY_MODULES:
+        try:
+            importlib.import_module(module)
+        except ImportError as e:
+            click.echo(f"Skipping {module}: {e}")
+
+    offenders = find_full_scans()
+    for name, plan in offenders.items():
+        click.echo(f"FULL SCAN in {name}:")
+        for line in plan:
+            click.echo(f"    {line}")
+    if offenders:
+        raise SystemExit(1)
+    click.echo(f"All {len(QUERY_REGISTRY)} registered queries use indexes.")
+
+
+@click.command('seed-data')
+@click.option('--size', type=click.Choice(list(DATASET_SIZES)), default='small', show_default=True)
+@click.option('--customers', type=int, help='Override the preset customer count.')
+@click.option('--technicians', type=int, help='Override the preset technician count.')
+@click.option('--jobs', type=int, help='Override the preset job count.')
+@click.option('--quotes', type=int, help='Override the preset quote count.')
+@click.option('--parts', type=int, help='Override the preset part count.')
+@click.option('--years', type=int, default=3, show_default=True, help='Years of job history.')
+@click.option('--seed', type=int, default=42, show_default=True)
+@click.option('--force', is_flag=True, help='Seed even if the database already has customers.')
+def seed_data_command(size, customers, technicians, jobs, quotes, parts, years, seed, force):
+    """Fill the database with a reproducible synthetic dataset for benchmarking."""
+    with get_db_connection() as conn:
+        existing = conn.execute('SELECT COUNT(id) FROM customers').fetchone()[0]
+    if existing and not force:
+        raise click.ClickException(f"Database already has {existing} customers; pass --force to add more.")
+
+    start = time.perf_counter()
+    counts = generate_dataset(size, seed=seed, years=years, customers=customers, technicians=technicians,
+                              jobs=jobs, quotes=quotes, parts=parts)
+    elapsed = time.perf_counter() - start
+    click.echo(', '.join(f"{count} {table}" for table, count in counts.items()) + f" in {elapsed:.1f}s")
+
+
+@click.command('rebuild-rollups')
+def rebuild_rollups_command():
+    """Recompute daily_job_stats from the jobs table (for backfills and repairs)."""
+    start = time.perf_counter()
+    with get_db_connection() as conn:
+        conn.execute('BEGIN IMMEDIATE')
+        rows = rebuild_daily_job_stats(conn.cursor())
+    click.echo(f"Rebuilt daily_job_stats: {rows} rows in {time.perf_counter() - start:.2f}s")
+
+
+@click.command('create-api-token')
+@click.option('--email', required=True, help='User the token acts as.')
+@click.option('--name', required=True, help='Label, e.g. the device or integration.')
+@click.option('--scope', 'scopes', multiple=True, required=True, type=click.Choice(API_SCOPES))
+@click.option('--days', type=int, help='Expire after this many days (default: never).')
+def create_api_token_command(email, name, scopes, days):
+    """Mint a bearer token; it is shown once and only its hash is stored."""
+    user = User.find_by_email(email)
+    if user is None:
+        raise click.ClickException(f"No user with email {email}")
+    token, token_id = ApiToken.create(user.id, name, scopes, expires_in_days=days)
+    click.echo(f"Token {token_id} for {email} ({' '.join(sorted(scopes))}):")
+    click.echo(token)
+
+
+@click.command('revoke-api-token')
+@click.argument('token_id', type=int)
+def revoke_api_token_command(token_id):
+    """Revoke a bearer token by id."""
+    if not ApiToken.revoke(token_id):
+        raise click.ClickException(f"No token with id {token_id}")
+    click.echo(f"Revoked token {token_id}.")
+
+
+@click.command('optimize-routes')
+@click.option('--date', 'day', type=click.DateTime(formats=['%Y-%m-%d']), help='Day to optimise (default: tomorrow).')
+def optimize_routes_command(day):
+    """Re-sequence each technician's jobs for a day to cut drive time."""
+    day = day.date() if day else date.today() + timedelta(days=1)
+    result = optimise_day(day, HVACScheduler().business_hours,
+                          parse_location(current_app.config.get('DEPOT_LOCATION')))
+    optimised = sum(1 for route in result['technicians'].values() if route['optimised'])
+    click.echo(f"{result['date']}: optimised {optimised}/{len(result['technicians'])} routes, "
+               f"moved {result['jobs_moved']} jobs in {result['elapsed_ms']}ms")
+
+
+@click.command('geocode-customers')
+@click.option('--batch-size', type=int, default=1000, show_default=True)
+@click.option('--refresh', is_flag=True, help='Discard cached results and re-geocode every customer.')
+def geocode_customers_command(batch_size, refresh):
+    """Fill customer lat/lon from the local gazetteer (no network lookups)."""
+    start = time.perf_counter()
+    stats = geocoder.backfill(batch_size=batch_size, refresh=refresh)
+    click.echo(f"Located {stats['located']}/{stats['customers']} customers "
+               f"({stats['distinct_addresses']} distinct addresses) in {time.perf_counter() - start:.2f}s")
+
+
+@click.command('schedule-batch')
+@click.argument('source', type=click.File('r'))
+def schedule_batch_command(source):
+    """
+    Book many jobs in one pass from a JSON list or a CSV file with the
+    /api/schedule-job fields (skills separated by ';').
+    """
+    if source.name.endswith('.csv'):
+        requests = [{key: value for key, value in row.items() if value} for row in csv.DictReader(source)]
+    else:
+        requests = json.load(source)
+        requests = requests.get('jobs', []) if isinstance(requests, dict) else requests
+    try:
+        result = schedule_batch(requests, HVACScheduler().business_hours)
+    except ValueError as e:
+        raise click.ClickException(str(e))
+    for row in result['results']:
+        if not row['success']:
+            click.echo(f"  #{row['index']}: {row['error']}")
+    click.echo(f"Scheduled {result['scheduled']}/{len(requests)} jobs in {result['elapsed_ms']}ms")
+
+
+def register_commands(app):
+    app.cli.add_command(check_query_plans_command)
+    app.cli.add_command(seed_data_command)
+    app.cli.add_command(rebuild_rollups_command)
+    app.cli.add_command(create_api_token_command)
+    app.cli.add_command(revoke_api_token_command)
+    app.cli.add_command(optimize_routes_command)
+    app.cli.add_command(geocode_customers_command)
+    app.cli.add_command(schedule_batch_command)
@@ -11,8 +11,85 @@ class Config:
 
     # --- THIS IS THE CORRECTED LINE ---
     # Use PostgreSQL in production, fall back to SQLite for development
-    SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL') or 'sqlite:///hvac_business.db'
+    # (absolute path, so the file stays in the working directory rather than instance/)
+    DATABASE_PATH = os.environ.get('DATABASE_PATH') or os.path.join(os.getcwd(), 'hvac_business.db')
+    SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL') or 'sqlite:///' + DATABASE_PATH
     
+    # gunicorn threads per worker (the Procfile reads the same variable)
+    WEB_THREADS = int(os.environ.get('WEB_THREADS', '256'))
+
+    # Engine connection pool per worker process; also backs get_db_connection().
+    # Connections past DATABASE_POOL_SIZE are opened on demand and closed when
+    # returned; by default there is one for every thread, so no request waits
+    # on checkout
+    DATABASE_POOL_SIZE = int(os.environ.get('DATABASE_POOL_SIZE', '8'))
+    DATABASE_MAX_OVERFLOW = int(os.environ.get('DATABASE_MAX_OVERFLOW', max(WEB_THREADS - DATABASE_POOL_SIZE, 0)))
+    SQLALCHEMY_ENGINE_OPTIONS = {
+        'pool_pre_ping': True,
+        'pool_size': DATABASE_POOL_SIZE,
+        'max_overflow': DATABASE_MAX_OVERFLOW,
+        'pool_timeout': 10,
+        'pool_recycle': 1800,
+    }
+
+    # Demo customers/technicians for a fresh local database; never in production
+    SEED_SAMPLE_DATA = FLASK_ENV == 'development'
+
+    # Statements slower than this are logged with their query plan
+    SLOW_QUERY_MS = float(os.environ.get('SLOW_QUERY_MS', '100'))
+
+    # Per-process cache of session users for Flask-Login; changes made through
+    # the User helpers invalidate it, other workers catch up within the TTL
+    USER_CACHE_SIZE = int(os.environ.get('USER_CACHE_SIZE', '1024'))
+    USER_CACHE_TTL = float(os.environ.get('USER_CACHE_TTL', '60'))
+
+    # Password hashing (Werkzeug method string). Stored hashes made with other
+    # settings are upgraded on the user's next successful login.
+    PASSWORD_HASH_METHOD = os.environ.get('PASSWORD_HASH_METHOD', 'pbkdf2:sha256:600000')
+    PASSWORD_SALT_LENGTH = int(os.environ.get('PASSWORD_SALT_LENGTH', '16'))
+    # Hashing runs on a bounded thread pool so a login burst can't take every core
+    PASSWORD_HASH_WORKERS = int(os.environ.get('PASSWORD_HASH_WORKERS', '2'))
+    PASSWORD_HASH_MAX_PENDING = int(os.environ.get('PASSWORD_HASH_MAX_PENDING', '16'))
+    PASSWORD_HASH_QUEUE_TIMEOUT = float(os.environ.get('PASSWORD_HASH_QUEUE_TIMEOUT', '5'))
+
+    # API bearer tokens are stored as HMAC-SHA256 under this key (defaults to
+    # SECRET_KEY; rotating it invalidates every issued token)
+    API_TOKEN_SECRET = os.environ.get('API_TOKEN_SECRET')
+    API_TOKEN_CACHE_SIZE = int(os.environ.get('API_TOKEN_CACHE_SIZE', '4096'))
+    API_TOKEN_CACHE_TTL = float(os.environ.get('API_TOKEN_CACHE_TTL', '60'))
+
+    # Where technicians start and end the day, as "lat,lon"; without it routes
+    # are optimised as open paths from the first job to the last
+    DEPOT_LOCATION = os.environ.get('DEPOT_LOCATION')
+
+    # Street/ZIP/town centroid CSV for offline geocoding (default: the
+    # bundled services/data/gazetteer.csv)
+    GAZETTEER_PATH = os.environ.get('GAZETTEER_PATH')
+
+    # Emergency dispatch: a routine job may be bumped when no qualified
+    # technician can be on site within this many minutes
+    DISPATCH_PREEMPT_AFTER_MINUTES = int(os.environ.get('DISPATCH_PREEMPT_AFTER_MINUTES', '60'))
+    # Calls placed per write transaction, and how many may wait before 503s
+    DISPATCH_BATCH_SIZE = int(os.environ.get('DISPATCH_BATCH_SIZE', '50'))
+    DISPATCH_MAX_PENDING = int(os.environ.get('DISPATCH_MAX_PENDING', '1000'))
+
+    # Seconds a cached dashboard stays valid while no job changes; job writes
+    # invalidate it immediately
+    DASHBOARD_CACHE_TTL = float(os.environ.get('DASHBOARD_CACHE_TTL', '30'))
+
+    # Mixed into every ETag, so browsers drop pages rendered by an older release
+    ETAG_RELEASE = os.environ.get('RELEASE_VERSION') or os.environ.get('HEROKU_RELEASE_VERSION', '')
+
+    # Live dispatch board (server-sent events). Each open stream parks one
+    # worker thread, so keep EVENT_STREAM_MAX_CLIENTS below the thread count
+    # gunicorn runs with; streams close after EVENT_STREAM_MAX_SECONDS and the
+    # browser resumes from the last event id it saw
+    EVENT_STREAM_MAX_CLIENTS = int(os.environ.get('EVENT_STREAM_MAX_CLIENTS', '200'))
+    EVENT_STREAM_MAX_SECONDS = float(os.environ.get('EVENT_STREAM_MAX_SECONDS', '300'))
+    EVENT_HISTORY = int(os.environ.get('EVENT_HISTORY', '1000'))
+    # How often the board checks for job changes made by other workers
+    BOARD_POLL_SECONDS = float(os.environ.get('BOARD_POLL_SECONDS', '5'))
+
     # Optional: silence a deprecation warning
     SQLALCHEMY_TRACK_MODIFICATIONS = False
     
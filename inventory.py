@@ -1,18 +1,47 @@
 
-from flask import Blueprint, render_template, request, redirect, url_for, flash
+from flask import Blueprint, render_template, request, redirect, url_for, flash, abort
 from flask_login import login_required
-from models.database import get_db_connection
+from models.database import get_db_connection, register_query
+from models.http_cache import not_modified, table_etag, with_etag
+from models.pagination import decode_cursor, page_size, paginate
+
+LIST_PARTS_SQL = register_query('list_parts', """
+    SELECT * FROM parts
+    ORDER BY name, id
+    LIMIT ?
+""")
+
+LIST_PARTS_AFTER_SQL = register_query('list_parts_after', """
+    SELECT * FROM parts
+    WHERE (name, id) > (?, ?)
+    ORDER BY name, id
+    LIMIT ?
+""")
 
 inventory = Blueprint('inventory', __name__)
 
 @inventory.route('/inventory')
 @login_required
 def list_parts():
-    """Displays a list of all parts in inventory."""
+    """Displays one page of inventory, ordered by part name."""
+    limit = page_size(request.args.get('per_page'))
+    try:
+        after = decode_cursor(request.args.get('cursor'), 2)
+    except ValueError:
+        abort(400)
+    etag = table_etag(('parts',), after, limit)
+    cached = not_modified(etag)
+    if cached is not None:
+        return cached
     conn = get_db_connection()
-    parts = conn.execute('SELECT * FROM parts ORDER BY name').fetchall()
+    if after is None:
+        rows = conn.execute(LIST_PARTS_SQL, (limit + 1,)).fetchall()
+    else:
+        rows = conn.execute(LIST_PARTS_AFTER_SQL, (*after, limit + 1)).fetchall()
     conn.close()
-    return render_template('inventory/list.html', parts=parts)
+    parts, next_cursor = paginate(rows, limit, key=lambda part: (part['name'], part['id']))
+    return with_etag(render_template('inventory/list.html', parts=parts, next_cursor=next_cursor,
+                                     first_page=after is None, filters={'per_page': limit}), etag)
 
 @inventory.route('/inventory/add', methods=['GET', 'POST'])
 @login_required
@@ -1,11 +1,22 @@
 
 from flask import (
-    Blueprint, render_template, redirect, url_for, request, jsonify, flash
+    Blueprint, render_template, redirect, url_for, request, jsonify, flash, current_app, Response, abort
 )
 from flask_login import login_required, current_user
 from datetime import datetime
-from models.scheduler import HVACScheduler
-from services.data_analyzer import CustomerDataAnalyzer
+from models.scheduler import HVACScheduler, job_list_fields
+from models.http_cache import table_etag, not_modified, with_etag
+from models.query_log import query_log
+from models.pagination import page_size
+from auth import admin_required, scope_required
+from services.passwords import password_hasher
+from services.route_optimizer import optimise_day, parse_location
+from services.geocoder import geocoder
+from services.batch_scheduler import parse_request, schedule_batch
+from services.dispatch import dispatch_queue, parse_call, QueueFull
+from services.dashboard import dashboard_stats
+from services.live_board import live_board, stream
+from models.events import event_bus, BusFull
 
 main = Blueprint('main', __name__)
 
@@ -20,22 +31,13 @@ def index():
 @login_required
 def dashboard():
     """Displays the main dashboard with KPI cards and today's jobs."""
-    scheduler = HVACScheduler()
-    analyzer = CustomerDataAnalyzer()
     today_date = datetime.now().date()
-    today_jobs = scheduler.get_jobs_by_date(today_date)
-    
-    kpi_stats = {
-        'jobs_today': len(today_jobs),
-        'revenue_this_week': scheduler.get_revenue_for_current_week(),
-        'open_invoices': scheduler.get_open_invoice_count(),
-        'at_risk_customers': len(analyzer.identify_at_risk_customers())
-    }
+    stats = dashboard_stats.get(today_date)
     
     return render_template(
         'dashboard.html', 
-        jobs=today_jobs, 
-        kpi_stats=kpi_stats, 
+        jobs=stats['jobs'], 
+        kpi_stats=stats['kpis'], 
         today=today_date
     )
 # --- END MISSING ROUTE ---
@@ -45,31 +47,267 @@ def dashboard():
 def schedule():
     """Renders the scheduling page."""
     scheduler = HVACScheduler()
-    customers = scheduler.get_all_customers()
     technicians = scheduler.get_all_technicians()
-    return render_template('schedule.html', customers=customers, technicians=technicians)
+    return render_template('schedule.html', technicians=technicians)
 
-@main.route('/api/schedule-job', methods=['POST'])
+@main.route('/customers')
+@login_required
+def customers():
+    """Displays one page of customers, ordered by name."""
+    limit = page_size(request.args.get('per_page'))
+    cursor = request.args.get('cursor')
+    try:
+        page, next_cursor = HVACScheduler().get_customers_page(cursor, limit=limit)
+    except ValueError:
+        abort(400)
+    return render_template('customers.html', customers=page, next_cursor=next_cursor,
+                           first_page=not cursor, filters={'per_page': limit})
+
+@main.route('/customers/add', methods=['POST'])
 @login_required
+def add_customer():
+    form_data = request.form
+    location = geocoder.geocode(form_data.get('address')) if form_data.get('address') else None
+    HVACScheduler().add_customer(form_data['name'], form_data.get('phone'), form_data.get('email'),
+                                 form_data.get('address'), form_data.get('notes'), location=location)
+    flash(f"Customer '{form_data['name']}' added successfully!", 'success')
+    return redirect(url_for('main.customers'))
+
+@main.route('/api/customers/search')
+@scope_required('customers:read')
+def search_customers():
+    """Typeahead endpoint: prefix search over customers, capped at 50 results."""
+    limit = max(1, min(request.args.get('limit', 10, type=int), 50))
+    results = HVACScheduler().search_customers(request.args.get('q', ''), limit=limit)
+    return jsonify({'results': results})
+
+@main.route('/api/schedule-job', methods=['POST'])
+@scope_required('jobs:write')
 def schedule_job():
     """API endpoint for scheduling a new job."""
-    data = request.json
-    if not data.get('customer_id'):
+    data = request.json or {}
+    if not isinstance(data, dict) or not data.get('customer_id'):
         return jsonify({'success': False, 'error': 'A customer must be selected.'}), 400
+    try:
+        job_request = parse_request(data)
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
 
     scheduler = HVACScheduler()
     try:
         job = scheduler.auto_schedule_job(
-            customer_id=data['customer_id'],
-            job_type=data['job_type'],
-            priority=data.get('priority', 3),
-            preferred_date=data.get('preferred_date'),
-            notes=data.get('notes', '')
+            customer_id=job_request['customer_id'],
+            job_type=job_request['job_type'],
+            priority=job_request['priority'],
+            preferred_date=job_request['preferred_date'],
+            notes=job_request['notes'],
+            skills=sorted(job_request['skills']),
+            duration=job_request['duration']
         )
         if job:
-            flash(f"Job #{job.get('id')} scheduled successfully!", 'success')
-            return jsonify({'success': True})
+            flash(f"Job #{job['id']} scheduled with {job['technician_name']} on "
+                  f"{job['scheduled_date']} at {job['scheduled_time']}.", 'success')
+            return jsonify({'success': True, 'job': job})
         else:
             return jsonify({'success': False, 'error': 'No available slots found.'}), 400
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
+
+@main.route('/api/schedule-jobs', methods=['POST'])
+@scope_required('jobs:write')
+def schedule_jobs():
+    """Book a list of jobs together (same fields as /api/schedule-job); results are in request order."""
+    jobs = (request.json or {}).get('jobs')
+    if not isinstance(jobs, list) or not jobs:
+        return jsonify({'success': False, 'error': 'jobs must be a non-empty list.'}), 400
+    try:
+        result = schedule_batch(jobs, HVACScheduler().business_hours)
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+    return jsonify({'success': True, **result})
+
+@main.route('/api/dispatch', methods=['POST'])
+@scope_required('jobs:write')
+def dispatch_call():
+    """Queue an emergency call; waits briefly for the dispatcher, else returns 202 and a ticket to poll."""
+    data = request.json or {}
+    try:
+        call = parse_call(data)
+        ticket = dispatch_queue.submit(call)
+    except (TypeError, ValueError) as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+    except QueueFull:
+        return jsonify({'success': False, 'error': 'Dispatch queue is full; try again shortly.'}), 503
+    wait = min(max(request.args.get('wait', 5, type=float), 0), 30)
+    result = ticket.wait(wait)
+    return jsonify({'success': True, **ticket.as_dict()}), 200 if result is not None else 202
+
+@main.route('/api/dispatch/<ticket_id>')
+@scope_required('jobs:read')
+def dispatch_status(ticket_id):
+    """The outcome of a queued emergency call."""
+    ticket = dispatch_queue.get(ticket_id)
+    if ticket is None:
+        return jsonify({'success': False, 'error': 'Unknown ticket.'}), 404
+    return jsonify({'success': True, **ticket.as_dict()})
+
+@main.route('/api/schedule/windows')
+@scope_required('jobs:read')
+def open_windows():
+    """The first n open slots on a date across qualified technicians."""
+    try:
+        day = datetime.strptime(request.args.get('date', ''), '%Y-%m-%d').date()
+    except ValueError:
+        return jsonify({'success': False, 'error': 'date must be YYYY-MM-DD.'}), 400
+    n = max(1, min(request.args.get('n', 5, type=int), 50))
+    skills = [s for s in request.args.get('skills', '').split(',') if s]
+    windows = HVACScheduler().find_open_windows(day, request.args.get('job_type', 'maintenance'), n=n,
+                                                skills=skills, duration=request.args.get('duration_minutes', type=int))
+    return jsonify({'success': True, 'windows': windows})
+
+@main.route('/api/jobs')
+@scope_required('jobs:read')
+def list_jobs():
+    """
+    Jobs scheduled between date_from and date_to (default today), optionally
+    for one technician and some statuses. fields= picks the columns returned;
+    pages follow next_cursor, and If-None-Match gets a 304 while nothing changed.
+    """
+    args = request.args
+    today = datetime.now().date()
+    try:
+        date_from = datetime.strptime(args['date_from'], '%Y-%m-%d').date() if args.get('date_from') else today
+        date_to = datetime.strptime(args['date_to'], '%Y-%m-%d').date() if args.get('date_to') else date_from
+        fields, tables = job_list_fields([f for f in args.get('fields', '').split(',') if f])
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+    if date_to < date_from:
+        return jsonify({'success': False, 'error': 'date_to is before date_from.'}), 400
+    technician_id = args.get('technician_id', type=int)
+    statuses = [s for s in args.get('status', '').split(',') if s]
+    limit = page_size(args.get('per_page'))
+    cursor = args.get('cursor')
+
+    # Checked before any job is read, so an unchanged page costs only the version lookups
+    etag = table_etag(tables, date_from, date_to, fields, technician_id, statuses, cursor, limit)
+    cached = not_modified(etag, page=False)
+    if cached is not None:
+        return cached
+    try:
+        jobs, next_cursor = HVACScheduler().list_jobs(date_from, date_to, fields, technician_id, statuses,
+                                                      cursor, limit)
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+    return with_etag(jsonify({'success': True, 'jobs': jobs, 'next_cursor': next_cursor}), etag)
+
+@main.route('/api/jobs/<int:job_id>/move', methods=['POST'])
+@scope_required('jobs:write')
+def move_job(job_id):
+    """Move a scheduled job to another date/time (and optionally technician)."""
+    data = request.json or {}
+    try:
+        day = datetime.strptime(data.get('scheduled_date', ''), '%Y-%m-%d').date()
+        moved = HVACScheduler().move_job(job_id, day, data['scheduled_time'], data.get('technician_id'))
+    except (KeyError, ValueError) as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+    if not moved:
+        return jsonify({'success': False, 'error': 'That slot is already booked.'}), 409
+    return jsonify({'success': True})
+
+@main.route('/api/jobs/<int:job_id>/cancel', methods=['POST'])
+@scope_required('jobs:write')
+def cancel_job(job_id):
+    if not HVACScheduler().cancel_job(job_id):
+        return jsonify({'success': False, 'error': 'Job is not scheduled.'}), 404
+    return jsonify({'success': True})
+
+@main.route('/api/jobs/<int:job_id>/status', methods=['POST'])
+@scope_required('jobs:write')
+def set_job_status(job_id):
+    """Set a job's status (in_progress, completed, no_show, ...)."""
+    try:
+        found = HVACScheduler().set_job_status(job_id, (request.json or {}).get('status'))
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+    if not found:
+        return jsonify({'success': False, 'error': 'Unknown job.'}), 404
+    return jsonify({'success': True})
+
+@main.route('/api/events')
+@scope_required('jobs:read')
+def event_stream():
+    """Server-sent events: job changes plus board rows and KPI deltas for the live dispatch board."""
+    last_event_id = request.headers.get('Last-Event-ID') or request.args.get('last_event_id')
+    try:
+        subscription = event_bus.subscribe(last_event_id)
+    except BusFull:
+        return jsonify({'success': False, 'error': 'Too many open event streams.'}), 503, {'Retry-After': '10'}
+    live_board.ensure_started()
+    # Fresh connections start from a full snapshot; reconnects replay what they missed
+    try:
+        first = None if last_event_id else live_board.snapshot()
+    except Exception:
+        subscription.close()
+        raise
+    body = stream(subscription, first, max_seconds=current_app.config.get('EVENT_STREAM_MAX_SECONDS', 300))
+    return Response(body, mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+@main.route('/api/technicians/<int:technician_id>/unavailable', methods=['POST'])
+@scope_required('jobs:write')
+def mark_technician_unavailable(technician_id):
+    """Block a technician for part or all of a day and re-place the jobs that overlap it."""
+    data = request.json or {}
+    try:
+        day = datetime.strptime(data.get('date', ''), '%Y-%m-%d').date()
+        result = HVACScheduler().mark_unavailable(technician_id, day, data.get('start_time'),
+                                                  data.get('end_time'), data.get('reason'))
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+    return jsonify({'success': True, **result})
+
+@main.route('/api/routes/optimize', methods=['POST'])
+@scope_required('jobs:write')
+def optimize_routes():
+    """Re-sequence every technician's jobs on a date to cut drive time."""
+    data = request.json or {}
+    try:
+        day = datetime.strptime(data.get('date', ''), '%Y-%m-%d').date()
+    except ValueError:
+        return jsonify({'success': False, 'error': 'date must be YYYY-MM-DD.'}), 400
+    result = optimise_day(day, HVACScheduler().business_hours,
+                          parse_location(current_app.config.get('DEPOT_LOCATION')))
+    return jsonify({'success': True, **result})
+
+@main.route('/admin/slow-queries')
+@admin_required
+def slow_queries():
+    """Top-N statements from the query log, slowest first."""
+    limit = max(1, min(request.args.get('limit', 20, type=int), 200))
+    order_by = request.args.get('order_by', 'max_ms')
+    if order_by not in ('max_ms', 'total_ms', 'mean_ms', 'p95_ms', 'count'):
+        return jsonify({'success': False, 'error': 'Unsupported order_by.'}), 400
+    return jsonify({
+        'threshold_ms': query_log.threshold_ms,
+        'statements': query_log.top(limit, order_by=order_by),
+    })
+
+@main.route('/admin/login-metrics')
+@admin_required
+def login_metrics():
+    """Login latency, hash timings and outcome counters for this process."""
+    return jsonify(password_hasher.metrics())
+
+@main.route('/admin/dispatch-metrics')
+@admin_required
+def dispatch_metrics():
+    """Dispatch queue depth, outcome counters and call latency for this process."""
+    return jsonify(dispatch_queue.metrics())
+
+@main.route('/admin/event-metrics')
+@admin_required
+def event_metrics():
+    """Open event streams and published/lagged counters for this process."""
+    return jsonify(event_bus.metrics())
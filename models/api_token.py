@@ -0,0 +1,107 @@
+import hashlib
+import hmac
+import secrets
+from datetime import datetime, timedelta
+
+from models.cache import TTLCache
+from models.database import get_db_connection, register_query
+
+API_SCOPES = ('customers:read', 'jobs:read', 'jobs:write')
+TOKEN_PREFIX = 'hvac_'
+
+TOKEN_BY_HASH_SQL = register_query('api_token_by_hash', """
+    SELECT id, user_id, scopes, expires_at FROM api_tokens
+    WHERE token_hash = ? AND revoked_at IS NULL
+""")
+
+# Resolved tokens keyed by their hash. Revocation through ApiToken.revoke()
+# drops the local entry at once; other processes catch up within the TTL.
+token_cache = TTLCache(max_size=4096, ttl=60.0)
+
+_hash_key = None
+
+
+def configure_api_tokens(secret, cache_size=None, cache_ttl=None):
+    """Set the HMAC key tokens are stored under (tokens minted with another key stop working)."""
+    global _hash_key
+    if secret:
+        _hash_key = secret.encode() if isinstance(secret, str) else secret
+    token_cache.configure(max_size=cache_size, ttl=cache_ttl)
+
+
+def hash_token(token):
+    # Tokens are 256-bit random values, so one keyed SHA-256 is enough; no
+    # slow KDF is needed and a leaked table is useless without the key
+    if _hash_key is None:
+        raise RuntimeError('API tokens are not configured; call configure_api_tokens() first.')
+    return hmac.new(_hash_key, token.encode(), hashlib.sha256).hexdigest()
+
+
+class ApiToken:
+    def __init__(self, id, user_id, scopes, expires_at=None):
+        self.id = id
+        self.user_id = user_id
+        self.scopes = frozenset(scopes)
+        self.expires_at = expires_at
+
+    def allows(self, scope):
+        return scope in self.scopes
+
+    @property
+    def expired(self):
+        return self.expires_at is not None and self.expires_at <= datetime.now()
+
+    @staticmethod
+    def create(user_id, name, scopes, expires_in_days=None):
+        """Mint a token; returns (plaintext, token_id). The plaintext is never stored."""
+        unknown = set(scopes) - set(API_SCOPES)
+        if unknown:
+            raise ValueError(f"Unknown scopes: {', '.join(sorted(unknown))}")
+        token = TOKEN_PREFIX + secrets.token_urlsafe(32)
+        expires_at = None
+        if expires_in_days:
+            expires_at = (datetime.now() + timedelta(days=expires_in_days)).strftime('%Y-%m-%d %H:%M:%S')
+
+        conn = get_db_connection()
+        cursor = conn.cursor()
+        cursor.execute(
+            "INSERT INTO api_tokens (user_id, name, token_hash, token_hint, scopes, expires_at) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            (user_id, name, hash_token(token), token[-4:], ' '.join(sorted(set(scopes))), expires_at)
+        )
+        conn.commit()
+        conn.close()
+        return token, cursor.lastrowid
+
+    @staticmethod
+    def _load(token_hash):
+        conn = get_db_connection()
+        row = conn.execute(TOKEN_BY_HASH_SQL, (token_hash,)).fetchone()
+        conn.close()
+        if row is None:
+            return None
+        expires_at = datetime.strptime(row['expires_at'], '%Y-%m-%d %H:%M:%S') if row['expires_at'] else None
+        return ApiToken(row['id'], row['user_id'], row['scopes'].split(), expires_at)
+
+    @staticmethod
+    def authenticate(token):
+        """The live ApiToken for a presented bearer token, or None."""
+        if _hash_key is None or not token or not token.startswith(TOKEN_PREFIX):
+            return None
+        api_token = token_cache.get_or_load(hash_token(token), ApiToken._load)
+        if api_token is None or api_token.expired:
+            return None
+        return api_token
+
+    @staticmethod
+    def revoke(token_id):
+        conn = get_db_connection()
+        row = conn.execute('SELECT token_hash FROM api_tokens WHERE id = ?', (token_id,)).fetchone()
+        if row is None:
+            conn.close()
+            return False
+        conn.execute("UPDATE api_tokens SET revoked_at = CURRENT_TIMESTAMP WHERE id = ?", (token_id,))
+        conn.commit()
+        conn.close()
+        token_cache.invalidate(row['token_hash'])
+        return True
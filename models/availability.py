@@ -0,0 +1,343 @@
+"""
+In-memory technician availability for the auto-scheduler.
+
+Each day is a DaySlots: every technician's working hours minus the jobs
+already booked, as 15-minute slot bitmaps. Days are built from one indexed
+query and then updated in place as jobs are booked, moved or cancelled, so
+placing a job never rescans the jobs table. A cached day is shared by
+every request thread, so its methods hold the day's lock, and callers that
+make several changes as one (release then re-occupy) hold it around them.
+"""
+import functools
+import json
+import threading
+import time
+from datetime import date as date_cls
+
+import numpy as np
+
+SLOT_MINUTES = 15
+SLOTS_PER_DAY = 24 * 60 // SLOT_MINUTES
+WEEKDAYS = ('mon', 'tue', 'wed', 'thu', 'fri', 'sat', 'sun')
+
+# Expected on-site time per job type, in minutes
+JOB_DURATIONS = {
+    'maintenance': 60,
+    'inspection': 60,
+    'quote': 60,
+    'repair': 120,
+    'electrical': 120,
+    'emergency': 120,
+    'installation': 240,
+}
+DEFAULT_DURATION = 90
+
+# Job start windows for customers' preferred_time values
+PREFERRED_WINDOWS = {
+    'morning': (8 * 60, 12 * 60),
+    'afternoon': (12 * 60, 17 * 60),
+    'evening': (17 * 60, 20 * 60),
+}
+
+# Statuses that no longer occupy a technician's time
+INACTIVE_STATUSES = ('cancelled', 'no_show')
+
+
+def parse_hhmm(value):
+    hours, minutes = str(value).split(':')[:2]
+    return int(hours) * 60 + int(minutes)
+
+
+def format_hhmm(minutes):
+    return f"{minutes // 60:02d}:{minutes % 60:02d}"
+
+
+def ceil_slot(minutes):
+    return int(-(-minutes // SLOT_MINUTES) * SLOT_MINUTES)
+
+
+def job_duration(job_type, duration=None):
+    if duration:
+        return ceil_slot(int(duration))
+    return JOB_DURATIONS.get(job_type, DEFAULT_DURATION)
+
+
+def working_window(availability, day, business_hours):
+    """
+    (start, end) minutes a technician works on a date, clipped to business hours,
+    or None for a day off. Technicians without availability work business days.
+    """
+    open_at, close_at = business_hours['start'] * 60, business_hours['end'] * 60
+    try:
+        weekly = json.loads(availability) if availability else {}
+    except ValueError:
+        weekly = {}
+    weekday = WEEKDAYS[day.weekday()]
+    if not weekly:
+        return (open_at, close_at) if day.weekday() < 5 else None
+    hours = weekly.get(weekday)
+    if not hours:
+        return None
+    start, end = max(parse_hhmm(hours[0]), open_at), min(parse_hhmm(hours[1]), close_at)
+    return (start, end) if start < end else None
+
+
+def preferred_windows(preferred_time):
+    """Start windows from a customer's preferred_time JSON list; [] means any time."""
+    try:
+        names = json.loads(preferred_time) if preferred_time else []
+    except ValueError:
+        return []
+    return sorted(PREFERRED_WINDOWS[name] for name in names if name in PREFERRED_WINDOWS)
+
+
+def slot_range(start, end):
+    """Slots covering [start, end) minutes: (first slot, slot count)."""
+    first = start // SLOT_MINUTES
+    return first, max(ceil_slot(end) // SLOT_MINUTES - first, 1)
+
+
+def slot_mask(first, count):
+    return ((1 << count) - 1) << first
+
+
+def _locked(method):
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        with self.lock:
+            return method(self, *args, **kwargs)
+    return wrapper
+
+
+class DaySlots:
+    """
+    Free/busy 15-minute slots for every technician on one day.
+
+    Each technician has a packed integer of free slots (bit i = slot i), so a
+    conflict check is a single AND, plus a row in a boolean matrix that the
+    window search scans for all technicians at once. Per-slot booking counts
+    keep releases exact even where legacy jobs overlap; every update rewrites
+    only the affected technician's row. lock is re-entrant: hold it to make
+    several calls atomic.
+    """
+    def __init__(self, windows):
+        """windows: {technician_id: (start, end) working minutes}."""
+        self.lock = threading.RLock()
+        self.technician_ids = list(windows)
+        self.rows = {tid: i for i, tid in enumerate(self.technician_ids)}
+        self.working = np.zeros((len(windows), SLOTS_PER_DAY), dtype=bool)
+        for i, (start, end) in enumerate(windows.values()):
+            self.working[i, start // SLOT_MINUTES:end // SLOT_MINUTES] = True
+        self.bookings = np.zeros(self.working.shape, dtype=np.int16)
+        self.free = self.working.copy()
+        self.free_bits = [self._pack(row) for row in self.free]
+
+    @staticmethod
+    def _pack(row):
+        return int.from_bytes(np.packbits(row, bitorder='little').tobytes(), 'little')
+
+    def _refresh(self, i):
+        self.free[i] = self.working[i] & (self.bookings[i] == 0)
+        self.free_bits[i] = self._pack(self.free[i])
+
+    def __contains__(self, technician_id):
+        return technician_id in self.rows
+
+    @_locked
+    def booked_slots(self, technician_id):
+        i = self.rows[technician_id]
+        return int(np.count_nonzero(self.working[i] & ~self.free[i]))
+
+    @_locked
+    def is_free(self, technician_id, start, end):
+        i = self.rows.get(technician_id)
+        if i is None:
+            return False
+        mask = slot_mask(*slot_range(start, end))
+        return self.free_bits[i] & mask == mask
+
+    @_locked
+    def occupy(self, technician_id, start, end):
+        """Mark [start, end) booked whether or not it was free (loading existing jobs)."""
+        i = self.rows.get(technician_id)
+        if i is not None:
+            first, count = slot_range(start, end)
+            self.bookings[i, first:first + count] += 1
+            self._refresh(i)
+
+    @_locked
+    def block(self, technician_id, start, end):
+        """Take [start, end) out of a technician's working time (sick calls, time off)."""
+        i = self.rows.get(technician_id)
+        if i is not None:
+            first, count = slot_range(start, end)
+            self.working[i, first:first + count] = False
+            self._refresh(i)
+
+    @_locked
+    def reserve(self, technician_id, start, end):
+        """Book [start, end) if it is entirely free; returns whether it was."""
+        if not self.is_free(technician_id, start, end):
+            return False
+        self.occupy(technician_id, start, end)
+        return True
+
+    @_locked
+    def release(self, technician_id, start, end):
+        """Undo occupy()/reserve(), e.g. when a job is cancelled."""
+        i = self.rows.get(technician_id)
+        if i is not None:
+            first, count = slot_range(start, end)
+            cells = self.bookings[i, first:first + count]
+            np.maximum(cells - 1, 0, out=cells)
+            self._refresh(i)
+
+    @staticmethod
+    def _starts(width, windows=None, earliest=0):
+        """Mask of start slots inside windows (default any time) and not before earliest."""
+        allowed = np.zeros(width, dtype=bool)
+        for low, high in windows or ((0, 24 * 60),):
+            allowed[ceil_slot(low) // SLOT_MINUTES:-(-high // SLOT_MINUTES)] = True
+        allowed[:ceil_slot(earliest) // SLOT_MINUTES] = False
+        return allowed
+
+    def _fits(self, rows, duration, earliest, windows):
+        """fits[r, s]: duration minutes are free from slot s for row r, within the allowed starts."""
+        count = -(-duration // SLOT_MINUTES)
+        if not rows or count > SLOTS_PER_DAY:
+            return None
+        # A run of count free slots starts at s where the free count over [s, s + count) is count
+        free = np.zeros((len(rows), SLOTS_PER_DAY + 1), dtype=np.int16)
+        np.cumsum(self.free[rows], axis=1, out=free[:, 1:])
+        fits = free[:, count:] - free[:, :-count] == count
+        return fits & self._starts(fits.shape[1], windows, earliest)
+
+    def _rows(self, technician_ids):
+        return [self.rows[t] for t in (technician_ids if technician_ids is not None else self.technician_ids)
+                if t in self.rows]
+
+    @_locked
+    def first_windows(self, duration, n=1, earliest=0, windows=None, technician_ids=None):
+        """
+        Up to n (start minute, technician_id) pairs where duration minutes are free,
+        earliest first and then lightest day first, across the given technicians
+        (default all). Starts are limited to >= earliest and, if given, to windows.
+        """
+        rows = self._rows(technician_ids)
+        fits = self._fits(rows, duration, earliest, windows)
+        if fits is None:
+            return []
+        row_idx, slot_idx = np.nonzero(fits)
+        if not len(slot_idx):
+            return []
+        load = (self.working[rows] & ~self.free[rows]).sum(axis=1)
+        order = np.lexsort((load[row_idx], slot_idx))[:n]
+        return [(int(slot_idx[k]) * SLOT_MINUTES, self.technician_ids[rows[row_idx[k]]]) for k in order]
+
+    @_locked
+    def earliest_fits(self, duration, earliest=0, windows=None, technician_ids=None):
+        """
+        {technician_id: (start minute, booked minutes, in_window)} for technicians
+        with room: their earliest start inside windows if any, else their earliest start.
+        """
+        rows = self._rows(technician_ids)
+        fits = self._fits(rows, duration, earliest, None)
+        if fits is None:
+            return {}
+        preferred = fits & self._starts(fits.shape[1], windows) if windows else fits
+        in_window = preferred.any(axis=1)
+        first = np.where(in_window, preferred.argmax(axis=1), fits.argmax(axis=1))
+        load = (self.working[rows] & ~self.free[rows]).sum(axis=1) * SLOT_MINUTES
+        return {self.technician_ids[rows[k]]: (int(first[k]) * SLOT_MINUTES, int(load[k]), bool(in_window[k]))
+                for k in np.flatnonzero(fits.any(axis=1))}
+
+    @_locked
+    def closest_fit(self, duration, target, earliest=0, windows=None, technician_ids=None):
+        """
+        (start minute, technician_id) of the free start nearest to target minutes,
+        ties going to the lighter day, or None. Used to re-home a job near its old time.
+        """
+        rows = self._rows(technician_ids)
+        fits = self._fits(rows, duration, earliest, windows)
+        if fits is None or not fits.any():
+            return None
+        load = (self.working[rows] & ~self.free[rows]).sum(axis=1)
+        distance = np.abs(np.arange(fits.shape[1]) * SLOT_MINUTES - target)[None, :] + load[:, None] / (SLOTS_PER_DAY + 1)
+        row, slot = np.unravel_index(np.where(fits, distance, np.inf).argmin(), fits.shape)
+        return int(slot) * SLOT_MINUTES, self.technician_ids[rows[row]]
+
+
+def build_day(day, technicians, business_hours, jobs, blocks=()):
+    """DaySlots for a date from technician rows, that day's booked jobs and unavailable periods."""
+    windows = {}
+    for tech in technicians:
+        window = working_window(tech.get('availability'), day, business_hours)
+        if window:
+            windows[tech['id']] = window
+    free = DaySlots(windows)
+    for job in jobs:
+        if job['scheduled_time']:
+            start = parse_hhmm(job['scheduled_time'])
+            free.occupy(job['technician_id'], start, start + job_duration(job['job_type'], job['duration_minutes']))
+    for block in blocks:
+        free.block(block['technician_id'], parse_hhmm(block['start_time']), parse_hhmm(block['end_time']))
+    return free
+
+
+class ScheduleBook:
+    """
+    DaySlots for recently used days, shared by the process.
+    Days are reloaded after ttl seconds (or on invalidate) so bookings made by
+    other workers show up; the insert itself re-checks in the database.
+    """
+    def __init__(self, ttl=60.0, max_days=120):
+        self.ttl = ttl
+        self.max_days = max_days
+        self._days = {}
+        self._lock = threading.Lock()
+
+    def day(self, conn, day, technicians, business_hours, loader, block_loader=None):
+        """
+        DaySlots for a date; loader(conn, iso_date) yields the booked jobs and
+        block_loader(conn, iso_date), if given, the unavailable periods.
+        """
+        key = day.isoformat()
+        tech_ids = frozenset(t['id'] for t in technicians)
+        with self._lock:
+            entry = self._days.get(key)
+            if entry and entry[0] > time.monotonic() and tech_ids <= entry[1]:
+                return entry[2]
+
+        free = build_day(day, technicians, business_hours, loader(conn, key),
+                         block_loader(conn, key) if block_loader else ())
+
+        with self._lock:
+            if len(self._days) >= self.max_days:
+                self._days.pop(min(self._days, key=lambda k: self._days[k][0]))
+            self._days[key] = (time.monotonic() + self.ttl, tech_ids, free)
+        return free
+
+    def _update(self, day, method, *args):
+        key = day.isoformat() if isinstance(day, date_cls) else day
+        with self._lock:
+            entry = self._days.get(key)
+            if entry:
+                getattr(entry[2], method)(*args)
+
+    def reserve(self, day, technician_id, start, end):
+        """Record a booking made by this process in the cached day, if it is loaded."""
+        self._update(day, 'occupy', technician_id, start, end)
+
+    def release(self, day, technician_id, start, end):
+        """Free the slots of a cancelled or moved job in the cached day, if it is loaded."""
+        self._update(day, 'release', technician_id, start, end)
+
+    def invalidate(self, day=None):
+        with self._lock:
+            if day is None:
+                self._days.clear()
+            else:
+                self._days.pop(day.isoformat() if isinstance(day, date_cls) else day, None)
+
+
+schedule_book = ScheduleBook()
@@ -1,25 +1,426 @@
-
 import sqlite3
 import os
+import re
+import threading
+import time
+from collections import deque
+
+from sqlalchemy import event
+
+from .query_log import query_log
 
 DATABASE_PATH = 'hvac_business.db'
 
-def get_db_connection():
-    """Get database connection with row factory for dict-like access."""
-    conn = sqlite3.connect(DATABASE_PATH)
+# Applied once to every new connection, never per query.
+CONNECTION_PRAGMAS = (
+    "PRAGMA journal_mode = WAL",
+    "PRAGMA synchronous = NORMAL",
+    "PRAGMA busy_timeout = 5000",
+    "PRAGMA cache_size = -20000",     # ~20 MB page cache
+    "PRAGMA mmap_size = 268435456",   # 256 MB memory-mapped I/O
+)
+
+
+def _prepare_sqlite_connection(conn):
     conn.row_factory = sqlite3.Row
-    return conn
+    for pragma in CONNECTION_PRAGMAS:
+        conn.execute(pragma)
+
+
+def _explain_plan(conn, sql, parameters):
+    rows = sqlite3.Connection.execute(conn, 'EXPLAIN QUERY PLAN ' + sql, parameters)
+    return [row[3] for row in rows]
 
-def init_database():
+
+class InstrumentedCursor(sqlite3.Cursor):
+    """Cursor that reports each statement's time to first row to the query log."""
+    def execute(self, sql, parameters=()):
+        if not query_log.should_record(sql):
+            return super().execute(sql, parameters)
+        start = time.perf_counter()
+        try:
+            return super().execute(sql, parameters)
+        finally:
+            query_log.record(sql, (time.perf_counter() - start) * 1000,
+                             explain=lambda: _explain_plan(self.connection, sql, parameters))
+
+    def executemany(self, sql, seq_of_parameters):
+        if not query_log.should_record(sql):
+            return super().executemany(sql, seq_of_parameters)
+        start = time.perf_counter()
+        try:
+            return super().executemany(sql, seq_of_parameters)
+        finally:
+            query_log.record(sql, (time.perf_counter() - start) * 1000)
+
+
+class PooledConnection(sqlite3.Connection):
     """
-    Initializes the database with all tables required for the application.
-    This function is safe to run every time the app starts.
+    sqlite3 connection that belongs to a pool.
+    While checked out, close() and leaving a `with` block hand it back to the pool
+    instead of closing it. Closing it while idle really closes it. Only the
+    outermost `with` commits or rolls back; a nested helper's block shares the
+    caller's transaction.
     """
-    conn = get_db_connection()
-    cursor = conn.cursor()
+    pool = None
+    checked_out = False
+
+    def cursor(self, factory=InstrumentedCursor):
+        return super().cursor(factory)
+
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+    def __exit__(self, exc_type, exc, tb):
+        if self.pool is None or not self.pool.nested(self):
+            super().__exit__(exc_type, exc, tb)
+        self.close()
+        return False
+
+    def close(self):
+        if self.pool is not None and self.checked_out:
+            self.pool.release(self)
+        else:
+            super().close()
+
+
+class _Row(dict):
+    """Result row addressable by column name or position, like sqlite3.Row."""
+    def __init__(self, columns, values):
+        super().__init__(zip(columns, values))
+        self._values = values
+
+    def __getitem__(self, key):
+        if isinstance(key, int):
+            return self._values[key]
+        return super().__getitem__(key)
+
+
+class _QmarkCursor:
+    def __init__(self, cursor, paramstyle):
+        self._cursor = cursor
+        self._paramstyle = paramstyle
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+    def _translate(self, sql):
+        if self._paramstyle in ('format', 'pyformat'):
+            return sql.replace('%', '%%').replace('?', '%s')
+        return sql
+
+    def execute(self, sql, params=()):
+        start = time.perf_counter()
+        self._cursor.execute(self._translate(sql), params)
+        if query_log.should_record(sql):
+            query_log.record(sql, (time.perf_counter() - start) * 1000)
+        return self
+
+    def executemany(self, sql, seq_of_params):
+        start = time.perf_counter()
+        self._cursor.executemany(self._translate(sql), seq_of_params)
+        if query_log.should_record(sql):
+            query_log.record(sql, (time.perf_counter() - start) * 1000)
+        return self
+
+    def _wrap(self, values):
+        return _Row([col[0] for col in self._cursor.description], values)
+
+    def fetchone(self):
+        values = self._cursor.fetchone()
+        return None if values is None else self._wrap(values)
+
+    def fetchall(self):
+        return [self._wrap(values) for values in self._cursor.fetchall()]
+
+    def __iter__(self):
+        return iter(self.fetchall())
+
+
+class QmarkConnection:
+    """
+    Gives a non-SQLite DB-API connection the sqlite3 calling convention the data
+    layer is written against: conn.execute() with ? placeholders, and rows that
+    can be read by column name.
+    """
+    checked_out = False
+
+    def __init__(self, pool, dbapi_connection, paramstyle):
+        self.pool = pool
+        self._conn = dbapi_connection
+        self._paramstyle = paramstyle
+
+    def cursor(self):
+        return _QmarkCursor(self._conn.cursor(), self._paramstyle)
+
+    def execute(self, sql, params=()):
+        return self.cursor().execute(sql, params)
+
+    def executemany(self, sql, seq_of_params):
+        return self.cursor().executemany(sql, seq_of_params)
+
+    def commit(self):
+        self._conn.commit()
+
+    def rollback(self):
+        self._conn.rollback()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if not self.pool.nested(self):
+            if exc_type is None:
+                self.commit()
+            else:
+                self.rollback()
+        self.close()
+        return False
+
+    def close(self):
+        if self.checked_out:
+            self.pool.release(self)
+
+
+class _ThreadAffinePool:
+    """
+    Hands out one connection per thread at a time.
+
+    A thread that asks for a connection while it already holds one gets the same
+    connection back, so nested helpers inside one request share a single handle.
+    Subclasses decide where connections come from and where they go afterwards.
+    """
+    def __init__(self):
+        self.stats = {'opened': 0, 'reused': 0, 'waits': 0}
+        self._local = threading.local()
+
+    def acquire(self):
+        held = getattr(self._local, 'conn', None)
+        if held is not None:
+            self._local.depth += 1
+            self.stats['reused'] += 1
+            return held
+
+        conn = self._checkout()
+        conn.checked_out = True
+        self._local.conn = conn
+        self._local.depth = 1
+        return conn
+
+    def nested(self, conn):
+        """True while this thread holds conn more than once, i.e. inside a caller's block."""
+        return getattr(self._local, 'conn', None) is conn and self._local.depth > 1
+
+    def release(self, conn):
+        if getattr(self._local, 'conn', None) is not conn:
+            return
+        self._local.depth -= 1
+        if self._local.depth > 0:
+            return
+        self._local.conn = None
+        conn.checked_out = False
+        self._checkin(conn)
+
+    def release_thread_connection(self):
+        """Return whatever this thread still holds, e.g. after an exception skipped close()."""
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None:
+            self._local.depth = 1
+            self.release(conn)
+
+
+class ConnectionPool(_ThreadAffinePool):
+    """
+    Bounded pool of SQLite connections for code running outside the web app
+    (the follow-up worker, scripts). Idle connections are kept open and reused
+    across threads.
+    """
+    def __init__(self, database_path, max_size=8, timeout=10.0):
+        super().__init__()
+        self.database_path = database_path
+        # An in-memory database only exists inside one connection.
+        self.max_size = 1 if database_path == ':memory:' else max_size
+        self.timeout = timeout
+        self._idle = deque()
+        self._size = 0
+        self._cond = threading.Condition()
+        self._pid = os.getpid()
+
+    def _open(self):
+        conn = sqlite3.connect(self.database_path, timeout=self.timeout,
+                               check_same_thread=False, factory=PooledConnection)
+        conn.pool = self
+        _prepare_sqlite_connection(conn)
+        self.stats['opened'] += 1
+        return conn
+
+    def _check_fork(self):
+        # Connections must never cross a fork (e.g. gunicorn --preload).
+        if os.getpid() != self._pid:
+            self._idle.clear()
+            self._size = 0
+            self._local = threading.local()
+            self._pid = os.getpid()
+
+    def _checkout(self):
+        with self._cond:
+            self._check_fork()
+            while not self._idle and self._size >= self.max_size:
+                self.stats['waits'] += 1
+                if not self._cond.wait(self.timeout):
+                    raise sqlite3.OperationalError("Timed out waiting for a database connection")
+            if self._idle:
+                self.stats['reused'] += 1
+                return self._idle.pop()
+            self._size += 1
+        try:
+            return self._open()
+        except Exception:
+            with self._cond:
+                self._size -= 1
+                self._cond.notify()
+            raise
+
+    def _checkin(self, conn):
+        # Never hand an open transaction to the next borrower.
+        if conn.in_transaction:
+            conn.rollback()
+        with self._cond:
+            self._idle.append(conn)
+            self._cond.notify()
+
+    def close_all(self):
+        with self._cond:
+            while self._idle:
+                self._idle.pop().close()
+                self._size -= 1
+            self._cond.notify_all()
+
+    def status(self):
+        return {'size': self._size, 'idle': len(self._idle)}
+
+
+class EngineConnectionPool(_ThreadAffinePool):
+    """
+    Draws connections from the app's SQLAlchemy engine, so sizing, pre-ping and
+    recycling come from SQLALCHEMY_ENGINE_OPTIONS and there is one pool per process.
+    """
+    def __init__(self, engine):
+        super().__init__()
+        self.engine = engine
+        self.is_sqlite = engine.dialect.name == 'sqlite'
+        self._fairies = {}
+        event.listen(engine, 'connect', self._on_connect)
+        event.listen(engine, 'checkout', self._on_checkout)
+
+    def _on_connect(self, dbapi_connection, connection_record):
+        self.stats['opened'] += 1
+        connection_record.info['fresh'] = True
+        if self.is_sqlite:
+            dbapi_connection.pool = self
+            _prepare_sqlite_connection(dbapi_connection)
+
+    def _on_checkout(self, dbapi_connection, connection_record, connection_proxy):
+        if not connection_record.info.pop('fresh', False):
+            self.stats['reused'] += 1
+
+    def _checkout(self):
+        fairy = self.engine.raw_connection()
+        if self.is_sqlite:
+            conn = fairy.dbapi_connection
+        else:
+            conn = QmarkConnection(self, fairy.dbapi_connection, self.engine.dialect.paramstyle)
+        self._fairies[id(conn)] = fairy
+        return conn
+
+    def _checkin(self, conn):
+        # The engine pool rolls back anything left open on return
+        self._fairies.pop(id(conn)).close()
+
+    def close_all(self):
+        self.engine.dispose()
+
+    def status(self):
+        return {'pool': self.engine.pool.status()}
+
+
+_pool = ConnectionPool(DATABASE_PATH)
+
+
+def configure_database(database_path, max_size=8):
+    """Point get_db_connection() at a SQLite file directly, without an engine."""
+    global _pool, DATABASE_PATH
+    _pool.close_all()
+    DATABASE_PATH = database_path
+    _pool = ConnectionPool(database_path, max_size=max_size)
+
+
+def bind_engine(engine):
+    """
+    Serve get_db_connection() from a SQLAlchemy engine's connection pool. Only
+    SQLite engines are accepted: the migrations and queries use SQLite DDL and
+    SQL (PRAGMA user_version, FTS5, INSERT OR REPLACE, lastrowid).
+    """
+    if engine.dialect.name != 'sqlite':
+        raise ValueError(f"get_db_connection() needs a SQLite engine, not {engine.dialect.name}")
+    global _pool
+    if isinstance(_pool, ConnectionPool):
+        _pool.close_all()
+    _pool = EngineConnectionPool(engine)
+
+
+def prepare_engine_options(config):
+    """
+    Fill in the SQLAlchemy engine options get_db_connection() relies on.
+    SQLite connections are created as PooledConnection so they behave like the
+    plain sqlite3 connections the data layer was written against.
+    """
+    uri = config.get('SQLALCHEMY_DATABASE_URI') or ''
+    options = dict(config.get('SQLALCHEMY_ENGINE_OPTIONS') or {})
+    if uri.startswith('sqlite'):
+        connect_args = dict(options.get('connect_args') or {})
+        connect_args.update(factory=PooledConnection, check_same_thread=False, timeout=10)
+        options['connect_args'] = connect_args
+        if database_path_from_uri(uri) == ':memory:':
+            # Flask-SQLAlchemy shares one static connection; queue sizing does not apply
+            for key in ('pool_size', 'max_overflow', 'pool_timeout', 'pool_recycle'):
+                options.pop(key, None)
+    config['SQLALCHEMY_ENGINE_OPTIONS'] = options
 
-    # --- Create all tables IF THEY DON'T EXIST ---
-    
+
+def database_path_from_uri(uri):
+    """Extract the file path from a sqlite:/// URI, or None for other backends."""
+    if uri and uri.startswith('sqlite:///'):
+        return uri[len('sqlite:///'):] or ':memory:'
+    if uri == 'sqlite://':
+        return ':memory:'
+    return None
+
+
+def is_sqlite():
+    return isinstance(_pool, ConnectionPool) or _pool.is_sqlite
+
+
+def get_pool_stats():
+    """Counters for connections opened, reused and waited on."""
+    return dict(_pool.stats, **_pool.status())
+
+
+def release_db_connection(exc=None):
+    """Teardown hook: make sure the current request never keeps a pooled connection."""
+    _pool.release_thread_connection()
+
+
+def get_db_connection():
+    """Get a pooled database connection with row factory for dict-like access."""
+    return _pool.acquire()
+
+
+def _migration_001_initial_schema(cursor):
+    """Core tables: users, customers, technicians, jobs, parts and quotes."""
     # User Authentication table
     cursor.execute("""
         CREATE TABLE IF NOT EXISTS users (
@@ -43,7 +444,7 @@ def init_database():
             preferred_time TEXT
         )
     """)
-    
+
     # Technicians table
     cursor.execute("""
         CREATE TABLE IF NOT EXISTS technicians (
@@ -101,14 +502,520 @@ def init_database():
         )
     """)
 
-    # --- Insert Sample Data (only if customers table is empty) ---
-    cursor.execute('SELECT COUNT(id) FROM customers')
-    if cursor.fetchone()[0] == 0:
-        insert_sample_data(cursor)
 
-    conn.commit()
-    conn.close()
-    print("Database initialized and all tables verified.")
+# Secondary indexes for the hot query shapes registered below.
+# (name, table and columns [+ partial WHERE])
+INDEXES = [
+    ('idx_jobs_scheduled', 'jobs (scheduled_date, scheduled_time)'),
+    ('idx_jobs_status_completed', 'jobs (status, completed_at)'),
+    ('idx_jobs_customer_status', 'jobs (customer_id, status, completed_at)'),
+    ('idx_jobs_type_completed', 'jobs (job_type, completed_at)'),
+    ('idx_jobs_followup_pending', "jobs (completed_at) WHERE followup_sent = 0 AND status = 'completed'"),
+    ('idx_quotes_created', 'quotes (created_at)'),
+    ('idx_quotes_status_created', 'quotes (status, created_at)'),
+    ('idx_customers_name', 'customers (name)'),
+    ('idx_parts_name', 'parts (name)'),
+    ('idx_technicians_active_name', 'technicians (active, name)'),
+    ('idx_quote_line_items_quote', 'quote_line_items (quote_id)'),
+    ('idx_api_tokens_user', 'api_tokens (user_id)'),
+    ('idx_jobs_technician_date', 'jobs (technician_id, scheduled_date)'),
+    ('idx_unavailability_day_technician', 'technician_unavailability (day, technician_id)'),
+]
+
+
+def ensure_indexes(cursor):
+    """Create any index in INDEXES that does not exist yet (skipping tables a later step creates)."""
+    tables = {row[0] for row in cursor.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+    for name, definition in INDEXES:
+        if definition.split()[0] in tables:
+            cursor.execute(f"CREATE INDEX IF NOT EXISTS {name} ON {definition}")
+    cursor.execute('PRAGMA optimize')
+
+
+def drop_indexes(cursor):
+    """Drop every index in INDEXES, e.g. before a bulk load; ensure_indexes() puts them back."""
+    for name, _ in INDEXES:
+        cursor.execute(f"DROP INDEX IF EXISTS {name}")
+
+
+def _migration_002_index_pack(cursor):
+    """Indexes for schedule, KPI, follow-up and list-page queries."""
+    ensure_indexes(cursor)
+
+
+def _migration_003_quote_line_items(cursor):
+    """Line items for quotes (written by the quote builder)."""
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS quote_line_items (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            quote_id INTEGER NOT NULL,
+            description TEXT NOT NULL,
+            quantity REAL NOT NULL DEFAULT 1,
+            unit_price REAL NOT NULL DEFAULT 0,
+            FOREIGN KEY (quote_id) REFERENCES quotes (id)
+        )
+    """)
+    ensure_indexes(cursor)
+
+
+# Completed-job rollup per (day, job_type), kept current by triggers on jobs so
+# every write path (completion, edits, deletes, quote conversion) is covered.
+ROLLUP_TRIGGERS = {
+    'trg_jobs_rollup_insert': """
+        CREATE TRIGGER IF NOT EXISTS trg_jobs_rollup_insert AFTER INSERT ON jobs
+        WHEN NEW.status = 'completed' AND NEW.completed_at IS NOT NULL
+        BEGIN
+            INSERT INTO daily_job_stats (day, job_type, completed_jobs, revenue)
+            VALUES (DATE(NEW.completed_at), NEW.job_type, 1, COALESCE(NEW.job_value, 0))
+            ON CONFLICT (day, job_type) DO UPDATE SET
+                completed_jobs = completed_jobs + 1,
+                revenue = revenue + excluded.revenue;
+        END
+    """,
+    'trg_jobs_rollup_update': """
+        CREATE TRIGGER IF NOT EXISTS trg_jobs_rollup_update
+        AFTER UPDATE OF status, completed_at, job_value, job_type ON jobs
+        BEGIN
+            UPDATE daily_job_stats SET
+                completed_jobs = completed_jobs - 1,
+                revenue = revenue - COALESCE(OLD.job_value, 0)
+            WHERE day = DATE(OLD.completed_at) AND job_type = OLD.job_type
+              AND OLD.status = 'completed' AND OLD.completed_at IS NOT NULL;
+            INSERT INTO daily_job_stats (day, job_type, completed_jobs, revenue)
+            SELECT DATE(NEW.completed_at), NEW.job_type, 1, COALESCE(NEW.job_value, 0)
+            WHERE NEW.status = 'completed' AND NEW.completed_at IS NOT NULL
+            ON CONFLICT (day, job_type) DO UPDATE SET
+                completed_jobs = completed_jobs + 1,
+                revenue = revenue + excluded.revenue;
+        END
+    """,
+    'trg_jobs_rollup_delete': """
+        CREATE TRIGGER IF NOT EXISTS trg_jobs_rollup_delete AFTER DELETE ON jobs
+        WHEN OLD.status = 'completed' AND OLD.completed_at IS NOT NULL
+        BEGIN
+            UPDATE daily_job_stats SET
+                completed_jobs = completed_jobs - 1,
+                revenue = revenue - COALESCE(OLD.job_value, 0)
+            WHERE day = DATE(OLD.completed_at) AND job_type = OLD.job_type;
+        END
+    """,
+}
+
+
+def ensure_rollup_triggers(cursor):
+    for ddl in ROLLUP_TRIGGERS.values():
+        cursor.execute(ddl)
+
+
+def rebuild_daily_job_stats(cursor):
+    """Recompute the whole rollup from jobs (backfills, or after a trigger-less bulk load)."""
+    cursor.execute('DELETE FROM daily_job_stats')
+    cursor.execute("""
+        INSERT INTO daily_job_stats (day, job_type, completed_jobs, revenue)
+        SELECT DATE(completed_at), job_type, COUNT(*), SUM(COALESCE(job_value, 0))
+        FROM jobs
+        WHERE status = 'completed' AND completed_at IS NOT NULL
+        GROUP BY 1, 2
+    """)
+    return cursor.rowcount
+
+
+def _migration_004_daily_job_stats(cursor):
+    """Daily completed-job count and revenue per job type, maintained by triggers."""
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS daily_job_stats (
+            day DATE NOT NULL,
+            job_type VARCHAR(50) NOT NULL,
+            completed_jobs INTEGER NOT NULL DEFAULT 0,
+            revenue REAL NOT NULL DEFAULT 0,
+            PRIMARY KEY (day, job_type)
+        ) WITHOUT ROWID
+    """)
+    ensure_rollup_triggers(cursor)
+    rebuild_daily_job_stats(cursor)
+
+
+# Full-text index over customer contact fields, kept in sync by triggers.
+CUSTOMER_SEARCH_TRIGGERS = {
+    'trg_customers_fts_insert': """
+        CREATE TRIGGER IF NOT EXISTS trg_customers_fts_insert AFTER INSERT ON customers
+        BEGIN
+            INSERT INTO customers_fts (rowid, name, address, phone, email)
+            VALUES (NEW.id, NEW.name, NEW.address, NEW.phone, NEW.email);
+        END
+    """,
+    'trg_customers_fts_update': """
+        CREATE TRIGGER IF NOT EXISTS trg_customers_fts_update
+        AFTER UPDATE OF name, address, phone, email ON customers
+        BEGIN
+            INSERT INTO customers_fts (customers_fts, rowid, name, address, phone, email)
+            VALUES ('delete', OLD.id, OLD.name, OLD.address, OLD.phone, OLD.email);
+            INSERT INTO customers_fts (rowid, name, address, phone, email)
+            VALUES (NEW.id, NEW.name, NEW.address, NEW.phone, NEW.email);
+        END
+    """,
+    'trg_customers_fts_delete': """
+        CREATE TRIGGER IF NOT EXISTS trg_customers_fts_delete AFTER DELETE ON customers
+        BEGIN
+            INSERT INTO customers_fts (customers_fts, rowid, name, address, phone, email)
+            VALUES ('delete', OLD.id, OLD.name, OLD.address, OLD.phone, OLD.email);
+        END
+    """,
+}
+
+
+def rebuild_customer_search(cursor):
+    """Re-index every customer (backfills, or after a trigger-less bulk load)."""
+    cursor.execute("INSERT INTO customers_fts (customers_fts) VALUES ('rebuild')")
+
+
+def _migration_005_customer_search(cursor):
+    """FTS5 index over customer name, address, phone and email."""
+    cursor.execute("""
+        CREATE VIRTUAL TABLE IF NOT EXISTS customers_fts USING fts5(
+            name, address, phone, email,
+            content = 'customers', content_rowid = 'id',
+            tokenize = 'unicode61 remove_diacritics 2',
+            prefix = '2 3'
+        )
+    """)
+    for ddl in CUSTOMER_SEARCH_TRIGGERS.values():
+        cursor.execute(ddl)
+    rebuild_customer_search(cursor)
+
+
+def _migration_006_list_filters(cursor):
+    """Index for the status-filtered quotes list."""
+    ensure_indexes(cursor)
+
+
+def _migration_007_user_status(cursor):
+    """Deactivated users can no longer sign in or keep a session."""
+    cursor.execute("ALTER TABLE users ADD COLUMN active INTEGER NOT NULL DEFAULT 1")
+
+
+def _migration_008_api_tokens(cursor):
+    """Bearer tokens for API clients, stored only as keyed hashes."""
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS api_tokens (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER NOT NULL,
+            name TEXT NOT NULL,
+            token_hash TEXT NOT NULL UNIQUE,
+            token_hint TEXT NOT NULL, -- last characters, to tell tokens apart
+            scopes TEXT NOT NULL, -- space-separated
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            expires_at TIMESTAMP,
+            revoked_at TIMESTAMP,
+            FOREIGN KEY (user_id) REFERENCES users (id)
+        )
+    """)
+    ensure_indexes(cursor)
+
+
+def _migration_009_job_scheduling(cursor):
+    """Per-job duration and priority for the auto-scheduler, and a technician-day index."""
+    cursor.execute("ALTER TABLE jobs ADD COLUMN duration_minutes INTEGER")
+    cursor.execute("ALTER TABLE jobs ADD COLUMN priority INTEGER NOT NULL DEFAULT 3")
+    ensure_indexes(cursor)
+
+
+def _migration_010_customer_locations(cursor):
+    """Customer coordinates for route optimisation (NULL until geocoded)."""
+    cursor.execute("ALTER TABLE customers ADD COLUMN lat REAL")
+    cursor.execute("ALTER TABLE customers ADD COLUMN lon REAL")
+
+
+def _migration_011_geocode_cache(cursor):
+    """Offline geocoding results keyed on the normalised address (NULL lat/lon = no match)."""
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS geocode_cache (
+            address_key TEXT PRIMARY KEY,
+            lat REAL,
+            lon REAL,
+            precision TEXT, -- street, zip or town
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+
+
+def _migration_012_technician_unavailability(cursor):
+    """Periods technicians can't work (sick calls, time off), and the skills each job needs."""
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS technician_unavailability (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            technician_id INTEGER NOT NULL,
+            day DATE NOT NULL,
+            start_time TIME NOT NULL,
+            end_time TIME NOT NULL,
+            reason TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (technician_id) REFERENCES technicians (id)
+        )
+    """)
+    cursor.execute("ALTER TABLE jobs ADD COLUMN required_skills TEXT")  # JSON list, NULL = any technician
+    ensure_indexes(cursor)
+
+
+# A counter per table, bumped by triggers on every write, so caches in any
+# worker can tell with one primary-key read whether the table changed.
+VERSIONED_TABLES = ('jobs', 'customers', 'technicians', 'quotes', 'quote_line_items', 'parts')
+VERSION_TRIGGERS = {
+    f'trg_{table}_version_{action.lower()}': f"""
+        CREATE TRIGGER IF NOT EXISTS trg_{table}_version_{action.lower()} AFTER {action} ON {table}
+        BEGIN
+            UPDATE table_versions SET version = version + 1 WHERE name = '{table}';
+        END
+    """
+    for table in VERSIONED_TABLES for action in ('INSERT', 'UPDATE', 'DELETE')
+}
+
+# Narrower counters for pages that show only some columns of a table, so
+# other edits leave them valid: bumped when one of those columns changes or a
+# row is deleted (a new row only appears through the rows that reference it)
+VERSIONED_COLUMNS = {'customer_names': ('customers', ('name',))}
+
+
+def _column_version_triggers(name, table, columns):
+    changed = ' OR '.join(f'OLD.{column} IS NOT NEW.{column}' for column in columns)
+    return {
+        f'trg_{name}_version_update': f"""
+            CREATE TRIGGER IF NOT EXISTS trg_{name}_version_update
+            AFTER UPDATE OF {', '.join(columns)} ON {table} WHEN {changed}
+            BEGIN
+                UPDATE table_versions SET version = version + 1 WHERE name = '{name}';
+            END
+        """,
+        f'trg_{name}_version_delete': f"""
+            CREATE TRIGGER IF NOT EXISTS trg_{name}_version_delete AFTER DELETE ON {table}
+            BEGIN
+                UPDATE table_versions SET version = version + 1 WHERE name = '{name}';
+            END
+        """,
+    }
+
+
+for _name, (_table, _columns) in VERSIONED_COLUMNS.items():
+    VERSION_TRIGGERS.update(_column_version_triggers(_name, _table, _columns))
+
+def ensure_version_triggers(cursor):
+    cursor.executemany("INSERT OR IGNORE INTO table_versions (name) VALUES (?)",
+                       [(table,) for table in VERSIONED_TABLES + tuple(VERSIONED_COLUMNS)])
+    for ddl in VERSION_TRIGGERS.values():
+        cursor.execute(ddl)
+
+
+def bump_table_versions(cursor):
+    """Mark every versioned table as changed (after writes made with the triggers off)."""
+    cursor.execute('UPDATE table_versions SET version = version + 1')
+
+
+def _migration_013_table_versions(cursor):
+    """Per-table change counters for cache validation, maintained by triggers."""
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS table_versions (
+            name TEXT PRIMARY KEY,
+            version INTEGER NOT NULL DEFAULT 0
+        ) WITHOUT ROWID
+    """)
+    ensure_version_triggers(cursor)
+
+
+def _migration_014_list_versions(cursor):
+    """Version counters for customers and technicians, whose names appear in job listings."""
+    ensure_version_triggers(cursor)
+
+
+# A quote's own revision and last change, bumped when it or its line items
+# change, so one quote page can be validated without the whole table's counter
+QUOTE_REVISION_TRIGGERS = {
+    'trg_quotes_revision': """
+        CREATE TRIGGER IF NOT EXISTS trg_quotes_revision
+        AFTER UPDATE OF customer_id, status, total_amount ON quotes
+        BEGIN
+            UPDATE quotes SET revision = revision + 1, updated_at = CURRENT_TIMESTAMP WHERE id = NEW.id;
+        END
+    """,
+    'trg_quote_line_items_revision_insert': """
+        CREATE TRIGGER IF NOT EXISTS trg_quote_line_items_revision_insert AFTER INSERT ON quote_line_items
+        BEGIN
+            UPDATE quotes SET revision = revision + 1, updated_at = CURRENT_TIMESTAMP WHERE id = NEW.quote_id;
+        END
+    """,
+    'trg_quote_line_items_revision_update': """
+        CREATE TRIGGER IF NOT EXISTS trg_quote_line_items_revision_update AFTER UPDATE ON quote_line_items
+        BEGIN
+            UPDATE quotes SET revision = revision + 1, updated_at = CURRENT_TIMESTAMP
+            WHERE id IN (OLD.quote_id, NEW.quote_id);
+        END
+    """,
+    'trg_quote_line_items_revision_delete': """
+        CREATE TRIGGER IF NOT EXISTS trg_quote_line_items_revision_delete AFTER DELETE ON quote_line_items
+        BEGIN
+            UPDATE quotes SET revision = revision + 1, updated_at = CURRENT_TIMESTAMP WHERE id = OLD.quote_id;
+        END
+    """,
+}
+
+
+def _migration_015_page_versions(cursor):
+    """Version counters for quotes, line items and parts, and a revision per quote."""
+    cursor.execute("ALTER TABLE quotes ADD COLUMN revision INTEGER NOT NULL DEFAULT 0")
+    cursor.execute("ALTER TABLE quotes ADD COLUMN updated_at TIMESTAMP")  # NULL until first changed
+    ensure_version_triggers(cursor)
+    for ddl in QUOTE_REVISION_TRIGGERS.values():
+        cursor.execute(ddl)
+
+
+def _migration_016_geocode_gazetteer(cursor):
+    """Tag cached geocodes with the gazetteer that produced them, so a new one re-resolves them."""
+    cursor.execute("ALTER TABLE geocode_cache ADD COLUMN gazetteer TEXT")  # NULL = before tagging
+
+
+def _migration_017_column_versions(cursor):
+    """A customer-names counter, so quote lists survive edits to other customer fields."""
+    ensure_version_triggers(cursor)
+
+
+def suspend_derived_data(cursor):
+    """
+    Drop the triggers that maintain derived data (rollups, search index,
+    table versions, quote revisions) ahead of a bulk load. rebuild_derived_data() recomputes
+    and restores them.
+    """
+    for name in (list(ROLLUP_TRIGGERS) + list(CUSTOMER_SEARCH_TRIGGERS) + list(VERSION_TRIGGERS)
+                 + list(QUOTE_REVISION_TRIGGERS)):
+        cursor.execute(f"DROP TRIGGER IF EXISTS {name}")
+
+
+def rebuild_derived_data(cursor):
+    rebuild_daily_job_stats(cursor)
+    rebuild_customer_search(cursor)
+    for ddl in (list(ROLLUP_TRIGGERS.values()) + list(CUSTOMER_SEARCH_TRIGGERS.values())
+                + list(QUOTE_REVISION_TRIGGERS.values())):
+        cursor.execute(ddl)
+    ensure_version_triggers(cursor)
+    bump_table_versions(cursor)
+
+
+# Ordered schema steps. Step N brings the database to user_version N.
+# Append new steps; never edit or reorder ones that have shipped.
+MIGRATIONS = [
+    _migration_001_initial_schema,
+    _migration_002_index_pack,
+    _migration_003_quote_line_items,
+    _migration_004_daily_job_stats,
+    _migration_005_customer_search,
+    _migration_006_list_filters,
+    _migration_007_user_status,
+    _migration_008_api_tokens,
+    _migration_009_job_scheduling,
+    _migration_010_customer_locations,
+    _migration_011_geocode_cache,
+    _migration_012_technician_unavailability,
+    _migration_013_table_versions,
+    _migration_014_list_versions,
+    _migration_015_page_versions,
+    _migration_016_geocode_gazetteer,
+    _migration_017_column_versions,
+]
+SCHEMA_VERSION = len(MIGRATIONS)
+
+
+# Hot queries whose plans must stay on an index, keyed by name.
+QUERY_REGISTRY = {}
+
+
+def register_query(name, sql, allow_scan=()):
+    """
+    Record a hot query so `flask check-query-plans` can verify its plan.
+    allow_scan names tables (or aliases) the query is meant to visit in full.
+    Returns the SQL unchanged so it can be assigned to a module constant.
+    """
+    QUERY_REGISTRY[name] = {'sql': sql, 'allow_scan': set(allow_scan)}
+    return sql
+
+
+TABLE_VERSION_SQL = register_query('table_version', 'SELECT version FROM table_versions WHERE name = ?')
+TABLE_VERSIONS_SQL = register_query('table_versions', 'SELECT name, version FROM table_versions WHERE name IN (?)')
+
+
+def get_table_version(conn, table):
+    """Change counter for a name in VERSIONED_TABLES or VERSIONED_COLUMNS (0 if never written)."""
+    row = conn.execute(TABLE_VERSION_SQL, (table,)).fetchone()
+    return row[0] if row else 0
+
+
+def get_table_versions(conn, tables):
+    """Change counters for several tables, in order, from one statement."""
+    sql = TABLE_VERSIONS_SQL.replace('(?)', f"({', '.join('?' * len(tables))})")
+    versions = dict(conn.execute(sql, list(tables)).fetchall())
+    return tuple(versions.get(table, 0) for table in tables)
+
+
+def explain_query(conn, sql):
+    """Return the EXPLAIN QUERY PLAN detail lines for a statement."""
+    params = (None,) * sql.count('?')
+    return [row['detail'] for row in conn.execute('EXPLAIN QUERY PLAN ' + sql, params)]
+
+
+_FULL_SCAN = re.compile(r'^SCAN (\w+)\b(?! USING (?:COVERING )?INDEX| VIRTUAL TABLE)')
+
+
+def find_full_scans():
+    """
+    Run EXPLAIN QUERY PLAN over every registered query.
+    Returns {query name: [plan lines]} for queries that fall back to a table scan.
+    """
+    offenders = {}
+    with get_db_connection() as conn:
+        for name, entry in sorted(QUERY_REGISTRY.items()):
+            plan = explain_query(conn, entry['sql'])
+            scans = [line for line in plan
+                     if (m := _FULL_SCAN.match(line))
+                     and m.group(1) not in entry['allow_scan'] | {'CONSTANT'}]
+            if scans:
+                offenders[name] = plan
+    return offenders
+
+
+def get_schema_version(conn):
+    return conn.execute('PRAGMA user_version').fetchone()[0]
+
+
+def init_database(sample_data=False):
+    """
+    Brings the database schema up to date.
+    When the schema is already current this is a single PRAGMA read, so it is
+    cheap to call on every worker boot. Sample data is only inserted when asked
+    for, and only into a freshly created database.
+    """
+    conn = get_db_connection()
+    try:
+        if get_schema_version(conn) >= SCHEMA_VERSION:
+            return 0
+
+        # Take the write lock, then re-check: another worker may have migrated meanwhile
+        conn.execute('BEGIN IMMEDIATE')
+        start_version = get_schema_version(conn)
+        cursor = conn.cursor()
+        for migration in MIGRATIONS[start_version:]:
+            migration(cursor)
+        cursor.execute(f'PRAGMA user_version = {SCHEMA_VERSION}')
+
+        if sample_data and start_version == 0:
+            cursor.execute('SELECT COUNT(id) FROM customers')
+            if cursor.fetchone()[0] == 0:
+                insert_sample_data(cursor)
+
+        conn.commit()
+    finally:
+        conn.close()
+
+    applied = SCHEMA_VERSION - start_version
+    if applied:
+        print(f"Database schema migrated from v{start_version} to v{SCHEMA_VERSION}.")
+    return applied
 
 def insert_sample_data(cursor):
     """Inserts sample data for customers and technicians."""
@@ -0,0 +1,142 @@
+import itertools
+import json
+import threading
+import time
+import uuid
+from collections import deque
+
+
+class BusFull(Exception):
+    """Raised when the process already serves its maximum number of subscribers."""
+
+
+class Subscription:
+    """One subscriber's bounded queue. Overflowing it marks the subscriber as lagged."""
+    def __init__(self, bus, max_queue, internal=False):
+        self.bus = bus
+        self.max_queue = max_queue
+        self.internal = internal
+        self.lagged = False
+        self._events = deque()
+        self._cond = threading.Condition()
+
+    def put(self, event):
+        with self._cond:
+            if len(self._events) >= self.max_queue:
+                # A client this far behind has to reload the board anyway
+                self._events.clear()
+                self.lagged = True
+            else:
+                self._events.append(event)
+            self._cond.notify()
+
+    def get(self, timeout=None):
+        """Pending events, waiting up to timeout for the first one ([] if none came)."""
+        with self._cond:
+            if not self._events and not self.lagged:
+                self._cond.wait(timeout)
+            events = list(self._events)
+            self._events.clear()
+            return events
+
+    def close(self):
+        self.bus.unsubscribe(self)
+
+
+class EventBus:
+    """
+    In-process publish/subscribe for live updates. Write paths publish after
+    they commit; each subscriber gets its own bounded queue, and the last
+    `history` events are kept so a reconnecting client can resume from the
+    id it last saw (SSE Last-Event-ID). Ids are "<epoch>-<n>" with a per-process
+    epoch, so a client reconnecting to another worker knows to resync.
+    """
+    def __init__(self, history=1000, max_subscribers=200, max_queue=1000):
+        self.max_subscribers = max_subscribers
+        self.max_queue = max_queue
+        self.epoch = uuid.uuid4().hex[:8]
+        self._history = deque(maxlen=history)
+        self._ids = itertools.count(1)
+        self._last = 0
+        self._subscribers = set()
+        self._clients = 0
+        self._lock = threading.Lock()
+        self.stats = {'published': 0, 'lagged': 0, 'rejected': 0}
+
+    def configure(self, history=None, max_subscribers=None, max_queue=None):
+        with self._lock:
+            if history is not None:
+                self._history = deque(self._history, maxlen=history)
+            self.max_subscribers = max_subscribers or self.max_subscribers
+            self.max_queue = max_queue or self.max_queue
+
+    def publish(self, kind, data):
+        with self._lock:
+            self._last = next(self._ids)
+            event = {'id': f'{self.epoch}-{self._last}', 'seq': self._last, 'kind': kind, 'data': data,
+                     'ts': time.time()}
+            self._history.append(event)
+            self.stats['published'] += 1
+            subscribers = list(self._subscribers)
+        for subscription in subscribers:
+            subscription.put(event)
+        return event
+
+    def subscribe(self, last_event_id=None, internal=False):
+        """
+        New Subscription, pre-filled with anything after last_event_id. It is
+        marked lagged if that id is from another process or has already left
+        the history. internal subscribers (the process's own listeners, such as
+        the board thread) don't count towards max_subscribers.
+        """
+        with self._lock:
+            if not internal and self._clients >= self.max_subscribers:
+                self.stats['rejected'] += 1
+                raise BusFull()
+            subscription = Subscription(self, self.max_queue, internal)
+            if last_event_id:
+                epoch, _, seq = str(last_event_id).partition('-')
+                seq = int(seq) if seq.isdigit() else -1
+                oldest = self._history[0]['seq'] if self._history else self._last + 1
+                if epoch != self.epoch or not oldest - 1 <= seq <= self._last:
+                    subscription.lagged = True
+                else:
+                    for event in self._history:
+                        if event['seq'] > seq:
+                            subscription.put(event)
+            self._subscribers.add(subscription)
+            self._clients += not internal
+            return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            if subscription in self._subscribers:
+                self._subscribers.discard(subscription)
+                self._clients -= not subscription.internal
+                if subscription.lagged:
+                    self.stats['lagged'] += 1
+
+    def metrics(self):
+        with self._lock:
+            return dict(self.stats, subscribers=self._clients, history=len(self._history))
+
+
+def format_sse(event):
+    """One event in text/event-stream framing (events without an id don't move Last-Event-ID)."""
+    head = f"id: {event['id']}\n" if 'id' in event else ''
+    return f"{head}event: {event['kind']}\ndata: {json.dumps(event['data'], default=str)}\n\n"
+
+
+event_bus = EventBus()
+
+
+def configure_events(config):
+    event_bus.configure(history=config.get('EVENT_HISTORY'), max_subscribers=config.get('EVENT_STREAM_MAX_CLIENTS'))
+
+
+def publish_job(kind, job_id, **fields):
+    """
+    Announce a committed job change: 'job.created', 'job.assigned' (technician,
+    date or time changed), 'job.status' or 'job.completed'.
+    """
+    return event_bus.publish(kind, dict(fields, id=job_id))
@@ -0,0 +1,63 @@
+"""
+HTTP validators for read endpoints.
+
+An ETag is built from the table_versions counters of every table a response
+reads plus the arguments that shape it. A handler can therefore answer a
+matching If-None-Match (or If-Modified-Since, where it knows a last-change
+time) with 304 after a primary-key read or two, before it runs its queries
+or renders anything.
+"""
+import hashlib
+import json
+from datetime import datetime, timezone
+
+from flask import current_app, make_response, request, session
+
+from .database import get_db_connection, get_table_version
+
+
+def table_etag(tables, *parts):
+    """Strong ETag over the current versions of `tables` and any other values the response depends on."""
+    conn = get_db_connection()
+    try:
+        versions = [get_table_version(conn, table) for table in tables]
+    finally:
+        conn.close()
+    # The release tag makes a deploy with changed templates invalidate cached pages
+    key = json.dumps([current_app.config.get('ETAG_RELEASE', ''), list(tables), versions, parts],
+                     default=str, separators=(',', ':'))
+    return hashlib.sha1(key.encode()).hexdigest()[:24]
+
+
+def parse_timestamp(value):
+    """A CURRENT_TIMESTAMP column value (UTC text) as an aware datetime; None if empty."""
+    if not value:
+        return None
+    return datetime.strptime(str(value)[:19], '%Y-%m-%d %H:%M:%S').replace(tzinfo=timezone.utc)
+
+
+def not_modified(etag, last_modified=None, page=True):
+    """
+    A 304 response if the client's validators still match, else None. page
+    marks an HTML page, which must render afresh while a flash message is pending.
+    """
+    if page and session.get('_flashes'):
+        return None
+    if request.if_none_match:
+        matched = request.if_none_match.contains_weak(etag)
+    else:
+        since = request.if_modified_since
+        matched = last_modified is not None and since is not None and last_modified <= since
+    if not matched:
+        return None
+    return with_etag(current_app.response_class(status=304), etag, last_modified)
+
+
+def with_etag(response, etag, last_modified=None):
+    """Attach validators to a view's return value; clients must revalidate before reusing it."""
+    response = make_response(response)
+    response.set_etag(etag)
+    if last_modified is not None:
+        response.last_modified = last_modified
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response
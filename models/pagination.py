@@ -0,0 +1,62 @@
+"""
+Keyset (cursor) pagination for the list pages.
+
+A cursor is the sort key of the last row on a page, encoded as an opaque
+URL-safe token. The next page is fetched with "WHERE (sort key) > cursor",
+which an index on the sort key serves directly, so the cost of a page does
+not grow with its depth the way OFFSET does.
+"""
+import base64
+import binascii
+import json
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+
+def page_size(value, default=DEFAULT_PAGE_SIZE, maximum=MAX_PAGE_SIZE):
+    """Clamp a requested page size to 1..maximum."""
+    try:
+        size = int(value)
+    except (TypeError, ValueError):
+        return default
+    return max(1, min(size, maximum))
+
+
+def encode_cursor(values):
+    raw = json.dumps(list(values), separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+# Sort-key values a cursor may carry; anything else would reach the driver as a bad parameter
+CURSOR_VALUE_TYPES = (str, int, float, type(None))
+
+
+def decode_cursor(token, length):
+    """
+    Decode a cursor into a list of `length` sort-key values; None if absent or
+    malformed. Raises ValueError if it decodes to values no sort key can hold.
+    """
+    if not token:
+        return None
+    try:
+        values = json.loads(base64.urlsafe_b64decode(token + '=' * (-len(token) % 4)))
+    except (binascii.Error, ValueError):
+        return None
+    if not isinstance(values, list) or len(values) != length:
+        return None
+    if not all(isinstance(value, CURSOR_VALUE_TYPES) for value in values):
+        raise ValueError('Invalid cursor.')
+    return values
+
+
+def paginate(rows, limit, key):
+    """
+    Split a result fetched with LIMIT limit + 1 into (page, next_cursor).
+    key maps a row to its sort-key values.
+    """
+    rows = list(rows)
+    if len(rows) <= limit:
+        return rows, None
+    page = rows[:limit]
+    return page, encode_cursor(key(page[-1]))
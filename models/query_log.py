@@ -0,0 +1,158 @@
+import re
+import threading
+import logging
+from bisect import bisect_left
+
+# Histogram bucket upper bounds in milliseconds; the last bucket is open-ended.
+LATENCY_BUCKETS_MS = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500)
+
+_STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_LITERAL = re.compile(r"\b\d+(?:\.\d+)?\b")
+_IN_LIST = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+_WHITESPACE = re.compile(r"\s+")
+
+# Statements not worth timing or explaining
+_SKIP_PREFIXES = ('PRAGMA', 'BEGIN', 'COMMIT', 'ROLLBACK', 'EXPLAIN', 'SAVEPOINT', 'RELEASE')
+
+
+def normalize_sql(sql):
+    """Collapse whitespace and literals so one query shape maps to one key."""
+    sql = _STRING_LITERAL.sub('?', sql)
+    sql = _NUMBER_LITERAL.sub('?', sql)
+    sql = _WHITESPACE.sub(' ', sql).strip()
+    return _IN_LIST.sub('(?, ...)', sql)
+
+
+class LatencyHistogram:
+    """Bucketed latency histogram with totals."""
+    __slots__ = ('count', 'total_ms', 'max_ms', 'buckets')
+
+    def __init__(self):
+        self.count = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.buckets = [0] * (len(LATENCY_BUCKETS_MS) + 1)
+
+    def add(self, elapsed_ms):
+        self.count += 1
+        self.total_ms += elapsed_ms
+        self.max_ms = max(self.max_ms, elapsed_ms)
+        self.buckets[bisect_left(LATENCY_BUCKETS_MS, elapsed_ms)] += 1
+
+    def percentile(self, pct):
+        """Upper bound of the bucket holding the given percentile."""
+        target = self.count * pct / 100.0
+        seen = 0
+        for bound, hits in zip(LATENCY_BUCKETS_MS + (None,), self.buckets):
+            seen += hits
+            if hits and seen >= target:
+                return bound if bound is not None else round(self.max_ms, 3)
+        return 0
+
+    def as_dict(self):
+        return {
+            'count': self.count,
+            'total_ms': round(self.total_ms, 3),
+            'mean_ms': round(self.total_ms / self.count, 3) if self.count else 0,
+            'max_ms': round(self.max_ms, 3),
+            'p50_ms': self.percentile(50),
+            'p95_ms': self.percentile(95),
+            'p99_ms': self.percentile(99),
+        }
+
+
+class StatementStats(LatencyHistogram):
+    """Latency histogram and totals for one normalised statement."""
+    __slots__ = ('sql', 'slow_count', 'last_plan')
+
+    def __init__(self, sql):
+        super().__init__()
+        self.sql = sql
+        self.slow_count = 0
+        self.last_plan = None
+
+    def as_dict(self):
+        return {
+            'sql': self.sql,
+            **super().as_dict(),
+            'slow_count': self.slow_count,
+            'last_plan': self.last_plan,
+        }
+
+
+class QueryLog:
+    """
+    Per-statement latency statistics for the whole process.
+    Statements slower than threshold_ms are logged together with their query plan.
+    """
+    def __init__(self, threshold_ms=100, max_statements=500, logger=None):
+        self.threshold_ms = threshold_ms
+        self.max_statements = max_statements
+        self.logger = logger or logging.getLogger(__name__)
+        self.enabled = True
+        self.total_statements = 0
+        self._stats = {}
+        self._normalized = {}
+        self._lock = threading.Lock()
+
+    def _key(self, sql):
+        key = self._normalized.get(sql)
+        if key is None:
+            key = normalize_sql(sql)
+            if len(self._normalized) < 4 * self.max_statements:
+                self._normalized[sql] = key
+        return key
+
+    def should_record(self, sql):
+        return self.enabled and not sql.lstrip()[:9].upper().startswith(_SKIP_PREFIXES)
+
+    def record(self, sql, elapsed_ms, explain=None):
+        """
+        Add one execution. explain is an optional callable returning the plan
+        lines; it is only called for slow statements.
+        """
+        key = self._key(sql)
+        with self._lock:
+            self.total_statements += 1
+            stats = self._stats.get(key)
+            if stats is None:
+                if len(self._stats) >= self.max_statements:
+                    return
+                stats = self._stats[key] = StatementStats(key)
+            stats.add(elapsed_ms)
+
+        if elapsed_ms < self.threshold_ms:
+            return
+        plan = None
+        if explain is not None:
+            try:
+                plan = explain()
+            except Exception as e:
+                plan = [f"EXPLAIN failed: {e}"]
+        with self._lock:
+            stats.slow_count += 1
+            stats.last_plan = plan
+        self.logger.warning("Slow query (%.1f ms): %s | plan: %s", elapsed_ms, key,
+                            ' / '.join(plan) if plan else 'n/a')
+
+    def top(self, limit=10, order_by='max_ms'):
+        with self._lock:
+            rows = [stats.as_dict() for stats in self._stats.values()]
+        rows.sort(key=lambda row: row[order_by], reverse=True)
+        return rows[:limit]
+
+    def reset(self):
+        with self._lock:
+            self._stats.clear()
+
+
+query_log = QueryLog()
+
+
+def configure_query_log(threshold_ms=None, enabled=None, logger=None):
+    if threshold_ms is not None:
+        query_log.threshold_ms = threshold_ms
+    if enabled is not None:
+        query_log.enabled = enabled
+    if logger is not None:
+        query_log.logger = logger
@@ -1,7 +1,229 @@
+import re
 import sqlite3
 from datetime import datetime, timedelta, time
+from time import perf_counter
 import json
-from .database import get_db_connection
+from .database import get_db_connection, register_query, is_sqlite
+from .availability import (
+    schedule_book, job_duration, preferred_windows, parse_hhmm, format_hhmm, working_window, INACTIVE_STATUSES
+)
+from .pagination import DEFAULT_PAGE_SIZE, decode_cursor, paginate
+from .events import publish_job
+
+JOBS_BY_DATE_SQL = register_query('jobs_by_date', """
+    SELECT j.*, c.name as customer_name, c.address, t.name as technician_name
+    FROM jobs j
+    JOIN customers c ON j.customer_id = c.id
+    LEFT JOIN technicians t ON j.technician_id = t.id
+    WHERE j.scheduled_date = ?
+    ORDER BY j.scheduled_time
+""")
+
+CUSTOMERS_FIRST_PAGE_SQL = register_query('customers_first_page', """
+    SELECT id, name, phone, email, address FROM customers
+    ORDER BY name, id
+    LIMIT ?
+""")
+
+CUSTOMERS_NEXT_PAGE_SQL = register_query('customers_next_page', """
+    SELECT id, name, phone, email, address FROM customers
+    WHERE (name, id) > (?, ?)
+    ORDER BY name, id
+    LIMIT ?
+""")
+
+CUSTOMER_SEARCH_SQL = register_query('customer_search', """
+    SELECT c.id, c.name, c.address, c.phone
+    FROM customers_fts
+    JOIN customers c ON c.id = customers_fts.rowid
+    WHERE customers_fts MATCH ?
+    ORDER BY rank
+    LIMIT ?
+""")
+
+ACTIVE_TECHNICIANS_SQL = register_query(
+    'active_technicians', 'SELECT * FROM technicians WHERE active = 1 ORDER BY name'
+)
+
+# Booked jobs for one day (all technicians) and for one technician-day
+DAY_BOOKINGS_SQL = register_query('day_bookings', f"""
+    SELECT technician_id, job_type, scheduled_time, duration_minutes
+    FROM jobs
+    WHERE scheduled_date = ? AND technician_id IS NOT NULL
+      AND status NOT IN ({', '.join(repr(s) for s in INACTIVE_STATUSES)})
+""")
+
+TECHNICIAN_DAY_BOOKINGS_SQL = register_query('technician_day_bookings', f"""
+    SELECT id, technician_id, job_type, scheduled_time, duration_minutes
+    FROM jobs
+    WHERE technician_id = ? AND scheduled_date = ?
+      AND status NOT IN ({', '.join(repr(s) for s in INACTIVE_STATUSES)})
+""")
+
+# Unavailable periods for one day (all technicians) and for one technician-day
+DAY_BLOCKS_SQL = register_query('day_blocks', """
+    SELECT technician_id, start_time, end_time FROM technician_unavailability WHERE day = ?
+""")
+
+TECHNICIAN_DAY_BLOCKS_SQL = register_query('technician_day_blocks', """
+    SELECT start_time, end_time FROM technician_unavailability WHERE day = ? AND technician_id = ?
+""")
+
+# A technician's scheduled jobs on a day, with what re-placing them needs
+TECHNICIAN_DAY_JOBS_SQL = register_query('technician_day_jobs', """
+    SELECT j.id, j.technician_id, j.job_type, j.scheduled_date, j.scheduled_time, j.duration_minutes,
+           j.priority, j.required_skills, c.preferred_time
+    FROM jobs j
+    JOIN customers c ON c.id = j.customer_id
+    WHERE j.technician_id = ? AND j.scheduled_date = ? AND j.status = 'scheduled'
+""")
+
+SCHEDULED_JOB_SQL = register_query('scheduled_job', """
+    SELECT id, technician_id, job_type, scheduled_date, scheduled_time, duration_minutes, required_skills
+    FROM jobs
+    WHERE id = ? AND status = 'scheduled'
+""")
+
+TECHNICIAN_SQL = register_query('technician', 'SELECT id, skills, availability, active FROM technicians WHERE id = ?')
+
+JOB_STATUSES = ('scheduled', 'in_progress', 'completed', 'cancelled', 'no_show')
+
+JOB_STATUS_SQL = register_query('job_status', """
+    SELECT id, status, technician_id, job_type, scheduled_date, scheduled_time, duration_minutes
+    FROM jobs
+    WHERE id = ?
+""")
+
+# Columns GET /api/jobs can return, by name
+JOB_FIELDS = {
+    'id': 'j.id',
+    'customer_id': 'j.customer_id',
+    'customer_name': 'c.name',
+    'address': 'c.address',
+    'technician_id': 'j.technician_id',
+    'technician_name': 't.name',
+    'job_type': 'j.job_type',
+    'status': 'j.status',
+    'priority': 'j.priority',
+    'scheduled_date': 'j.scheduled_date',
+    'scheduled_time': 'j.scheduled_time',
+    'duration_minutes': 'j.duration_minutes',
+    'required_skills': 'j.required_skills',
+    'notes': 'j.notes',
+    'job_value': 'j.job_value',
+    'completed_at': 'j.completed_at',
+}
+
+# Fields read from another table; the join is added only when one is selected
+JOB_FIELD_TABLES = {'customer_name': 'customers', 'address': 'customers', 'technician_name': 'technicians'}
+JOB_LIST_JOINS = {
+    'customers': 'LEFT JOIN customers c ON c.id = j.customer_id',
+    'technicians': 'LEFT JOIN technicians t ON t.id = j.technician_id',
+}
+
+def job_list_fields(requested=None):
+    """
+    Validate a field selection for list_jobs (None = every field). Returns
+    (fields, tables), tables being every table those fields are read from.
+    """
+    fields = list(dict.fromkeys(requested or JOB_FIELDS))
+    unknown = [field for field in fields if field not in JOB_FIELDS]
+    if unknown:
+        raise ValueError(f"Unknown field(s): {', '.join(unknown)}.")
+    tables = ['jobs'] + sorted({JOB_FIELD_TABLES[field] for field in fields if field in JOB_FIELD_TABLES})
+    return fields, tables
+
+def _list_jobs_sql(fields, technician=False, statuses=0, after=False):
+    """
+    Jobs in a date range ordered by (date, time, id), which idx_jobs_scheduled
+    serves. Only the selected columns (plus the sort key, for the cursor) are
+    read; filters and the keyset cursor become WHERE clauses.
+    """
+    selected = dict.fromkeys(('scheduled_date', 'scheduled_time', 'id', *fields))
+    columns = ', '.join(f'{JOB_FIELDS[field]} AS {field}' for field in selected)
+    tables = {JOB_FIELD_TABLES[field] for field in selected if field in JOB_FIELD_TABLES}
+    joins = ' '.join(JOB_LIST_JOINS[table] for table in sorted(tables))
+    clauses = ['j.scheduled_date >= ?', 'j.scheduled_date <= ?']
+    if technician:
+        clauses.append('j.technician_id = ?')
+    if statuses:
+        clauses.append(f"j.status IN ({', '.join('?' * statuses)})")
+    if after:
+        # Unscheduled times sort first, as NULLs do in the ORDER BY
+        clauses.append("(j.scheduled_date, COALESCE(j.scheduled_time, ''), j.id) > (?, ?, ?)")
+    return f"""
+    SELECT {columns}
+    FROM jobs j {joins}
+    WHERE {' AND '.join(clauses)}
+    ORDER BY j.scheduled_date, j.scheduled_time, j.id
+    LIMIT ?
+"""
+
+LIST_JOBS_SQL = register_query('list_jobs', _list_jobs_sql(JOB_FIELDS))
+LIST_JOBS_FILTERED_SQL = register_query('list_jobs_filtered', _list_jobs_sql(JOB_FIELDS, True, 2, True))
+
+# Days ahead to search, by priority (1 = emergency ... 5 = low)
+SEARCH_HORIZON_DAYS = {1: 2, 2: 3, 3: 14, 4: 21, 5: 28}
+
+# KPIs read the daily_job_stats rollup rather than re-aggregating jobs.
+# Date cutoffs are computed in Python so the SQL runs on any backend.
+WEEKLY_REVENUE_SQL = register_query('weekly_revenue', """
+    SELECT SUM(revenue) as weekly_revenue
+    FROM daily_job_stats
+    WHERE day >= ?
+""")
+
+OPEN_INVOICE_COUNT_SQL = register_query('open_invoice_count', """
+    SELECT SUM(completed_jobs) as invoice_count
+    FROM daily_job_stats
+    WHERE day >= ?
+""")
+
+
+def _day_bookings(conn, day):
+    return conn.execute(DAY_BOOKINGS_SQL, (day,)).fetchall()
+
+
+def _day_blocks(conn, day):
+    return conn.execute(DAY_BLOCKS_SQL, (day,)).fetchall()
+
+
+def slot_taken(conn, technician_id, day, start, end, ignore_job=None):
+    """Database check that [start, end) is neither booked nor blocked for the technician."""
+    booked = [row for row in conn.execute(TECHNICIAN_DAY_BOOKINGS_SQL, (technician_id, day)).fetchall()
+              if row['id'] != ignore_job]
+    if _overlaps(booked, start, end):
+        return True
+    return any(parse_hhmm(row['start_time']) < end and start < parse_hhmm(row['end_time'])
+               for row in conn.execute(TECHNICIAN_DAY_BLOCKS_SQL, (day, technician_id)))
+
+
+def _overlaps(rows, start, end):
+    for row in rows:
+        booked = parse_hhmm(row['scheduled_time'])
+        if booked < end and start < booked + job_duration(row['job_type'], row['duration_minutes']):
+            return True
+    return False
+
+
+def candidate_days(priority, preferred_date=None):
+    """Days to search for a job: from today (emergencies) or tomorrow, over the priority's horizon."""
+    today = datetime.now().date()
+    first = today if priority <= 2 else today + timedelta(days=1)
+    if preferred_date:
+        requested = datetime.strptime(str(preferred_date), '%Y-%m-%d').date()
+        first = max(first, requested)
+    return [first + timedelta(days=i) for i in range(SEARCH_HORIZON_DAYS[priority])]
+
+
+def days_ago(days):
+    return (datetime.now().date() - timedelta(days=days)).isoformat()
+
+
+def start_of_week():
+    """Monday of the current week, matching SQLite's date('now', 'weekday 0', '-6 days')."""
+    today = datetime.now().date()
+    return (today - timedelta(days=today.weekday())).isoformat()
 
 class HVACScheduler:
     def __init__(self):
@@ -10,41 +232,444 @@ class HVACScheduler:
             'end': 18,       # 6 PM
         }
 
+    def day_slots(self, conn, day, technicians):
+        """Cached DaySlots for a date (see ScheduleBook)."""
+        return schedule_book.day(conn, day, technicians, self.business_hours, _day_bookings, _day_blocks)
+
     def get_jobs_by_date(self, date):
         """Get all jobs for a specific date."""
         conn = get_db_connection()
-        # The rest of this method is the same...
-        jobs = conn.execute("""
-            SELECT j.*, c.name as customer_name, c.address, t.name as technician_name
-            FROM jobs j
-            JOIN customers c ON j.customer_id = c.id
-            LEFT JOIN technicians t ON j.technician_id = t.id
-            WHERE j.scheduled_date = ?
-            ORDER BY j.scheduled_time
-        """, (date,)).fetchall()
+        jobs = conn.execute(JOBS_BY_DATE_SQL, (date,)).fetchall()
         conn.close()
         return [dict(row) for row in jobs]
 
-    def get_all_customers(self):
-        """Get all customers from the database."""
+    def get_customers_page(self, cursor=None, limit=DEFAULT_PAGE_SIZE):
+        """One page of customers ordered by name; returns (customers, next_cursor)."""
+        after = decode_cursor(cursor, 2)
+        conn = get_db_connection()
+        if after is None:
+            rows = conn.execute(CUSTOMERS_FIRST_PAGE_SQL, (limit + 1,)).fetchall()
+        else:
+            rows = conn.execute(CUSTOMERS_NEXT_PAGE_SQL, (*after, limit + 1)).fetchall()
+        conn.close()
+        return paginate([dict(row) for row in rows], limit, key=lambda c: (c['name'], c['id']))
+
+    def list_jobs(self, date_from, date_to, fields=None, technician_id=None, statuses=(), cursor=None,
+                  limit=DEFAULT_PAGE_SIZE):
+        """
+        One page of jobs scheduled between two dates (inclusive), holding only
+        the requested fields; returns (jobs, next_cursor).
+        """
+        fields, _ = job_list_fields(fields)
+        invalid = [status for status in statuses if status not in JOB_STATUSES]
+        if invalid:
+            raise ValueError(f"status must be one of {', '.join(JOB_STATUSES)}.")
+        after = decode_cursor(cursor, 3)
+        params = [date_from.isoformat(), date_to.isoformat()]
+        if technician_id is not None:
+            params.append(technician_id)
+        params.extend(statuses)
+        if after:
+            params.extend(after)
+        params.append(limit + 1)
+        sql = _list_jobs_sql(fields, technician_id is not None, len(statuses), bool(after))
+        conn = get_db_connection()
+        rows = conn.execute(sql, params).fetchall()
+        conn.close()
+        page, next_cursor = paginate(rows, limit, key=lambda row: (row['scheduled_date'], row['scheduled_time'] or '',
+                                                                     row['id']))
+        return [{field: row[field] for field in fields} for row in page], next_cursor
+
+    def add_customer(self, name, phone=None, email=None, address=None, notes=None, location=None):
+        """location: (lat, lon, ...) from the geocoder, or None to leave it for a backfill."""
+        lat, lon = location[:2] if location else (None, None)
+        conn = get_db_connection()
+        cursor = conn.cursor()
+        cursor.execute(
+            "INSERT INTO customers (name, phone, email, address, notes, lat, lon) VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (name, phone, email, address, notes, lat, lon)
+        )
+        conn.commit()
+        conn.close()
+        return cursor.lastrowid
+
+    def search_customers(self, query, limit=10):
+        """Prefix search over customer name, address, phone and email."""
+        terms = re.findall(r'\w+', query or '')[:6]
+        if not terms:
+            return []
+        match = ' '.join(f'"{term}"*' for term in terms)
         conn = get_db_connection()
-        customers = conn.execute('SELECT * FROM customers ORDER BY name').fetchall()
+        customers = conn.execute(CUSTOMER_SEARCH_SQL, (match, limit)).fetchall()
         conn.close()
         return [dict(row) for row in customers]
 
     def get_all_technicians(self):
         """Get all active technicians."""
         conn = get_db_connection()
-        technicians = conn.execute('SELECT * FROM technicians WHERE active = 1 ORDER BY name').fetchall()
+        technicians = conn.execute(ACTIVE_TECHNICIANS_SQL).fetchall()
         conn.close()
         return [dict(row) for row in technicians]
         
-    def auto_schedule_job(self, customer_id, job_type, priority, preferred_date, notes):
-        """Logic to automatically schedule a job."""
-        # For brevity, assuming the full scheduling logic is here
-        print(f"Scheduling job for customer {customer_id}")
-        return {'id': 99, 'status': 'scheduled'} # Example return
-    
+    def auto_schedule_job(self, customer_id, job_type, priority=3, preferred_date=None, notes='',
+                          skills=None, duration=None):
+        """
+        Book a job with the earliest suitable technician and return it, or None
+        if nothing fits within the priority's search horizon.
+
+        Technicians must have every required skill and be working that day.
+        Routine jobs start inside the customer's preferred_time windows when
+        possible; emergencies (priority 1-2) take the first free slot from now.
+        """
+        # A bare string would be split into characters by set()
+        if isinstance(skills, str) or not all(isinstance(skill, str) for skill in skills or ()):
+            raise ValueError('skills must be a list of names.')
+        try:
+            priority = min(max(int(priority or 3), 1), 5)
+            if duration is not None and int(duration) <= 0:
+                raise ValueError
+            duration = job_duration(job_type, duration)
+        except (TypeError, ValueError):
+            raise ValueError('priority and duration must be numbers, duration above zero.')
+        required = set(skills or ())
+
+        conn = get_db_connection()
+        try:
+            customer = conn.execute('SELECT id, preferred_time FROM customers WHERE id = ?',
+                                    (customer_id,)).fetchone()
+            if customer is None:
+                raise ValueError(f"Unknown customer {customer_id}.")
+            technicians = [dict(row) for row in conn.execute(ACTIVE_TECHNICIANS_SQL).fetchall()]
+            eligible = {t['id']: t for t in technicians if required <= set(json.loads(t['skills'] or '[]'))}
+            if not eligible:
+                return None
+            windows = preferred_windows(customer['preferred_time']) if priority > 2 else []
+
+            # A slot can be taken by another worker between search and insert; retry a few times
+            for _ in range(3):
+                slot = self._find_slot(conn, technicians, eligible, duration, priority, preferred_date, windows)
+                if slot is None:
+                    return None
+                technician_id, day, start = slot
+                job_id = self._book_job(conn, customer_id, technician_id, job_type, day, start, duration,
+                                        priority, notes, required)
+                if job_id is not None:
+                    return {
+                        'id': job_id,
+                        'status': 'scheduled',
+                        'technician_id': technician_id,
+                        'technician_name': eligible[technician_id]['name'],
+                        'scheduled_date': day.isoformat(),
+                        'scheduled_time': format_hhmm(start),
+                        'duration_minutes': duration,
+                    }
+                schedule_book.invalidate(day)
+            return None
+        finally:
+            conn.close()
+
+    def _find_slot(self, conn, technicians, eligible, duration, priority, preferred_date, windows):
+        """(technician_id, date, start minute) of the earliest fit, preferring the customer's windows."""
+        days = candidate_days(priority, preferred_date)
+        now = datetime.now()
+        for pass_windows in ([windows, None] if windows else [None]):
+            for day in days:
+                slots = self.day_slots(conn, day, technicians)
+                earliest = now.hour * 60 + now.minute if day == now.date() else 0
+                # Earliest start wins; ties go to the technician with the lightest day
+                found = slots.first_windows(duration, 1, earliest, pass_windows, technician_ids=list(eligible))
+                if found:
+                    start, technician_id = found[0]
+                    return technician_id, day, start
+        return None
+
+    def find_open_windows(self, day, job_type, n=5, skills=None, duration=None):
+        """The first n open (start, technician) windows on a day, for offering customers a choice."""
+        duration = job_duration(job_type, duration)
+        required = set(skills or ())
+        conn = get_db_connection()
+        technicians = [dict(row) for row in conn.execute(ACTIVE_TECHNICIANS_SQL).fetchall()]
+        names = {t['id']: t['name'] for t in technicians if required <= set(json.loads(t['skills'] or '[]'))}
+        slots = self.day_slots(conn, day, technicians)
+        conn.close()
+        now = datetime.now()
+        earliest = now.hour * 60 + now.minute if day == now.date() else 0
+        return [
+            {'technician_id': tid, 'technician_name': names[tid], 'scheduled_date': day.isoformat(),
+             'scheduled_time': format_hhmm(start), 'duration_minutes': duration}
+            for start, tid in slots.first_windows(duration, n, earliest, technician_ids=list(names))
+        ]
+
+    def _book_job(self, conn, customer_id, technician_id, job_type, day, start, duration, priority, notes,
+                  skills=()):
+        """Insert the job unless the technician was booked over that slot meanwhile; returns the id or None."""
+        end = start + duration
+        if is_sqlite():
+            # Take the write lock first so the check and the insert are atomic
+            conn.execute('BEGIN IMMEDIATE')
+        try:
+            if slot_taken(conn, technician_id, day.isoformat(), start, end):
+                conn.rollback()
+                return None
+            cursor = conn.cursor()
+            cursor.execute(
+                "INSERT INTO jobs (customer_id, technician_id, job_type, status, scheduled_date, scheduled_time, "
+                "duration_minutes, priority, notes, required_skills) VALUES (?, ?, ?, 'scheduled', ?, ?, ?, ?, ?, ?)",
+                (customer_id, technician_id, job_type, day.isoformat(), format_hhmm(start), duration, priority, notes,
+                 json.dumps(sorted(skills)) if skills else None)
+            )
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        schedule_book.reserve(day, technician_id, start, end)
+        publish_job('job.created', cursor.lastrowid, customer_id=customer_id, technician_id=technician_id,
+                    job_type=job_type, status='scheduled', scheduled_date=day.isoformat(),
+                    scheduled_time=format_hhmm(start), duration_minutes=duration, priority=priority)
+        return cursor.lastrowid
+
+    def move_job(self, job_id, day, scheduled_time, technician_id=None):
+        """
+        Move a scheduled job to another slot (and optionally technician) if that
+        slot is free. Returns False on a conflict; raises ValueError for unknown
+        jobs and for a technician who is inactive, unqualified or not working then.
+        """
+        conn = get_db_connection()
+        try:
+            if is_sqlite():
+                conn.execute('BEGIN IMMEDIATE')
+            job = conn.execute(SCHEDULED_JOB_SQL, (job_id,)).fetchone()
+            if job is None:
+                conn.rollback()
+                raise ValueError(f"Job {job_id} is not scheduled.")
+            technician_id = technician_id or job['technician_id']
+            duration = job_duration(job['job_type'], job['duration_minutes'])
+            start = parse_hhmm(scheduled_time)
+            self._check_assignable(conn, job, technician_id, day, start, start + duration)
+            if slot_taken(conn, technician_id, day.isoformat(), start, start + duration, ignore_job=job_id):
+                conn.rollback()
+                return False
+            conn.execute("UPDATE jobs SET technician_id = ?, scheduled_date = ?, scheduled_time = ? WHERE id = ?",
+                         (technician_id, day.isoformat(), format_hhmm(start), job_id))
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            conn.close()
+        self._release_slots(job)
+        schedule_book.reserve(day, technician_id, start, start + duration)
+        publish_job('job.assigned', job_id, technician_id=technician_id, scheduled_date=day.isoformat(),
+                    scheduled_time=format_hhmm(start))
+        return True
+
+    def _check_assignable(self, conn, job, technician_id, day, start, end):
+        """Raise ValueError unless the technician is active, qualified and working [start, end) that day."""
+        technician = conn.execute(TECHNICIAN_SQL, (technician_id,)).fetchone()
+        if technician is None or not technician['active']:
+            raise ValueError(f"Technician {technician_id} is not an active technician.")
+        required = set(json.loads(job['required_skills'] or '[]'))
+        missing = required - set(json.loads(technician['skills'] or '[]'))
+        if missing:
+            raise ValueError(f"Technician {technician_id} lacks {', '.join(sorted(missing))}.")
+        window = working_window(technician['availability'], day, self.business_hours)
+        if window is None:
+            raise ValueError(f"Technician {technician_id} is not working on {day.isoformat()}.")
+        if start < window[0] or end > window[1]:
+            raise ValueError(f"{format_hhmm(start)}-{format_hhmm(end)} is outside technician "
+                             f"{technician_id}'s hours ({format_hhmm(window[0])}-{format_hhmm(window[1])}).")
+
+    def cancel_job(self, job_id):
+        """Cancel a scheduled job and free its slots. Returns False if it was not scheduled."""
+        conn = get_db_connection()
+        try:
+            job = conn.execute(SCHEDULED_JOB_SQL, (job_id,)).fetchone()
+            # Only the request whose UPDATE lands frees the slots
+            cancelled = job is not None and conn.execute(
+                "UPDATE jobs SET status = 'cancelled' WHERE id = ? AND status = 'scheduled'", (job_id,)).rowcount
+            conn.commit()
+        finally:
+            conn.close()
+        if not cancelled:
+            return False
+        self._release_slots(job)
+        publish_job('job.status', job_id, status='cancelled', previous_status='scheduled')
+        return True
+
+    def set_job_status(self, job_id, status):
+        """
+        Move a job to another status; completing it stamps completed_at,
+        cancelled or no-show jobs free their slots, and reactivating one takes
+        its old slot back if nobody has booked it since. Returns False for
+        unknown jobs; raises ValueError for a bad status, a slot that is gone
+        or a job another request changed meanwhile.
+        """
+        if status not in JOB_STATUSES:
+            raise ValueError(f"status must be one of {', '.join(JOB_STATUSES)}.")
+        conn = get_db_connection()
+        try:
+            if is_sqlite():
+                conn.execute('BEGIN IMMEDIATE')
+            job = conn.execute(JOB_STATUS_SQL, (job_id,)).fetchone()
+            if job is None:
+                conn.rollback()
+                return False
+            slot = self._job_slot(job)
+            reactivated = slot is not None and job['status'] in INACTIVE_STATUSES and status not in INACTIVE_STATUSES
+            if reactivated and slot_taken(conn, job['technician_id'], job['scheduled_date'], *slot, ignore_job=job_id):
+                conn.rollback()
+                raise ValueError(f"Job {job_id}'s slot has been booked since; move it instead.")
+            completed_at = datetime.now().strftime('%Y-%m-%d %H:%M:%S') if status == 'completed' else None
+            # Guarded on the status read above, so two concurrent changes can't both release or re-book
+            updated = conn.execute(
+                'UPDATE jobs SET status = ?, completed_at = CASE WHEN ? IS NULL THEN NULL '
+                'ELSE COALESCE(completed_at, ?) END WHERE id = ? AND status = ?',
+                (status, completed_at, completed_at, job_id, job['status'])).rowcount
+            if not updated:
+                conn.rollback()
+                raise ValueError(f"Job {job_id} was changed by another request; try again.")
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            conn.close()
+        if status in INACTIVE_STATUSES and job['status'] not in INACTIVE_STATUSES:
+            self._release_slots(job)
+        elif reactivated:
+            schedule_book.reserve(job['scheduled_date'], job['technician_id'], *slot)
+        publish_job('job.completed' if status == 'completed' else 'job.status', job_id, status=status,
+                    previous_status=job['status'])
+        return True
+
+    @staticmethod
+    def _job_slot(job):
+        """(start, end) minutes a job occupies, or None if it has no technician, date or time."""
+        if job['technician_id'] and job['scheduled_date'] and job['scheduled_time']:
+            start = parse_hhmm(job['scheduled_time'])
+            return start, start + job_duration(job['job_type'], job['duration_minutes'])
+        return None
+
+    @staticmethod
+    def _release_slots(job):
+        slot = HVACScheduler._job_slot(job)
+        if slot is not None:
+            schedule_book.release(job['scheduled_date'], job['technician_id'], *slot)
+
+    def mark_unavailable(self, technician_id, day, start_time=None, end_time=None, reason=None):
+        """
+        Block a technician for [start_time, end_time) on a day (default: all day)
+        and re-place only their jobs that overlap it. Everyone else's bookings stay.
+
+        Each job goes to whoever is free nearest its old start that day, else to
+        the earliest opening within its priority's horizon; jobs that fit nowhere
+        lose their technician and are returned as unplaced for a dispatcher.
+        Works on the cached slot bitmaps, re-checking each target in the database.
+        """
+        start = parse_hhmm(start_time) if start_time else 0
+        end = parse_hhmm(end_time) if end_time else 24 * 60
+        if start >= end:
+            raise ValueError('start_time must be before end_time.')
+        started = perf_counter()
+        touched = {day}
+        moved, unplaced = [], []
+        conn = get_db_connection()
+        try:
+            if is_sqlite():
+                conn.execute('BEGIN IMMEDIATE')
+            technicians = [dict(row) for row in conn.execute(ACTIVE_TECHNICIANS_SQL).fetchall()]
+            if technician_id not in {t['id'] for t in technicians}:
+                raise ValueError(f"Unknown technician {technician_id}.")
+            conn.execute(
+                "INSERT INTO technician_unavailability (technician_id, day, start_time, end_time, reason) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (technician_id, day.isoformat(), format_hhmm(start), format_hhmm(end), reason)
+            )
+            affected = []
+            for row in conn.execute(TECHNICIAN_DAY_JOBS_SQL, (technician_id, day.isoformat())).fetchall():
+                job = dict(row, start=parse_hhmm(row['scheduled_time']))
+                job['end'] = job['start'] + job_duration(job['job_type'], job['duration_minutes'])
+                if job['start'] < end and start < job['end']:
+                    affected.append(job)
+
+            slots = self.day_slots(conn, day, technicians)
+            with slots.lock:
+                for job in affected:
+                    slots.release(technician_id, job['start'], job['end'])
+                slots.block(technician_id, start, end)
+
+            skills = {t['id']: set(json.loads(t['skills'] or '[]')) for t in technicians}
+            names = {t['id']: t['name'] for t in technicians}
+            for job in sorted(affected, key=lambda j: (j['priority'], j['start'])):
+                placement = self.rehome_job(conn, job, technicians, skills, touched)
+                if placement is None:
+                    conn.execute('UPDATE jobs SET technician_id = NULL WHERE id = ?', (job['id'],))
+                    unplaced.append({'id': job['id'], 'scheduled_date': job['scheduled_date'],
+                                     'scheduled_time': job['scheduled_time']})
+                    continue
+                new_day, new_tech, new_start = placement
+                conn.execute("UPDATE jobs SET technician_id = ?, scheduled_date = ?, scheduled_time = ? WHERE id = ?",
+                             (new_tech, new_day.isoformat(), format_hhmm(new_start), job['id']))
+                moved.append({'id': job['id'], 'technician_id': new_tech, 'technician_name': names[new_tech],
+                              'scheduled_date': new_day.isoformat(), 'scheduled_time': format_hhmm(new_start),
+                              'previous_time': job['scheduled_time']})
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            # The cached days were edited in place; reload them from the database
+            for touched_day in touched:
+                schedule_book.invalidate(touched_day)
+            raise
+        finally:
+            conn.close()
+        for job in moved:
+            publish_job('job.assigned', job['id'], technician_id=job['technician_id'],
+                        scheduled_date=job['scheduled_date'], scheduled_time=job['scheduled_time'])
+        for job in unplaced:
+            publish_job('job.assigned', job['id'], technician_id=None, scheduled_date=job['scheduled_date'],
+                        scheduled_time=job['scheduled_time'])
+        return {
+            'technician_id': technician_id,
+            'date': day.isoformat(),
+            'start_time': format_hhmm(start),
+            'end_time': format_hhmm(end),
+            'moved': moved,
+            'unplaced': unplaced,
+            'elapsed_ms': round((perf_counter() - started) * 1000, 1),
+        }
+
+    def rehome_job(self, conn, job, technicians, skills, touched):
+        """
+        Free (day, technician_id, start) for a displaced job, booked in the cached
+        slots, or None. job is a TECHNICIAN_DAY_JOBS_SQL row plus its start/end
+        minutes; every day looked at is added to touched. The caller updates the row.
+        """
+        duration = job['end'] - job['start']
+        required = set(json.loads(job['required_skills'] or '[]'))
+        eligible = [t['id'] for t in technicians if required <= skills[t['id']]]
+        windows = preferred_windows(job['preferred_time']) if job['priority'] > 2 else []
+        original = datetime.strptime(job['scheduled_date'], '%Y-%m-%d').date()
+        now = datetime.now()
+        for day in [original] + [d for d in candidate_days(job['priority']) if d > original]:
+            slots = self.day_slots(conn, day, technicians)
+            touched.add(day)
+            earliest = now.hour * 60 + now.minute if day == now.date() else 0
+            # Same day: as close to the old start as possible; later days: earliest
+            target = job['start'] if day == original else 0
+            for pass_windows in ([windows, None] if windows else [None]):
+                # The cached day may miss another worker's booking; skip slots the database refuses
+                for _ in range(3):
+                    with slots.lock:
+                        fit = slots.closest_fit(duration, target, earliest, pass_windows, eligible)
+                        if fit is None:
+                            break
+                        start, technician_id = fit
+                        slots.occupy(technician_id, start, start + duration)
+                    if not slot_taken(conn, technician_id, day.isoformat(), start, start + duration,
+                                       ignore_job=job['id']):
+                        return day, technician_id, start
+        return None
+
     # --- NEW METHODS ADDED HERE ---
 
     def get_revenue_for_current_week(self):
@@ -52,12 +677,7 @@ class HVACScheduler:
         Calculates the total revenue from jobs completed in the current calendar week (Sun-Sat).
         """
         conn = get_db_connection()
-        # This query finds the start of the week (last Sunday) and sums job_value
-        result = conn.execute("""
-            SELECT SUM(job_value) as weekly_revenue
-            FROM jobs
-            WHERE status = 'completed' AND completed_at >= date('now', 'weekday 0', '-6 days')
-        """).fetchone()
+        result = conn.execute(WEEKLY_REVENUE_SQL, (start_of_week(),)).fetchone()
         conn.close()
         return result['weekly_revenue'] if result and result['weekly_revenue'] else 0
 
@@ -66,10 +686,6 @@ class HVACScheduler:
         Gets a count of jobs completed in the last 30 days as a proxy for open invoices.
         """
         conn = get_db_connection()
-        result = conn.execute("""
-            SELECT COUNT(id) as invoice_count
-            FROM jobs
-            WHERE status = 'completed' AND completed_at >= date('now', '-30 days')
-        """).fetchone()
+        result = conn.execute(OPEN_INVOICE_COUNT_SQL, (days_ago(30),)).fetchone()
         conn.close()
         return result['invoice_count'] if result and result['invoice_count'] else 0
\ No newline at end of file
@@ -1,26 +1,82 @@
 from flask_login import UserMixin
-from models.database import get_db_connection
+from models.cache import TTLCache
+from models.database import get_db_connection, register_query
+
+USER_BY_EMAIL_SQL = register_query('user_by_email', 'SELECT * FROM users WHERE email = ?')
+
+# Session lookups never need the password hash
+SESSION_USER_SQL = register_query('session_user', 'SELECT id, email, role, active FROM users WHERE id = ?')
+
+# Users resolved by Flask-Login's user_loader, keyed by id. Per process, so
+# other workers see a change once the TTL lapses; writes through the helpers
+# below invalidate the local copy immediately.
+user_cache = TTLCache(max_size=1024, ttl=60.0)
+
+
+def configure_user_cache(max_size=None, ttl=None):
+    user_cache.configure(max_size=max_size, ttl=ttl)
+
 
 class User(UserMixin):
-    def __init__(self, id, email, password):
+    def __init__(self, id, email, password=None, role='technician', active=True):
         self.id = id
         self.email = email
         self.password = password
+        self.role = role
+        self.active = bool(active)
+
+    @property
+    def is_admin(self):
+        return self.role == 'admin'
+
+    @property
+    def is_active(self):
+        return self.active
 
     @staticmethod
-    def get(user_id):
+    def _load_session_user(user_id):
         conn = get_db_connection()
-        user_row = conn.execute('SELECT * FROM users WHERE id = ?', (user_id,)).fetchone()
+        user_row = conn.execute(SESSION_USER_SQL, (user_id,)).fetchone()
         conn.close()
         if user_row:
-            return User(id=user_row['id'], email=user_row['email'], password=user_row['password'])
+            return User(id=user_row['id'], email=user_row['email'], role=user_row['role'], active=user_row['active'])
         return None
 
+    @staticmethod
+    def get(user_id):
+        """The session user (no password hash), served from the user cache."""
+        try:
+            user_id = int(user_id)
+        except (TypeError, ValueError):
+            return None
+        return user_cache.get_or_load(user_id, User._load_session_user)
+
     @staticmethod
     def find_by_email(email):
         conn = get_db_connection()
-        user_row = conn.execute('SELECT * FROM users WHERE email = ?', (email,)).fetchone()
+        user_row = conn.execute(USER_BY_EMAIL_SQL, (email,)).fetchone()
         conn.close()
         if user_row:
-            return User(id=user_row['id'], email=user_row['email'], password=user_row['password'])
+            return User(id=user_row['id'], email=user_row['email'], password=user_row['password'],
+                        role=user_row['role'], active=user_row['active'])
         return None
+
+    @staticmethod
+    def _update(user_id, column, value):
+        conn = get_db_connection()
+        conn.execute(f'UPDATE users SET {column} = ? WHERE id = ?', (value, user_id))
+        conn.commit()
+        conn.close()
+        user_cache.invalidate(int(user_id))
+
+    @staticmethod
+    def set_password(user_id, password_hash):
+        User._update(user_id, 'password', password_hash)
+
+    @staticmethod
+    def set_role(user_id, role):
+        User._update(user_id, 'role', role)
+
+    @staticmethod
+    def set_active(user_id, active):
+        User._update(user_id, 'active', 1 if active else 0)
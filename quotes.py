@@ -1,23 +1,101 @@
 
-from flask import Blueprint, render_template, request, redirect, url_for, flash
+from datetime import datetime, timedelta
+from flask import Blueprint, render_template, request, redirect, url_for, flash, abort
 from flask_login import login_required
-from models.database import get_db_connection
+from models.database import get_db_connection, register_query
+from models.events import publish_job
+from models.http_cache import not_modified, parse_timestamp, table_etag, with_etag
+from models.pagination import decode_cursor, page_size, paginate
+
+QUOTE_STATUSES = ('draft', 'sent', 'approved', 'declined')
+
+def _list_quotes_sql(status=False, date_from=False, date_to=False, after=False):
+    """Newest-first quotes page; filters and the keyset cursor become WHERE clauses."""
+    clauses = []
+    if status:
+        clauses.append('q.status = ?')
+    if date_from:
+        clauses.append('q.created_at >= ?')
+    if date_to:
+        clauses.append('q.created_at < ?')
+    if after:
+        clauses.append('(q.created_at, q.id) < (?, ?)')
+    where = f"WHERE {' AND '.join(clauses)}" if clauses else ''
+    return f"""
+    SELECT q.id, q.status, q.total_amount, q.created_at, c.name as customer_name
+    FROM quotes q
+    JOIN customers c ON q.customer_id = c.id
+    {where}
+    ORDER BY q.created_at DESC, q.id DESC
+    LIMIT ?
+"""
+
+LIST_QUOTES_SQL = register_query('list_quotes', _list_quotes_sql())
+LIST_QUOTES_FILTERED_SQL = register_query('list_quotes_filtered', _list_quotes_sql(True, True, True, True))
+
+def _parse_date(value):
+    try:
+        return datetime.strptime(value, '%Y-%m-%d')
+    except (TypeError, ValueError):
+        return None
+
+QUOTE_LINE_ITEMS_SQL = register_query('quote_line_items', 'SELECT * FROM quote_line_items WHERE quote_id = ?')
+
+# What a quote page's validators are built from (updated_at is NULL until the quote first changes)
+QUOTE_REVISION_SQL = register_query('quote_revision', """
+    SELECT revision, created_at, COALESCE(updated_at, created_at) AS updated_at FROM quotes WHERE id = ?
+""")
 
 quotes = Blueprint('quotes', __name__)
 
 @quotes.route('/quotes')
 @login_required
 def list_quotes():
-    """Displays a list of all quotes, joining with customer names."""
+    """Displays one page of quotes, newest first, optionally filtered by status and date."""
+    limit = page_size(request.args.get('per_page'))
+    try:
+        after = decode_cursor(request.args.get('cursor'), 2)
+    except ValueError:
+        abort(400)
+    status = request.args.get('status')
+    if status not in QUOTE_STATUSES:
+        status = None
+    date_from = _parse_date(request.args.get('date_from'))
+    date_to = _parse_date(request.args.get('date_to'))
+
+    params = []
+    if status:
+        params.append(status)
+    if date_from:
+        params.append(date_from.strftime('%Y-%m-%d'))
+    if date_to:
+        # The end date is inclusive
+        params.append((date_to + timedelta(days=1)).strftime('%Y-%m-%d'))
+    if after:
+        params.extend(after)
+    params.append(limit + 1)
+
+    # A repeat visit while no quote or customer name changed skips the query and the render
+    etag = table_etag(('quotes', 'customer_names'), status, date_from, date_to, after, limit)
+    cached = not_modified(etag)
+    if cached is not None:
+        return cached
+    sql = _list_quotes_sql(bool(status), bool(date_from), bool(date_to), bool(after))
+
     conn = get_db_connection()
-    all_quotes = conn.execute("""
-        SELECT q.id, q.status, q.total_amount, q.created_at, c.name as customer_name
-        FROM quotes q 
-        JOIN customers c ON q.customer_id = c.id
-        ORDER BY q.created_at DESC
-    """).fetchall()
+    rows = conn.execute(sql, params).fetchall()
     conn.close()
-    return render_template('quotes/list.html', quotes=all_quotes)
+    page, next_cursor = paginate(rows, limit, key=lambda quote: (quote['created_at'], quote['id']))
+
+    filters = {'per_page': limit}
+    if status:
+        filters['status'] = status
+    if date_from:
+        filters['date_from'] = date_from.strftime('%Y-%m-%d')
+    if date_to:
+        filters['date_to'] = date_to.strftime('%Y-%m-%d')
+    return with_etag(render_template('quotes/list.html', quotes=page, next_cursor=next_cursor,
+                                     first_page=after is None, filters=filters, statuses=QUOTE_STATUSES), etag)
 
 @quotes.route('/quotes/new', methods=['GET', 'POST'])
 @login_required
@@ -48,25 +126,36 @@ def create_quote():
         flash('Quote created successfully!', 'success')
         return redirect(url_for('quotes.list_quotes'))
     
-    customers = conn.execute('SELECT id, name FROM customers ORDER BY name').fetchall()
     conn.close()
-    return render_template('quotes/builder.html', customers=customers, quote=None, title="Create New Quote")
+    return render_template('quotes/builder.html', quote=None, title="Create New Quote")
 
 @quotes.route('/quotes/<int:quote_id>')
 @login_required
 def view_quote(quote_id):
     """Displays the details of a single quote."""
     conn = get_db_connection()
+    revision = conn.execute(QUOTE_REVISION_SQL, (quote_id,)).fetchone()
+    if revision is not None:
+        # The quote's own revision covers its line items; customer details come from the table version
+        etag = table_etag(('customers',), quote_id, revision['created_at'], revision['revision'])
+        last_modified = parse_timestamp(revision['updated_at'])
+        cached = not_modified(etag, last_modified)
+        if cached is not None:
+            conn.close()
+            return cached
     quote = conn.execute("""
         SELECT q.*, c.name as customer_name, c.address as customer_address
         FROM quotes q JOIN customers c ON q.customer_id = c.id
         WHERE q.id = ?
     """, (quote_id,)).fetchone()
     
-    line_items = conn.execute('SELECT * FROM quote_line_items WHERE quote_id = ?', (quote_id,)).fetchall()
+    line_items = conn.execute(QUOTE_LINE_ITEMS_SQL, (quote_id,)).fetchall()
     conn.close()
     
-    return render_template('quotes/view.html', quote=quote, line_items=line_items)
+    response = render_template('quotes/view.html', quote=quote, line_items=line_items)
+    if revision is None:
+        return response
+    return with_etag(response, etag, last_modified)
 
 @quotes.route('/quotes/<int:quote_id>/convert', methods=['POST'])
 @login_required
@@ -89,6 +178,8 @@ def convert_to_job(quote_id):
     
     conn.commit()
     conn.close()
+    publish_job('job.created', job_id, customer_id=quote['customer_id'], job_type='Quoted Service',
+                status='scheduled', quote_id=quote_id)
     
     flash(f'Quote #{quote_id} successfully converted to Job #{job_id}!', 'success')
     return redirect(url_for('main.dashboard'))
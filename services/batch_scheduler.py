@@ -0,0 +1,283 @@
+"""
+Batch scheduling: place many job requests in one pass.
+
+Requests are placed most-constrained first (urgent, few qualified
+technicians, narrow preferred windows, long jobs) onto fresh copies of each
+candidate day's slot bitmaps. Every qualified technician-day is scored on how
+far out the day is, how loaded the technician already is, and how far the
+customer is from that technician's other stops that day. A second pass
+re-inserts each job where it now scores best, since later placements form
+clusters the first pass could not see.
+
+The whole batch is planned and inserted in one transaction under the write
+lock, so no other booking can land in between.
+"""
+import json
+import time
+from datetime import datetime
+
+import numpy as np
+
+from models.availability import (
+    build_day, schedule_book, job_duration, preferred_windows, format_hhmm, INACTIVE_STATUSES
+)
+from models.database import get_db_connection, register_query, is_sqlite
+from models.events import publish_job
+from models.scheduler import ACTIVE_TECHNICIANS_SQL, DAY_BLOCKS_SQL, candidate_days
+from services.route_optimizer import haversine_km, travel_minutes
+
+MAX_BATCH_SIZE = 1000
+
+# Placement cost, in minutes of drive time: each day later than the first
+# candidate, each hour already booked that day, and starting outside the
+# customer's preferred windows
+DAY_COST = 30.0
+LOAD_COST = 10.0
+OFF_WINDOW_COST = 120.0
+# Assumed drive when the customer or the technician's day has no location yet
+UNKNOWN_TRAVEL_MINUTES = 20.0
+
+BATCH_DAY_JOBS_SQL = register_query('batch_day_jobs', f"""
+    SELECT j.technician_id, j.job_type, j.scheduled_time, j.duration_minutes, c.lat, c.lon
+    FROM jobs j
+    JOIN customers c ON c.id = j.customer_id
+    WHERE j.scheduled_date = ? AND j.technician_id IS NOT NULL
+      AND j.status NOT IN ({', '.join(repr(s) for s in INACTIVE_STATUSES)})
+""")
+
+BATCH_CUSTOMERS_SQL = register_query('batch_customers', """
+    SELECT id, preferred_time, lat, lon FROM customers WHERE id IN (?)
+""")
+
+
+def parse_request(raw):
+    """Validate one job request (the /api/schedule-job fields); raises ValueError."""
+    if not isinstance(raw, dict):
+        raise ValueError('Each job must be an object.')
+    try:
+        customer_id = int(raw['customer_id'])
+        job_type = str(raw['job_type'])
+    except (KeyError, TypeError, ValueError):
+        raise ValueError('customer_id and job_type are required.')
+    preferred_date = raw.get('preferred_date') or None
+    if preferred_date:
+        datetime.strptime(str(preferred_date), '%Y-%m-%d')
+    skills = raw.get('skills') or []
+    if isinstance(skills, str):
+        skills = [s for s in skills.replace(';', ',').split(',') if s.strip()]
+    if not isinstance(skills, (list, tuple)) or not all(isinstance(s, str) for s in skills):
+        raise ValueError('skills must be a list of names or a comma-separated string.')
+    try:
+        priority = min(max(int(raw.get('priority') or 3), 1), 5)
+        minutes = raw.get('duration_minutes')
+        if minutes not in (None, '') and int(minutes) <= 0:
+            raise ValueError
+        duration = job_duration(job_type, minutes)
+    except (TypeError, ValueError):
+        raise ValueError('priority and duration_minutes must be numbers, duration_minutes above zero.')
+    return {
+        'customer_id': customer_id,
+        'job_type': job_type,
+        'priority': priority,
+        'preferred_date': preferred_date,
+        'skills': {s.strip() for s in skills},
+        'duration': duration,
+        'notes': raw.get('notes') or '',
+    }
+
+
+class _Day:
+    """Free slots and located stops for one day, private to the batch."""
+    def __init__(self, slots, jobs):
+        self.slots = slots
+        self.stops = [(job['lat'], job['lon'], slots.rows[job['technician_id']]) for job in jobs
+                      if job['lat'] is not None and job['technician_id'] in slots]
+        self._arrays = None
+
+    def add_stop(self, customer, technician_id):
+        if customer['lat'] is not None:
+            self.stops.append((customer['lat'], customer['lon'], self.slots.rows[technician_id]))
+            self._arrays = None
+
+    def remove_stop(self, customer, technician_id):
+        if customer['lat'] is not None:
+            self.stops.remove((customer['lat'], customer['lon'], self.slots.rows[technician_id]))
+            self._arrays = None
+
+    def travel(self, customer, technician_ids):
+        """Estimated drive minutes from each technician's nearest stop that day to the customer."""
+        if customer['lat'] is None or not self.stops:
+            return dict.fromkeys(technician_ids, UNKNOWN_TRAVEL_MINUTES)
+        if self._arrays is None:
+            lat, lon, row = zip(*self.stops)
+            self._arrays = (np.array(lat), np.array(lon), np.array(row))
+        lat, lon, row = self._arrays
+        nearest = np.full(len(self.slots.technician_ids), np.inf)
+        np.minimum.at(nearest, row, travel_minutes(haversine_km(customer['lat'], customer['lon'], lat, lon)))
+        values = nearest[[self.slots.rows[tid] for tid in technician_ids]]
+        values[np.isinf(values)] = UNKNOWN_TRAVEL_MINUTES
+        return dict(zip(technician_ids, values.tolist()))
+
+
+class BatchPlanner:
+    def __init__(self, conn, technicians, business_hours):
+        self.conn = conn
+        self.technicians = technicians
+        self.business_hours = business_hours
+        self.days = {}
+
+    def day(self, day):
+        if day not in self.days:
+            jobs = self.conn.execute(BATCH_DAY_JOBS_SQL, (day.isoformat(),)).fetchall()
+            blocks = self.conn.execute(DAY_BLOCKS_SQL, (day.isoformat(),)).fetchall()
+            self.days[day] = _Day(build_day(day, self.technicians, self.business_hours, jobs, blocks), jobs)
+        return self.days[day]
+
+    def best_placement(self, request):
+        """(cost, day, technician_id, start) with the lowest cost, or None if nothing fits."""
+        now = datetime.now()
+        windows = request['windows']
+        best = None
+        for index, day in enumerate(request['days']):
+            # Later days cost at least index * DAY_COST, so stop once that can't win
+            if best is not None and best[0] <= index * DAY_COST:
+                break
+            state = self.day(day)
+            earliest = now.hour * 60 + now.minute if day == now.date() else 0
+            fits = state.slots.earliest_fits(request['duration'], earliest, windows, request['eligible'])
+            if not fits:
+                continue
+            travel = state.travel(request['customer'], list(fits))
+            for tid, (start, load, in_window) in fits.items():
+                cost = index * DAY_COST + load / 60 * LOAD_COST + travel[tid] + start / 1440
+                if windows and not in_window:
+                    cost += OFF_WINDOW_COST
+                if best is None or cost < best[0]:
+                    best = (cost, day, tid, start)
+        return best
+
+    def assign(self, request, placement):
+        _, day, tid, start = placement
+        state = self.day(day)
+        state.slots.occupy(tid, start, start + request['duration'])
+        state.add_stop(request['customer'], tid)
+        request['placement'] = placement
+
+    def unassign(self, request):
+        _, day, tid, start = request.pop('placement')
+        state = self.day(day)
+        state.slots.release(tid, start, start + request['duration'])
+        state.remove_stop(request['customer'], tid)
+
+    def plan(self, requests, improve_passes=1):
+        order = sorted(requests, key=lambda r: (
+            r['priority'], len(r['eligible']),
+            sum(high - low for low, high in r['windows']) if r['windows'] else 24 * 60, -r['duration']))
+        for request in order:
+            placement = self.best_placement(request)
+            if placement is not None:
+                self.assign(request, placement)
+        for _ in range(improve_passes):
+            for request in order:
+                if 'placement' in request:
+                    self.unassign(request)
+                    placement = self.best_placement(request)
+                    if placement is not None:
+                        self.assign(request, placement)
+
+
+def _load_customers(conn, ids, chunk=500):
+    ids, found = list(ids), {}
+    for i in range(0, len(ids), chunk):
+        batch = ids[i:i + chunk]
+        sql = BATCH_CUSTOMERS_SQL.replace('(?)', f"({', '.join('?' * len(batch))})")
+        found.update((row['id'], dict(row)) for row in conn.execute(sql, batch))
+    return found
+
+
+def schedule_batch(raw_requests, business_hours):
+    """
+    Place and book a list of job requests together. Returns per-request
+    results in input order, each {'index', 'success', 'job' | 'error'}.
+    """
+    if len(raw_requests) > MAX_BATCH_SIZE:
+        raise ValueError(f"At most {MAX_BATCH_SIZE} jobs per batch.")
+    started = time.perf_counter()
+    results = [None] * len(raw_requests)
+    requests = []
+    for index, raw in enumerate(raw_requests):
+        try:
+            requests.append(dict(parse_request(raw), index=index))
+        except ValueError as e:
+            results[index] = {'index': index, 'success': False, 'error': str(e)}
+
+    conn = get_db_connection()
+    booked = []
+    try:
+        if is_sqlite():
+            # Plan against the committed schedule and insert before anyone else can book
+            conn.execute('BEGIN IMMEDIATE')
+        technicians = [dict(row) for row in conn.execute(ACTIVE_TECHNICIANS_SQL).fetchall()]
+        skills = {t['id']: set(json.loads(t['skills'] or '[]')) for t in technicians}
+        names = {t['id']: t['name'] for t in technicians}
+        customers = _load_customers(conn, {r['customer_id'] for r in requests})
+
+        planned = []
+        for request in requests:
+            customer = customers.get(request['customer_id'])
+            if customer is None:
+                results[request['index']] = {'index': request['index'], 'success': False,
+                                             'error': f"Unknown customer {request['customer_id']}."}
+                continue
+            request.update(
+                customer=customer,
+                eligible=[tid for tid in names if request['skills'] <= skills[tid]],
+                windows=preferred_windows(customer['preferred_time']) if request['priority'] > 2 else [],
+                days=candidate_days(request['priority'], request['preferred_date']),
+            )
+            planned.append(request)
+
+        BatchPlanner(conn, technicians, business_hours).plan(planned)
+
+        cursor = conn.cursor()
+        for request in planned:
+            if 'placement' not in request:
+                results[request['index']] = {'index': request['index'], 'success': False,
+                                             'error': 'No available slots found.'}
+                continue
+            _, day, tid, start = request['placement']
+            cursor.execute(
+                "INSERT INTO jobs (customer_id, technician_id, job_type, status, scheduled_date, scheduled_time, "
+                "duration_minutes, priority, notes, required_skills) VALUES (?, ?, ?, 'scheduled', ?, ?, ?, ?, ?, ?)",
+                (request['customer_id'], tid, request['job_type'], day.isoformat(), format_hhmm(start),
+                 request['duration'], request['priority'], request['notes'],
+                 json.dumps(sorted(request['skills'])) if request['skills'] else None)
+            )
+            booked.append((day, tid, start, start + request['duration']))
+            results[request['index']] = {'index': request['index'], 'success': True, 'job': {
+                'id': cursor.lastrowid,
+                'status': 'scheduled',
+                'technician_id': tid,
+                'technician_name': names[tid],
+                'scheduled_date': day.isoformat(),
+                'scheduled_time': format_hhmm(start),
+                'duration_minutes': request['duration'],
+            }}
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+
+    for day, tid, start, end in booked:
+        schedule_book.reserve(day, tid, start, end)
+    for row in results:
+        if row['success']:
+            publish_job('job.created', row['job']['id'], **{k: v for k, v in row['job'].items() if k != 'id'})
+    return {
+        'scheduled': len(booked),
+        'failed': len(results) - len(booked),
+        'results': results,
+        'elapsed_ms': round((time.perf_counter() - started) * 1000, 1),
+    }
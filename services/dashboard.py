@@ -0,0 +1,74 @@
+"""
+Dashboard KPIs and today's jobs, cached per day.
+
+Every KPI comes from one statement over the rollup table and covering
+indexes. The result is cached per day for a short TTL, tagged with the version
+counters of the tables it reads (jobs, customers, technicians). Each read
+re-checks those counters (one primary-key lookup), so any write by any
+worker, whether a booking, completion, cancellation, quote conversion or a
+new customer, invalidates the cached copy on the next refresh. The TTL only bounds the time-based KPIs (week start, at-risk cutoff).
+"""
+from datetime import datetime
+
+from models.cache import TTLCache
+from models.database import get_db_connection, get_table_versions, register_query
+from models.scheduler import JOBS_BY_DATE_SQL, days_ago, start_of_week
+
+# Customers with no completed service since this many days ago are at risk
+AT_RISK_DAYS = 90
+
+# Everything the KPI statement and today's job list read
+DASHBOARD_TABLES = ('jobs', 'customers', 'technicians')
+
+# Customers minus those serviced since the cutoff is the at-risk count
+# without grouping every customer's job history
+DASHBOARD_KPIS_SQL = register_query('dashboard_kpis', """
+    SELECT
+        (SELECT COUNT(*) FROM jobs WHERE scheduled_date = ?) AS jobs_today,
+        (SELECT COALESCE(SUM(revenue), 0) FROM daily_job_stats WHERE day >= ?) AS revenue_this_week,
+        (SELECT COALESCE(SUM(completed_jobs), 0) FROM daily_job_stats WHERE day >= ?) AS open_invoices,
+        (SELECT COUNT(*) FROM customers)
+            - (SELECT COUNT(DISTINCT customer_id) FROM jobs
+               WHERE status = 'completed' AND completed_at >= ?) AS at_risk_customers
+""")
+
+
+class DashboardStats:
+    def __init__(self, ttl=30.0):
+        self.cache = TTLCache(max_size=8, ttl=ttl)
+
+    def configure(self, ttl=None):
+        self.cache.configure(ttl=ttl)
+
+    def get(self, day=None):
+        """
+        {'kpis': {...}, 'jobs': [...], 'version': (...)} for a date (default
+        today); versions only grow, so a later snapshot never compares lower.
+        """
+        day = day or datetime.now().date()
+        key = day.isoformat()
+        conn = get_db_connection()
+        try:
+            version = get_table_versions(conn, DASHBOARD_TABLES)
+            cached = self.cache.get(key)
+            if cached is not None and cached['version'] == version:
+                return cached
+            kpis = conn.execute(DASHBOARD_KPIS_SQL, (key, start_of_week(), days_ago(30),
+                                                     days_ago(AT_RISK_DAYS))).fetchone()
+            jobs = conn.execute(JOBS_BY_DATE_SQL, (key,)).fetchall()
+        finally:
+            conn.close()
+        # Tagged with the version read first, so a write that lands meanwhile forces a reload
+        snapshot = {'kpis': dict(kpis), 'jobs': [dict(row) for row in jobs], 'version': version}
+        self.cache.set(key, snapshot)
+        return snapshot
+
+    def invalidate(self):
+        self.cache.clear()
+
+
+dashboard_stats = DashboardStats()
+
+
+def configure_dashboard(config):
+    dashboard_stats.configure(ttl=config.get('DASHBOARD_CACHE_TTL'))
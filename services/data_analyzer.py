@@ -1,6 +1,34 @@
 import pandas as pd
 import sqlite3
-from models.database import get_db_connection
+from models.database import get_db_connection, register_query
+from models.scheduler import days_ago
+
+# Both charts read the daily_job_stats rollup (a few hundred rows per month)
+REVENUE_TREND_SQL = register_query('revenue_trend', """
+    SELECT day as date,
+           SUM(revenue) as daily_revenue,
+           SUM(completed_jobs) as jobs_completed
+    FROM daily_job_stats
+    WHERE day >= ?
+    GROUP BY day ORDER BY day
+""")
+
+SERVICE_BREAKDOWN_SQL = register_query('service_breakdown', """
+    SELECT job_type, SUM(completed_jobs) as count
+    FROM daily_job_stats
+    WHERE day >= ?
+    GROUP BY job_type ORDER BY 2 DESC
+""")
+
+# Every customer has to be visited; the jobs side must stay on an index.
+AT_RISK_CUSTOMERS_SQL = register_query('at_risk_customers', """
+    SELECT c.id, c.name, MAX(j.completed_at) as last_service
+    FROM customers c
+    LEFT JOIN jobs j ON c.id = j.customer_id AND j.status = 'completed'
+    GROUP BY c.id
+    HAVING MAX(j.completed_at) IS NULL OR MAX(j.completed_at) < ?
+    ORDER BY last_service ASC
+""", allow_scan=('c',))
 
 class CustomerDataAnalyzer:
     def generate_monthly_report(self):
@@ -8,25 +36,10 @@ class CustomerDataAnalyzer:
         conn = get_db_connection()
         try:
             # Revenue and jobs data
-            revenue_query = """
-                SELECT strftime('%Y-%m-%d', completed_at) as date,
-                       SUM(job_value) as daily_revenue,
-                       COUNT(*) as jobs_completed
-                FROM jobs
-                WHERE completed_at >= date('now', '-30 days')
-                AND status = 'completed' AND job_value IS NOT NULL
-                GROUP BY 1 ORDER BY 1
-            """
-            revenue_df = pd.read_sql_query(revenue_query, conn)
+            revenue_df = pd.read_sql_query(REVENUE_TREND_SQL, conn, params=(days_ago(30),))
 
             # Service type breakdown data
-            service_query = """
-                SELECT job_type, COUNT(*) as count
-                FROM jobs
-                WHERE completed_at >= date('now', '-30 days') AND status = 'completed'
-                GROUP BY 1 ORDER BY 2 DESC
-            """
-            service_df = pd.read_sql_query(service_query, conn)
+            service_df = pd.read_sql_query(SERVICE_BREAKDOWN_SQL, conn, params=(days_ago(30),))
 
         finally:
             conn.close()
@@ -55,15 +68,7 @@ class CustomerDataAnalyzer:
         """Find customers who have not had a completed service in over 90 days."""
         conn = get_db_connection()
         try:
-            query = """
-                SELECT c.id, c.name, MAX(j.completed_at) as last_service
-                FROM customers c
-                LEFT JOIN jobs j ON c.id = j.customer_id AND j.status = 'completed'
-                GROUP BY c.id
-                HAVING last_service IS NULL OR last_service < date('now', '-90 days')
-                ORDER BY last_service ASC
-            """
-            at_risk_df = pd.read_sql_query(query, conn)
+            at_risk_df = pd.read_sql_query(AT_RISK_CUSTOMERS_SQL, conn, params=(days_ago(90),))
         finally:
             conn.close()
         return at_risk_df.to_dict('records')
@@ -0,0 +1,280 @@
+import json
+from datetime import date, timedelta
+import numpy as np
+from models.database import (
+    get_db_connection, drop_indexes, ensure_indexes, suspend_derived_data, rebuild_derived_data,
+    CONNECTION_PRAGMAS
+)
+
+# Named dataset sizes shared by the seed command, benchmarks and load tests.
+DATASET_SIZES = {
+    'tiny':   {'customers': 200,     'technicians': 5,  'jobs': 2000,      'quotes': 200,    'parts': 100},
+    'small':  {'customers': 2000,    'technicians': 10, 'jobs': 20000,     'quotes': 2000,   'parts': 500},
+    'medium': {'customers': 20000,   'technicians': 25, 'jobs': 200000,    'quotes': 20000,  'parts': 2000},
+    'large':  {'customers': 200000,  'technicians': 50, 'jobs': 2000000,   'quotes': 200000, 'parts': 5000},
+}
+
+FIRST_NAMES = ['James', 'Mary', 'John', 'Patricia', 'Robert', 'Jennifer', 'Michael', 'Linda', 'William',
+               'Elizabeth', 'David', 'Barbara', 'Richard', 'Susan', 'Joseph', 'Jessica', 'Thomas', 'Sarah',
+               'Charles', 'Karen', 'Daniel', 'Nancy', 'Matthew', 'Lisa', 'Anthony', 'Betty', 'Mark', 'Sandra']
+LAST_NAMES = ['Smith', 'Johnson', 'Williams', 'Brown', 'Jones', 'Garcia', 'Miller', 'Davis', 'Rodriguez',
+              'Martinez', 'Hernandez', 'Lopez', 'Gonzalez', 'Wilson', 'Anderson', 'Thomas', 'Taylor', 'Moore',
+              'Jackson', 'Martin', 'Lee', 'Perez', 'Thompson', 'White', 'Harris', 'Sanchez', 'Clark', 'Chen']
+STREETS = ['Main St', 'Oak Ave', 'Maple Dr', 'Pine St', 'Elm St', 'Cedar Ln', 'Lake Rd', 'Hill St',
+           'Park Ave', 'River Rd', 'Church St', 'Spring St', 'Amherst St', 'Daniel Webster Hwy']
+# (town, ZIP, latitude, longitude of the town centre)
+TOWNS = [('Nashua', '03060', 42.7654, -71.4676), ('Hudson', '03051', 42.7648, -71.4398),
+         ('Merrimack', '03054', 42.8651, -71.4934), ('Manchester', '03101', 42.9956, -71.4548),
+         ('Amherst', '03031', 42.8615, -71.6251), ('Milford', '03055', 42.8354, -71.6490),
+         ('Hollis', '03049', 42.7431, -71.5917), ('Londonderry', '03053', 42.8651, -71.3740)]
+PREFERRED_TIMES = ['["morning"]', '["afternoon"]', '["morning", "afternoon"]', '[]']
+SKILLS = ['residential', 'commercial', 'refrigeration', 'heat pump', 'boiler', 'ductwork']
+
+# (job_type, share of jobs, median job value)
+JOB_TYPES = [
+    ('maintenance', 0.45, 150.0),
+    ('repair', 0.30, 420.0),
+    ('installation', 0.10, 6500.0),
+    ('inspection', 0.10, 120.0),
+    ('emergency', 0.05, 650.0),
+]
+QUOTE_STATUSES = (['draft', 'sent', 'approved', 'declined'], [0.15, 0.35, 0.35, 0.15])
+PART_KINDS = ['Capacitor', 'Contactor', 'Blower Motor', 'Air Filter', 'Thermostat', 'Igniter',
+              'Flame Sensor', 'Condenser Fan Motor', 'Refrigerant R-410A', 'Drain Pan', 'Compressor',
+              'Expansion Valve', 'Pressure Switch', 'Circuit Board', 'Duct Tape', 'Fuse']
+LINE_ITEMS = [('Labor (per hour)', 95.0), ('Diagnostic fee', 89.0), ('Refrigerant recharge', 250.0),
+              ('Replacement part', 180.0), ('Ductwork section', 320.0), ('Disposal fee', 75.0)]
+
+WEEKLY_AVAILABILITY = json.dumps({day: ['08:00', '17:00'] for day in ('mon', 'tue', 'wed', 'thu', 'fri')})
+TIME_SLOTS = np.array([f"{h:02d}:{m:02d}" for h in range(8, 17) for m in (0, 30)])
+
+# Bulk-load settings: a crash mid-seed only loses synthetic data, and a large
+# in-memory sort area makes building the indexes afterwards much faster.
+BULK_LOAD_PRAGMAS = (
+    "PRAGMA synchronous = OFF",
+    "PRAGMA cache_size = -262144",    # 256 MB
+    "PRAGMA temp_store = MEMORY",
+    "PRAGMA threads = 4",             # parallel sorter for the index builds
+)
+
+
+def _timestamps(values):
+    """datetime64[s] array -> 'YYYY-MM-DD HH:MM:SS' strings, matching CURRENT_TIMESTAMP."""
+    return [value.replace('T', ' ') for value in np.datetime_as_string(values).tolist()]
+
+
+def _insert_chunks(conn, sql, rows, chunk_size):
+    """executemany in fixed-size chunks, one transaction per chunk."""
+    for start in range(0, len(rows), chunk_size):
+        conn.execute('BEGIN')
+        conn.executemany(sql, rows[start:start + chunk_size])
+        conn.commit()
+
+
+def _seasonal_day_weights(days, start):
+    """Heavier demand in mid-summer and mid-winter, lighter in spring and autumn."""
+    day_of_year = (np.arange(days) + start.timetuple().tm_yday) % 365
+    return 1.0 + 0.6 * np.cos(4 * np.pi * (day_of_year - 15) / 365) ** 2
+
+
+class DatasetGenerator:
+    """
+    Fills the schema with a reproducible, production-shaped dataset.
+    Rows are built as NumPy arrays and written with chunked executemany calls.
+    """
+    def __init__(self, seed=42, years=3, today=None, chunk_size=50000):
+        self.rng = np.random.default_rng(seed)
+        self.today = today or date.today()
+        self.start = self.today - timedelta(days=365 * years)
+        self.chunk_size = chunk_size
+
+    def generate(self, customers, technicians, jobs, quotes, parts):
+        conn = get_db_connection()
+        try:
+            for pragma in BULK_LOAD_PRAGMAS:
+                conn.execute(pragma)
+            cursor = conn.cursor()
+            # Building indexes, rollups and the search index once after the load
+            # is far cheaper than maintaining them row by row
+            drop_indexes(cursor)
+            suspend_derived_data(cursor)
+            conn.commit()
+            counts = {
+                'customers': self._customers(conn, customers),
+                'technicians': self._technicians(conn, technicians),
+                'parts': self._parts(conn, parts),
+            }
+            counts['jobs'] = self._jobs(conn, jobs)
+            counts['quotes'], counts['quote_line_items'] = self._quotes(conn, quotes)
+        except BaseException:
+            # A failed or interrupted load still gets its indexes and triggers back
+            conn.rollback()
+            self._restore(conn)
+            raise
+        else:
+            self._restore(conn)
+            conn.execute('ANALYZE')
+        finally:
+            # The connection goes back to the pool; restore the normal settings
+            for pragma in CONNECTION_PRAGMAS + ("PRAGMA temp_store = DEFAULT", "PRAGMA threads = 0"):
+                conn.execute(pragma)
+            conn.close()
+        return counts
+
+    @staticmethod
+    def _restore(conn):
+        """Rebuild the indexes and derived data dropped for the load, whatever rows it wrote."""
+        conn.execute('BEGIN')
+        cursor = conn.cursor()
+        ensure_indexes(cursor)
+        rebuild_derived_data(cursor)
+        conn.commit()
+
+    def _id_range(self, conn, table, count):
+        """
+        Ids for count new rows, inserted explicitly so children can reference
+        them. AUTOINCREMENT keeps counting from sqlite_sequence, which runs past
+        MAX(id) after deletes, so neither is reused.
+        """
+        last = conn.execute(f'SELECT COALESCE(MAX(id), 0) FROM {table}').fetchone()[0]
+        row = conn.execute('SELECT seq FROM sqlite_sequence WHERE name = ?', (table,)).fetchone()
+        first = max(last, row[0] if row else 0) + 1
+        return np.arange(first, first + count)
+
+    def _customers(self, conn, count):
+        rng = self.rng
+        ids = self._id_range(conn, 'customers', count)
+        first = rng.choice(FIRST_NAMES, count)
+        last = rng.choice(LAST_NAMES, count)
+        towns = rng.integers(0, len(TOWNS), count)
+        numbers = rng.integers(1, 9999, count)
+        streets = rng.choice(STREETS, count)
+        phones = rng.integers(0, 10000, count)
+        prefs = rng.choice(PREFERRED_TIMES, count)
+        # Scatter homes a few kilometres around their town centre
+        lat = np.round(np.array([TOWNS[t][2] for t in towns]) + rng.normal(0, 0.02, count), 5)
+        lon = np.round(np.array([TOWNS[t][3] for t in towns]) + rng.normal(0, 0.025, count), 5)
+        rows = [
+            (i, f"{f} {l}", f"555-{p:04d}", f"{f.lower()}.{l.lower()}{i}@example.com",
+             f"{n} {st}, {TOWNS[t][0]}, NH {TOWNS[t][1]}", None, pref, la, lo)
+            for i, f, l, p, n, st, t, pref, la, lo in zip(
+                ids.tolist(), first.tolist(), last.tolist(), phones.tolist(), numbers.tolist(),
+                streets.tolist(), towns.tolist(), prefs.tolist(), lat.tolist(), lon.tolist())
+        ]
+        _insert_chunks(conn, "INSERT INTO customers (id, name, phone, email, address, notes, preferred_time, "
+                             "lat, lon) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", rows, self.chunk_size)
+        self.customer_ids = ids
+        return count
+
+    def _technicians(self, conn, count):
+        rng = self.rng
+        self.technician_ids = self._id_range(conn, 'technicians', count)
+        rows = []
+        for i, technician_id in enumerate(self.technician_ids.tolist()):
+            skills = sorted(rng.choice(SKILLS, rng.integers(1, 4), replace=False).tolist())
+            name = f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}"
+            rows.append((technician_id, name, f"555-{2000 + i:04d}", f"tech{i}@hvacpro.com", json.dumps(skills),
+                         WEEKLY_AVAILABILITY, float(rng.integers(30, 60))))
+        _insert_chunks(conn, "INSERT INTO technicians (id, name, phone, email, skills, availability, hourly_rate) "
+                             "VALUES (?, ?, ?, ?, ?, ?, ?)", rows, self.chunk_size)
+        return count
+
+    def _parts(self, conn, count):
+        rng = self.rng
+        kinds = rng.choice(PART_KINDS, count)
+        cost = np.round(rng.lognormal(3.5, 1.0, count), 2)
+        rows = [
+            (f"{kind} #{i}", f"SKU-{100000 + i}", int(qty), float(c), float(round(c * margin, 2)))
+            for i, (kind, qty, c, margin) in enumerate(zip(kinds.tolist(), rng.integers(0, 200, count).tolist(),
+                                                          cost.tolist(), rng.uniform(1.3, 2.2, count).tolist()))
+        ]
+        _insert_chunks(conn, "INSERT INTO parts (name, sku, quantity_on_hand, cost_price, sale_price) "
+                             "VALUES (?, ?, ?, ?, ?)", rows, self.chunk_size)
+        return count
+
+    def _jobs(self, conn, count):
+        if not count:
+            return 0
+        rng = self.rng
+        horizon = (self.today - self.start).days + 30   # include the next month of bookings
+        weights = _seasonal_day_weights(horizon, self.start)
+        day_offsets = rng.choice(horizon, count, p=weights / weights.sum())
+        slots = rng.integers(0, len(TIME_SLOTS), count)
+        # Insert in booking order so ids grow with time, as they do in production
+        order = np.lexsort((slots, day_offsets))
+        day_offsets, slots = day_offsets[order], slots[order]
+        dates = np.datetime64(self.start.isoformat()) + day_offsets.astype('timedelta64[D]')
+
+        # A minority of customers generate most of the work
+        customer_idx = np.minimum((rng.pareto(1.2, count) * len(self.customer_ids) / 8).astype(int),
+                                  len(self.customer_ids) - 1)
+        customers = self.customer_ids[rng.permutation(len(self.customer_ids))][customer_idx]
+        technicians = rng.choice(self.technician_ids, count)
+
+        type_idx = rng.choice(len(JOB_TYPES), count, p=[share for _, share, _ in JOB_TYPES])
+        job_types = np.array([name for name, _, _ in JOB_TYPES])[type_idx]
+        medians = np.array([median for _, _, median in JOB_TYPES])[type_idx]
+        values = np.round(medians * rng.lognormal(0, 0.35, count), 2)
+
+        times = TIME_SLOTS[slots]
+
+        today = np.datetime64(self.today.isoformat())
+        past = dates < today
+        roll = rng.random(count)
+        status = np.where(past, np.where(roll < 0.90, 'completed', np.where(roll < 0.97, 'cancelled', 'no_show')),
+                          'scheduled')
+        completed = status == 'completed'
+        finish = (dates.astype('datetime64[m]') + (480 + slots * 30).astype('timedelta64[m]')
+                  + rng.integers(45, 240, count).astype('timedelta64[m]'))
+        completed_at = np.full(count, None, dtype=object)
+        completed_at[completed] = _timestamps(finish[completed].astype('datetime64[s]'))
+        date_strings = np.datetime_as_string(dates)
+        followup = completed & (dates < today - np.timedelta64(1, 'D'))
+
+        rows = list(zip(
+            customers.tolist(), technicians.tolist(), job_types.tolist(), status.tolist(),
+            date_strings.tolist(), times.tolist(),
+            completed_at.tolist(),
+            np.where(status == 'cancelled', None, values).tolist(),
+            followup.astype(int).tolist(),
+        ))
+        _insert_chunks(conn, "INSERT INTO jobs (customer_id, technician_id, job_type, status, scheduled_date, "
+                             "scheduled_time, completed_at, job_value, followup_sent) "
+                             "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", rows, self.chunk_size)
+        return count
+
+    def _quotes(self, conn, count):
+        if not count:
+            return 0, 0
+        rng = self.rng
+        ids = self._id_range(conn, 'quotes', count)
+        horizon = (self.today - self.start).days
+        created = (np.datetime64(self.start.isoformat(), 's')
+                   + rng.integers(0, horizon * 86400, count).astype('timedelta64[s]'))
+        created_at = _timestamps(np.sort(created))
+        statuses = rng.choice(QUOTE_STATUSES[0], count, p=QUOTE_STATUSES[1])
+        customers = rng.choice(self.customer_ids, count)
+
+        item_counts = rng.integers(1, 6, count)
+        quote_ids = np.repeat(ids, item_counts)
+        kinds = rng.integers(0, len(LINE_ITEMS), len(quote_ids))
+        quantities = rng.integers(1, 4, len(quote_ids)).astype(float)
+        prices = np.round(np.array([price for _, price in LINE_ITEMS])[kinds] * rng.uniform(0.8, 1.3, len(kinds)), 2)
+        totals = np.round(np.bincount(quote_ids - ids[0], weights=quantities * prices), 2)
+
+        _insert_chunks(conn, "INSERT INTO quotes (id, customer_id, status, total_amount, created_at) "
+                             "VALUES (?, ?, ?, ?, ?)",
+                       list(zip(ids.tolist(), customers.tolist(), statuses.tolist(), totals.tolist(),
+                                created_at)), self.chunk_size)
+        descriptions = np.array([name for name, _ in LINE_ITEMS])[kinds]
+        _insert_chunks(conn, "INSERT INTO quote_line_items (quote_id, description, quantity, unit_price) "
+                             "VALUES (?, ?, ?, ?)",
+                       list(zip(quote_ids.tolist(), descriptions.tolist(), quantities.tolist(), prices.tolist())),
+                       self.chunk_size)
+        return count, len(quote_ids)
+
+
+def generate_dataset(size='small', seed=42, years=3, **overrides):
+    """Seed the current database with a named dataset size (see DATASET_SIZES)."""
+    counts = dict(DATASET_SIZES[size], **{k: v for k, v in overrides.items() if v is not None})
+    return DatasetGenerator(seed=seed, years=years).generate(**counts)
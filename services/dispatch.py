@@ -0,0 +1,370 @@
+"""
+Emergency dispatch queue.
+
+Calls are queued in memory by priority (1 = emergency) and then arrival, and
+a single dispatcher thread drains them in batches. Each batch runs in one
+write transaction against the cached slot bitmaps, so a cold snap's burst of
+calls costs one commit per batch instead of one lock fight per call, and the
+most urgent calls are always placed first.
+
+A call goes to the qualified technician who can arrive soonest, counting the
+drive from the job they will be coming from. If nobody can arrive within
+DISPATCH_PREEMPT_AFTER_MINUTES, a routine job (priority 3 or lower) that is in the way
+may be bumped. The emergency takes its place and the bumped job is
+re-homed like a sick-call repair.
+"""
+import heapq
+import itertools
+import json
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from datetime import datetime
+
+from models.availability import schedule_book, job_duration, parse_hhmm, format_hhmm, ceil_slot
+from models.database import get_db_connection, register_query, is_sqlite
+from models.events import publish_job
+from models.query_log import LatencyHistogram
+from models.scheduler import (
+    HVACScheduler, ACTIVE_TECHNICIANS_SQL, TECHNICIAN_DAY_JOBS_SQL, candidate_days, slot_taken
+)
+from services.route_optimizer import haversine_km, travel_minutes, parse_location
+
+# Jobs at or above this priority number are routine and may be bumped
+BUMPABLE_PRIORITY = 3
+# Assumed drive when the technician's origin or the customer has no location
+UNKNOWN_TRAVEL_MINUTES = 30.0
+
+DISPATCH_DAY_JOBS_SQL = register_query('dispatch_day_jobs', """
+    SELECT j.id, j.technician_id, j.job_type, j.scheduled_time, j.duration_minutes, j.priority, c.lat, c.lon
+    FROM jobs j
+    JOIN customers c ON c.id = j.customer_id
+    WHERE j.scheduled_date = ? AND j.technician_id IS NOT NULL AND j.status = 'scheduled'
+""")
+
+
+class QueueFull(Exception):
+    """Raised when too many calls are already waiting for dispatch."""
+
+
+class Ticket:
+    def __init__(self, call):
+        self.id = uuid.uuid4().hex
+        self.call = call
+        self.submitted = time.perf_counter()
+        self.result = None
+        self._done = threading.Event()
+
+    def finish(self, result):
+        self.result = dict(result, latency_ms=round((time.perf_counter() - self.submitted) * 1000, 1))
+        self._done.set()
+
+    def wait(self, timeout=None):
+        return self.result if self._done.wait(timeout) else None
+
+    def as_dict(self):
+        return dict(self.result or {'status': 'queued'}, ticket=self.id)
+
+
+def parse_call(raw):
+    """Validate an emergency call (the /api/schedule-job fields); raises ValueError."""
+    if not isinstance(raw, dict) or not raw.get('customer_id'):
+        raise ValueError('A customer must be selected.')
+    skills = raw.get('skills') or []
+    if isinstance(skills, str):
+        skills = skills.split(',')
+    if not isinstance(skills, (list, tuple)) or not all(isinstance(s, str) for s in skills):
+        raise ValueError('skills must be a list of names or a comma-separated string.')
+    job_type = str(raw.get('job_type') or 'emergency')
+    try:
+        customer_id = int(raw['customer_id'])
+        priority = min(max(int(raw.get('priority') or 1), 1), 5)
+        duration = job_duration(job_type, raw.get('duration_minutes'))
+    except (TypeError, ValueError):
+        raise ValueError('customer_id, priority and duration_minutes must be numbers.')
+    return {
+        'customer_id': customer_id,
+        'job_type': job_type,
+        'priority': priority,
+        'skills': {s.strip() for s in skills if s.strip()},
+        'duration': duration,
+        'notes': raw.get('notes') or '',
+        'allow_preempt': bool(raw.get('allow_preempt', True)),
+    }
+
+
+class _DayState:
+    """Slots plus each technician's scheduled stops for one day, for arrival estimates."""
+    def __init__(self, conn, day, technicians, scheduler):
+        self.slots = scheduler.day_slots(conn, day, technicians)
+        self.stops = {}
+        for row in conn.execute(DISPATCH_DAY_JOBS_SQL, (day.isoformat(),)):
+            self.add(dict(row))
+
+    def add(self, job):
+        job['start'] = parse_hhmm(job['scheduled_time'])
+        job['end'] = job['start'] + job_duration(job['job_type'], job['duration_minutes'])
+        self.stops.setdefault(job['technician_id'], []).append(job)
+
+    def remove(self, job):
+        self.stops[job['technician_id']] = [j for j in self.stops[job['technician_id']] if j['id'] != job['id']]
+
+    def arrival(self, technician_id, start, customer, now_minute, depot):
+        """Minute the technician can be on site for a job booked at start."""
+        before = [j for j in self.stops.get(technician_id, ()) if j['end'] <= start]
+        origin = max(before, key=lambda j: j['end']) if before else None
+        free_at = max(origin['end'] if origin else 0, now_minute)
+        point = (origin['lat'], origin['lon']) if origin and origin['lat'] is not None else depot
+        if point is None or customer['lat'] is None:
+            drive = UNKNOWN_TRAVEL_MINUTES
+        else:
+            drive = float(travel_minutes(haversine_km(point[0], point[1], customer['lat'], customer['lon'])))
+        return max(start, free_at + drive), drive
+
+
+class Dispatcher:
+    """Places emergency calls (see the module docstring). Runs inside the caller's transaction."""
+    def __init__(self, preempt_after=60, depot=None):
+        self.preempt_after = preempt_after
+        self.depot = depot
+        self.scheduler = HVACScheduler()
+
+    def dispatch_batch(self, conn, calls, touched):
+        """Results for parsed calls in order; every day whose cached slots change is added to touched."""
+        technicians = [dict(row) for row in conn.execute(ACTIVE_TECHNICIANS_SQL).fetchall()]
+        skills = {t['id']: set(json.loads(t['skills'] or '[]')) for t in technicians}
+        names = {t['id']: t['name'] for t in technicians}
+        states, results = {}, []
+        for call in calls:
+            customer = conn.execute('SELECT id, lat, lon FROM customers WHERE id = ?',
+                                    (call['customer_id'],)).fetchone()
+            if customer is None:
+                results.append({'status': 'failed', 'error': f"Unknown customer {call['customer_id']}."})
+                continue
+            eligible = [tid for tid in names if call['skills'] <= skills[tid]]
+            results.append(self._dispatch(conn, call, dict(customer), eligible, technicians, skills, names,
+                                          states, touched))
+        return results
+
+    def _dispatch(self, conn, call, customer, eligible, technicians, skills, names, states, touched):
+        now = datetime.now()
+        for day in candidate_days(call['priority']):
+            touched.add(day)
+            now_minute = now.hour * 60 + now.minute if day == now.date() else 0
+            # Bump only if nobody can arrive soon after now (or after opening, on later days)
+            reference = now_minute if day == now.date() else self.scheduler.business_hours['start'] * 60
+            # The cached day can miss another worker's booking; reload it and look again
+            for _ in range(3):
+                if day not in states:
+                    states[day] = _DayState(conn, day, technicians, self.scheduler)
+                state = states[day]
+                choice = self._best_free(state, call, customer, eligible, now_minute)
+                if call['allow_preempt'] and (choice is None or choice[0] - reference > self.preempt_after):
+                    bump = self._best_bump(state, call, customer, eligible, now_minute)
+                    if bump is not None and (choice is None or bump[0] < choice[0]):
+                        choice = bump
+                if choice is None:
+                    break
+                result = self._book(conn, call, customer, day, state, *choice, technicians, skills, names, touched)
+                if result is not None:
+                    return result
+                schedule_book.invalidate(day)
+                del states[day]
+        return {'status': 'failed', 'error': 'No qualified technician is available.'}
+
+    def _best_free(self, state, call, customer, eligible, now_minute):
+        best = None
+        earliest = ceil_slot(now_minute)
+        for tid, (start, _, _) in state.slots.earliest_fits(call['duration'], earliest, None, eligible).items():
+            eta, drive = state.arrival(tid, start, customer, now_minute, self.depot)
+            if best is None or eta < best[0]:
+                best = (eta, drive, tid, start, None)
+        return best
+
+    def _best_bump(self, state, call, customer, eligible, now_minute):
+        """Soonest arrival reachable by freeing one routine job that has not started."""
+        best = None
+        earliest = ceil_slot(now_minute)
+        for tid in eligible:
+            for job in state.stops.get(tid, ()):
+                if job['start'] < earliest or (job['priority'] or 3) < max(BUMPABLE_PRIORITY, call['priority'] + 1):
+                    continue
+                # The day is shared: hold its lock so no other thread sees the job's slots free
+                with state.slots.lock:
+                    state.slots.release(tid, job['start'], job['end'])
+                    fit = state.slots.earliest_fits(call['duration'], earliest, None, [tid]).get(tid)
+                    state.slots.occupy(tid, job['start'], job['end'])
+                if fit is None or fit[0] + call['duration'] <= job['start'] or fit[0] >= job['end']:
+                    continue  # Freeing this job doesn't make room for the call
+                eta, drive = state.arrival(tid, fit[0], customer, now_minute, self.depot)
+                # Prefer the soonest arrival, then bumping the least urgent job
+                if best is None or (eta, -job['priority']) < (best[0], -best[4]['priority']):
+                    best = (eta, drive, tid, fit[0], job)
+        return best
+
+    def _book(self, conn, call, customer, day, state, eta, drive, technician_id, start, bumped,
+              technicians, skills, names, touched):
+        """Insert the call's job (and re-home any bumped job); None if the database refuses the slot."""
+        if bumped is not None:
+            state.slots.release(technician_id, bumped['start'], bumped['end'])
+            state.remove(bumped)
+        # Book from when the technician can actually be on site, if that is still free
+        on_site = ceil_slot(eta)
+        with state.slots.lock:
+            if on_site != start and state.slots.is_free(technician_id, on_site, on_site + call['duration']):
+                start = on_site
+            end = start + call['duration']
+            # Claim the slots now so another thread can't pick them while the database is checked
+            if not state.slots.reserve(technician_id, start, end):
+                return None
+        if slot_taken(conn, technician_id, day.isoformat(), start, end,
+                      ignore_job=bumped['id'] if bumped else None):
+            state.slots.release(technician_id, start, end)
+            return None
+        cursor = conn.cursor()
+        cursor.execute(
+            "INSERT INTO jobs (customer_id, technician_id, job_type, status, scheduled_date, scheduled_time, "
+            "duration_minutes, priority, notes, required_skills) VALUES (?, ?, ?, 'scheduled', ?, ?, ?, ?, ?, ?)",
+            (call['customer_id'], technician_id, call['job_type'], day.isoformat(), format_hhmm(start),
+             call['duration'], call['priority'], call['notes'],
+             json.dumps(sorted(call['skills'])) if call['skills'] else None)
+        )
+        state.add({'id': cursor.lastrowid, 'technician_id': technician_id, 'job_type': call['job_type'],
+                   'scheduled_time': format_hhmm(start), 'duration_minutes': call['duration'],
+                   'priority': call['priority'], 'lat': customer['lat'], 'lon': customer['lon']})
+        result = {
+            'status': 'dispatched',
+            'job': {'id': cursor.lastrowid, 'technician_id': technician_id, 'technician_name': names[technician_id],
+                    'scheduled_date': day.isoformat(), 'scheduled_time': format_hhmm(start),
+                    'duration_minutes': call['duration']},
+            'eta': format_hhmm(int(round(eta))),
+            'travel_minutes': round(drive),
+            'bumped': None,
+        }
+        if bumped is not None:
+            result['bumped'] = self._rehome(conn, bumped, day, state, technicians, skills, names, touched)
+        return result
+
+    def _rehome(self, conn, bumped, day, state, technicians, skills, names, touched):
+        rows = conn.execute(TECHNICIAN_DAY_JOBS_SQL, (bumped['technician_id'], day.isoformat())).fetchall()
+        job = next(dict(row) for row in rows if row['id'] == bumped['id'])
+        job.update(start=bumped['start'], end=bumped['end'])
+        placement = self.scheduler.rehome_job(conn, job, technicians, skills, touched)
+        if placement is None:
+            conn.execute('UPDATE jobs SET technician_id = NULL WHERE id = ?', (job['id'],))
+            return {'id': job['id'], 'status': 'unplaced'}
+        new_day, technician_id, start = placement
+        conn.execute("UPDATE jobs SET technician_id = ?, scheduled_date = ?, scheduled_time = ? WHERE id = ?",
+                     (technician_id, new_day.isoformat(), format_hhmm(start), job['id']))
+        if new_day == day:
+            state.add(dict(bumped, technician_id=technician_id, scheduled_time=format_hhmm(start)))
+        return {'id': job['id'], 'status': 'rescheduled', 'technician_id': technician_id,
+                'technician_name': names[technician_id], 'scheduled_date': new_day.isoformat(),
+                'scheduled_time': format_hhmm(start)}
+
+
+class DispatchQueue:
+    """
+    In-memory priority queue of calls drained by one background thread.
+    At most max_pending calls may wait; beyond that submit() raises QueueFull.
+    """
+    def __init__(self, dispatcher=None, batch_size=50, max_pending=1000, keep_results=10000):
+        self.dispatcher = dispatcher or Dispatcher()
+        self.batch_size = batch_size
+        self.max_pending = max_pending
+        self.keep_results = keep_results
+        self._heap = []
+        self._seq = itertools.count()
+        self._tickets = OrderedDict()
+        self._cond = threading.Condition()
+        self._thread = None
+        self.latency_ms = LatencyHistogram()
+        self.counters = {'dispatched': 0, 'failed': 0, 'bumped': 0, 'rejected': 0}
+
+    def configure(self, dispatcher=None, batch_size=None, max_pending=None):
+        with self._cond:
+            self.dispatcher = dispatcher or self.dispatcher
+            self.batch_size = batch_size or self.batch_size
+            self.max_pending = max_pending or self.max_pending
+
+    def submit(self, call):
+        """Queue a parsed call; returns its Ticket."""
+        ticket = Ticket(call)
+        with self._cond:
+            if len(self._heap) >= self.max_pending:
+                self.counters['rejected'] += 1
+                raise QueueFull()
+            heapq.heappush(self._heap, (call['priority'], next(self._seq), ticket))
+            self._tickets[ticket.id] = ticket
+            while len(self._tickets) > self.keep_results:
+                self._tickets.popitem(last=False)
+            # Started lazily so no thread exists before a pre-forking server forks
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name='dispatch', daemon=True)
+                self._thread.start()
+            self._cond.notify()
+        return ticket
+
+    def get(self, ticket_id):
+        with self._cond:
+            return self._tickets.get(ticket_id)
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._heap:
+                    self._cond.wait()
+                batch = [heapq.heappop(self._heap)[2] for _ in range(min(self.batch_size, len(self._heap)))]
+            self._dispatch(batch)
+
+    def _dispatch(self, batch):
+        touched = set()
+        conn = get_db_connection()
+        try:
+            if is_sqlite():
+                conn.execute('BEGIN IMMEDIATE')
+            results = self.dispatcher.dispatch_batch(conn, [ticket.call for ticket in batch], touched)
+            conn.commit()
+        except Exception as e:
+            conn.rollback()
+            for day in touched:
+                schedule_book.invalidate(day)
+            results = [{'status': 'failed', 'error': str(e)}] * len(batch)
+        finally:
+            conn.close()
+        for ticket, result in zip(batch, results):
+            if result['status'] == 'dispatched':
+                job = result['job']
+                publish_job('job.created', job['id'], status='scheduled', priority=ticket.call['priority'],
+                            **{k: v for k, v in job.items() if k != 'id'})
+                bumped = result['bumped']
+                if bumped:
+                    publish_job('job.assigned', bumped['id'], technician_id=bumped.get('technician_id'),
+                                scheduled_date=bumped.get('scheduled_date'), scheduled_time=bumped.get('scheduled_time'))
+            ticket.finish(result)
+            with self._cond:
+                self.latency_ms.add(ticket.result['latency_ms'])
+                self.counters['dispatched' if result['status'] == 'dispatched' else 'failed'] += 1
+                if result.get('bumped'):
+                    self.counters['bumped'] += 1
+
+    def metrics(self):
+        with self._cond:
+            return {
+                'pending': len(self._heap),
+                'counters': dict(self.counters),
+                'latency_ms': self.latency_ms.as_dict(),
+            }
+
+
+dispatch_queue = DispatchQueue()
+
+
+def configure_dispatch(config):
+    dispatch_queue.configure(
+        dispatcher=Dispatcher(preempt_after=config.get('DISPATCH_PREEMPT_AFTER_MINUTES', 60),
+                              depot=parse_location(config.get('DEPOT_LOCATION'))),
+        batch_size=config.get('DISPATCH_BATCH_SIZE', 50),
+        max_pending=config.get('DISPATCH_MAX_PENDING', 1000),
+    )
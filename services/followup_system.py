@@ -4,9 +4,24 @@ import os
 from twilio.rest import Client
 from sendgrid import SendGridAPIClient
 from sendgrid.helpers.mail import Mail
-from models.database import get_db_connection
+from models.database import get_db_connection, register_query
 import atexit
 
+# Range on completed_at (not DATE(completed_at)) so the partial pending-followup index applies
+PENDING_FOLLOWUPS_SQL = register_query('pending_followups', """
+    SELECT j.id, j.job_type, c.name, c.email, c.phone FROM jobs j
+    JOIN customers c ON j.customer_id = c.id
+    WHERE j.completed_at >= ? AND j.completed_at < ?
+    AND j.status = 'completed' AND j.followup_sent = 0
+""")
+
+# Every customer is a candidate; the jobs subquery must stay on an index.
+MAINTENANCE_DUE_SQL = register_query('maintenance_due', """
+    SELECT c.name, c.email, c.phone FROM customers c WHERE c.id NOT IN (
+        SELECT DISTINCT j.customer_id FROM jobs j WHERE j.job_type = 'maintenance' AND j.completed_at > ?
+    )
+""", allow_scan=('c',))
+
 class FollowUpAutomation:
     def __init__(self):
         self.twilio_client = self._init_twilio()
@@ -40,13 +55,10 @@ class FollowUpAutomation:
         """Send a satisfaction survey for jobs completed yesterday."""
         print("Running daily followup check...")
         yesterday = (datetime.now() - timedelta(days=1)).strftime('%Y-%m-%d')
+        today = datetime.now().strftime('%Y-%m-%d')
         conn = get_db_connection()
         try:
-            jobs = conn.execute("""
-                SELECT j.id, j.job_type, c.name, c.email, c.phone FROM jobs j
-                JOIN customers c ON j.customer_id = c.id
-                WHERE DATE(j.completed_at) = ? AND j.status = 'completed' AND j.followup_sent = 0
-            """, (yesterday,)).fetchall()
+            jobs = conn.execute(PENDING_FOLLOWUPS_SQL, (yesterday, today)).fetchall()
 
             for job in jobs:
                 print(f"Sending survey for job {job['id']} to {job['name']}")
@@ -81,11 +93,7 @@ class FollowUpAutomation:
         six_months_ago = (datetime.now() - timedelta(days=180)).strftime('%Y-%m-%d')
         conn = get_db_connection()
         try:
-            customers = conn.execute("""
-                SELECT c.name, c.email, c.phone FROM customers c WHERE c.id NOT IN (
-                    SELECT DISTINCT j.customer_id FROM jobs j WHERE j.job_type = 'maintenance' AND j.completed_at > ?
-                )
-            """, (six_months_ago,)).fetchall()
+            customers = conn.execute(MAINTENANCE_DUE_SQL, (six_months_ago,)).fetchall()
 
             for customer in customers:
                  self._send_maintenance_reminder(dict(customer))
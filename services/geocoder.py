@@ -0,0 +1,285 @@
+"""
+Offline geocoding of customer addresses.
+
+Addresses are free text, so they are first normalised ('123 Main Street,
+Nashua NH' and '123 MAIN ST., Nashua, N.H.' share one key) and then
+resolved against a local gazetteer CSV of street, ZIP and town centroids,
+most specific match first. Every result, misses included, is cached in
+geocode_cache under the normalised key, so a backfill resolves each distinct
+address once and nothing ever goes over the network. Cached rows carry a hash
+of the gazetteer that produced them; once GAZETTEER_PATH points elsewhere or
+the file is edited, they count as misses and are resolved again.
+
+The gazetteer has the columns zip, city, state, street, lat, lon. Rows with
+a street are street centroids; rows without are ZIP (or, without a ZIP,
+town) centroids. A town with no row of its own sits at the mean of its ZIPs.
+"""
+import csv
+import hashlib
+import io
+import os
+import re
+import threading
+from collections import namedtuple
+
+from models.database import get_db_connection, register_query, is_sqlite
+
+DEFAULT_GAZETTEER = os.path.join(os.path.dirname(__file__), 'data', 'gazetteer.csv')
+
+# USPS abbreviations, so spelling variants of one street share a key
+ABBREVIATIONS = {
+    'STREET': 'ST', 'AVENUE': 'AVE', 'AV': 'AVE', 'ROAD': 'RD', 'DRIVE': 'DR', 'LANE': 'LN',
+    'COURT': 'CT', 'PLACE': 'PL', 'BOULEVARD': 'BLVD', 'HIGHWAY': 'HWY', 'PARKWAY': 'PKWY',
+    'TERRACE': 'TER', 'CIRCLE': 'CIR', 'SQUARE': 'SQ', 'TURNPIKE': 'TPKE', 'EXTENSION': 'EXT',
+    'NORTH': 'N', 'SOUTH': 'S', 'EAST': 'E', 'WEST': 'W', 'MOUNT': 'MT', 'SAINT': 'ST',
+}
+STATES = {
+    'NEW HAMPSHIRE': 'NH', 'MASSACHUSETTS': 'MA', 'MAINE': 'ME', 'VERMONT': 'VT',
+    'RHODE ISLAND': 'RI', 'CONNECTICUT': 'CT', 'NEW YORK': 'NY',
+}
+STATE_CODES = set(STATES.values()) | set(
+    'AL AK AZ AR CA CO DE DC FL GA HI ID IL IN IA KS KY LA MD MI MN MS MO MT NE NV NJ NM NC ND '
+    'OH OK OR PA SC SD TN TX UT VA WA WV WI WY'.split()
+)
+# Unit designators; they and everything after them are dropped from the street
+UNITS = {'APT', 'APARTMENT', 'UNIT', 'STE', 'SUITE', 'FL', 'FLOOR', 'RM', 'ROOM', '#'}
+
+_ZIP = re.compile(r'\d{5}')
+_ZIP_PLUS_FOUR = re.compile(r'\b(\d{5})-\d{4}\b')
+_HOUSE_NUMBER = re.compile(r'^\d+[A-Z]?$')
+
+Address = namedtuple('Address', 'number street city state zip')
+
+CACHED_GEOCODES_SQL = register_query('cached_geocodes', """
+    SELECT address_key, lat, lon, precision FROM geocode_cache WHERE address_key IN (?) AND gazetteer = ?
+""")
+
+UNGEOCODED_CUSTOMERS_SQL = register_query('ungeocoded_customers', """
+    SELECT id, address FROM customers
+    WHERE id > ? AND lat IS NULL AND address IS NOT NULL
+    ORDER BY id LIMIT ?
+""")
+
+ALL_CUSTOMER_ADDRESSES_SQL = register_query('all_customer_addresses', """
+    SELECT id, address FROM customers
+    WHERE id > ? AND address IS NOT NULL
+    ORDER BY id LIMIT ?
+""")
+
+
+def _words(text):
+    return re.sub(r'[^\w#\s]', ' ', text.upper()).split()
+
+
+def _abbreviate(words):
+    return ' '.join(ABBREVIATIONS.get(word, word) for word in words)
+
+
+def parse_address(text):
+    """Split free text into normalised number, street, city, state and ZIP ('' when absent)."""
+    text = _ZIP_PLUS_FOUR.sub(r'\1', (text or '').upper().replace('N.H.', 'NH'))
+    parts = [_words(part) for part in text.split(',')]
+    parts = [part for part in parts if part]
+    zip_code = ''
+    if parts:
+        # The ZIP ends the address; a leading five-digit group is a house number
+        last = parts[-1]
+        for i in range(len(last) - 1, -1 if len(parts) > 1 else 0, -1):
+            if _ZIP.fullmatch(last[i]):
+                zip_code, parts[-1] = last[i], last[:i] + last[i + 1:]
+                break
+    parts = [part for part in parts if part]
+    if not parts:
+        return Address('', '', '', '', zip_code)
+
+    state = ''
+    last = ' '.join(parts[-1])
+    for name, code in STATES.items():
+        if last.endswith(name):
+            state, parts[-1] = code, _words(last[:-len(name)])
+            break
+    else:
+        if parts[-1][-1] in STATE_CODES and (len(parts) > 1 or len(parts[-1]) > 1):
+            state, parts[-1] = parts[-1][-1], parts[-1][:-1]
+    parts = [part for part in parts if part]
+
+    street_words = parts[0] if parts else []
+    city = ' '.join(parts[1]) if len(parts) > 1 else ''
+    number = ''
+    if street_words and _HOUSE_NUMBER.match(street_words[0]):
+        number, street_words = street_words[0], street_words[1:]
+    for i, word in enumerate(street_words):
+        if word in UNITS or word.startswith('#'):
+            street_words = street_words[:i]
+            break
+    return Address(number, _abbreviate(street_words), city, state, zip_code)
+
+
+def normalise_address(text):
+    """Cache key for an address, e.g. '123 MAIN ST, NASHUA, NH 03060'."""
+    address = parse_address(text)
+    street = f"{address.number} {address.street}".strip()
+    region = f"{address.state} {address.zip}".strip()
+    return ', '.join(part for part in (street, address.city, region) if part)
+
+
+class Gazetteer:
+    """Street, ZIP and town centroids from a gazetteer CSV, in memory."""
+    def __init__(self, rows, signature=None):
+        self.signature = signature
+        self.streets, self.zips, self.towns = {}, {}, {}
+        town_points = {}
+        for row in rows:
+            point = (float(row['lat']), float(row['lon']))
+            city = ' '.join(_words(row.get('city') or ''))
+            state = (row.get('state') or '').strip().upper()
+            street = _abbreviate(_words(row.get('street') or ''))
+            zip_code = (row.get('zip') or '').strip()
+            if street:
+                self.streets[(street, city, state)] = point
+            elif zip_code:
+                self.zips[zip_code] = point
+                town_points.setdefault((city, state), []).append(point)
+            elif city:
+                self.towns[(city, state)] = point
+        for town, points in town_points.items():
+            if town[0] and town not in self.towns:
+                self.towns[town] = (sum(p[0] for p in points) / len(points),
+                                    sum(p[1] for p in points) / len(points))
+        # Towns whose name is unique, for addresses that leave out the state
+        by_city = {}
+        for city, state in self.towns:
+            by_city.setdefault(city, []).append(state)
+        self.unique_towns = {city: self.towns[(city, states[0])]
+                             for city, states in by_city.items() if len(states) == 1}
+
+    @classmethod
+    def load(cls, path):
+        with open(path, 'rb') as f:
+            data = f.read()
+        rows = csv.DictReader(io.StringIO(data.decode('utf-8'), newline=''))
+        return cls(list(rows), hashlib.sha1(data).hexdigest())
+
+    def resolve(self, address):
+        """(lat, lon, precision) for a parsed Address, or None; precision is street, zip or town."""
+        if address.street and address.city:
+            point = self.streets.get((address.street, address.city, address.state))
+            if point:
+                return point + ('street',)
+        if address.zip in self.zips:
+            return self.zips[address.zip] + ('zip',)
+        if address.city:
+            point = self.towns.get((address.city, address.state)) or \
+                (None if address.state else self.unique_towns.get(address.city))
+            if point:
+                return point + ('town',)
+        return None
+
+
+class Geocoder:
+    """
+    Resolves addresses through the geocode_cache table and the gazetteer.
+    The gazetteer file is read on first use.
+    """
+    def __init__(self, path=DEFAULT_GAZETTEER):
+        self.path = path
+        self._gazetteer = None
+        self._lock = threading.Lock()
+
+    def configure(self, path=None):
+        with self._lock:
+            self.path = path or DEFAULT_GAZETTEER
+            self._gazetteer = None
+
+    @property
+    def gazetteer(self):
+        if self._gazetteer is None:
+            with self._lock:
+                if self._gazetteer is None:
+                    self._gazetteer = Gazetteer.load(self.path)
+        return self._gazetteer
+
+    def _cached(self, conn, keys, chunk=500):
+        """Cached results for keys, leaving out those resolved against another gazetteer."""
+        keys, found = list(keys), {}
+        for i in range(0, len(keys), chunk):
+            batch = keys[i:i + chunk]
+            sql = CACHED_GEOCODES_SQL.replace('(?)', f"({', '.join('?' * len(batch))})")
+            for row in conn.execute(sql, batch + [self.gazetteer.signature]):
+                found[row['address_key']] = (row['lat'], row['lon'], row['precision'])
+        return found
+
+    def _resolve(self, conn, keys):
+        """{key: (lat, lon, precision)} for normalised keys, filling the cache for misses."""
+        results = self._cached(conn, keys)
+        misses = [key for key in keys if key not in results]
+        for key in misses:
+            results[key] = self.gazetteer.resolve(parse_address(key)) or (None, None, None)
+        conn.executemany(
+            "INSERT OR REPLACE INTO geocode_cache (address_key, lat, lon, precision, gazetteer) "
+            "VALUES (?, ?, ?, ?, ?)",
+            [(key, *results[key], self.gazetteer.signature) for key in misses]
+        )
+        return results
+
+    def geocode(self, address, conn=None):
+        """(lat, lon, precision) for a free-text address, or None if the gazetteer has no match."""
+        key = normalise_address(address)
+        if not key:
+            return None
+        own = conn is None
+        conn = conn or get_db_connection()
+        try:
+            lat, lon, precision = self._resolve(conn, [key])[key]
+            if own:
+                conn.commit()
+        finally:
+            if own:
+                conn.close()
+        return (lat, lon, precision) if lat is not None else None
+
+    def backfill(self, batch_size=1000, refresh=False):
+        """
+        Fill lat/lon for customers that have none (every customer with refresh,
+        which also discards cached results). Each batch resolves its distinct
+        addresses once and commits on its own, so an interrupted run resumes
+        where it stopped. Returns counts of customers seen and located.
+        """
+        sql = ALL_CUSTOMER_ADDRESSES_SQL if refresh else UNGEOCODED_CUSTOMERS_SQL
+        stats = {'customers': 0, 'located': 0, 'distinct_addresses': 0}
+        conn = get_db_connection()
+        try:
+            if refresh:
+                conn.execute('DELETE FROM geocode_cache')
+                conn.commit()
+            last_id = 0
+            while True:
+                rows = conn.execute(sql, (last_id, batch_size)).fetchall()
+                if not rows:
+                    break
+                last_id = rows[-1]['id']
+                if is_sqlite():
+                    conn.execute('BEGIN IMMEDIATE')
+                keys = {row['id']: normalise_address(row['address']) for row in rows}
+                distinct = {key for key in keys.values() if key}
+                results = self._resolve(conn, distinct)
+                updates = [(results[key][0], results[key][1], customer_id)
+                           for customer_id, key in keys.items() if key and results[key][0] is not None]
+                conn.executemany('UPDATE customers SET lat = ?, lon = ? WHERE id = ?', updates)
+                conn.commit()
+                stats['customers'] += len(rows)
+                stats['located'] += len(updates)
+                stats['distinct_addresses'] += len(distinct)
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            conn.close()
+        return stats
+
+
+geocoder = Geocoder()
+
+
+def configure_geocoder(config):
+    geocoder.configure(config.get('GAZETTEER_PATH'))
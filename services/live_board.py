@@ -0,0 +1,135 @@
+"""
+Live dispatch board over server-sent events.
+
+Write paths publish job.* events on the in-process bus. One board thread per
+process wakes on those (or every BOARD_POLL_SECONDS, which catches writes made
+by other workers) and re-reads today's dashboard snapshot. That read is a single
+version check unless jobs changed. It then publishes only what changed:
+board.row for a new or edited row, board.remove for a row that left today,
+and board.kpis with the new values and their deltas.
+
+Streams hold no database connection and block on their own queue, so an
+open board costs a parked thread, not a busy worker. Streams end after
+EVENT_STREAM_MAX_SECONDS and the browser reconnects with Last-Event-ID,
+so threads are recycled without losing events.
+"""
+import threading
+import time
+from datetime import date
+
+from models.events import event_bus, format_sse
+from services.dashboard import dashboard_stats
+
+# Columns the board renders for each of today's jobs
+BOARD_COLUMNS = ('id', 'scheduled_time', 'customer_name', 'address', 'job_type', 'technician_id',
+                 'technician_name', 'status', 'scheduled_date')
+
+
+class LiveBoard:
+    def __init__(self, stats=None, bus=None, poll_seconds=5.0):
+        self.stats = stats or dashboard_stats
+        self.bus = bus or event_bus
+        self.poll_seconds = poll_seconds
+        self._day = None
+        self._version = None
+        self._rows = {}
+        self._kpis = {}
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def configure(self, poll_seconds=None):
+        self.poll_seconds = poll_seconds or self.poll_seconds
+
+    def ensure_started(self):
+        # Started on the first stream, so no thread exists before a pre-forking server forks
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name='live-board', daemon=True)
+                self._thread.start()
+
+    def snapshot(self):
+        """Today's rows and KPIs as a board.snapshot event (not on the bus, so it has no id)."""
+        self.refresh()
+        with self._lock:
+            return {'kind': 'board.snapshot', 'data': {
+                'date': self._day.isoformat(), 'kpis': dict(self._kpis),
+                'jobs': sorted(self._rows.values(), key=lambda row: (row['scheduled_time'] or '', row['id'])),
+            }}
+
+    def refresh(self):
+        """Re-read today's snapshot and publish what changed since the last one."""
+        today = date.today()
+        current = self.stats.get(today)
+        with self._lock:
+            if current['version'] == self._version and today == self._day:
+                return
+            if self._version is not None and current['version'] < self._version:
+                # Read before a snapshot that has already been applied (the request
+                # thread and the board thread both refresh); publishing it would revert the board
+                return
+            rows = {job['id']: {column: job.get(column) for column in BOARD_COLUMNS} for job in current['jobs']}
+            kpis = current['kpis']
+            if today != self._day:
+                first = self._day is None
+                self._day, self._version, self._rows, self._kpis = today, current['version'], rows, kpis
+                if not first:
+                    self.bus.publish('board.reset', {'date': today.isoformat()})
+                return
+            changed = [row for job_id, row in rows.items() if self._rows.get(job_id) != row]
+            removed = [job_id for job_id in self._rows if job_id not in rows]
+            delta = {key: value - self._kpis.get(key, 0) for key, value in kpis.items()
+                     if value != self._kpis.get(key)}
+            self._version, self._rows, self._kpis = current['version'], rows, kpis
+        for row in changed:
+            self.bus.publish('board.row', row)
+        for job_id in removed:
+            self.bus.publish('board.remove', {'id': job_id})
+        if delta:
+            self.bus.publish('board.kpis', {'kpis': kpis, 'delta': delta})
+
+    def _run(self):
+        # Internal, so browser streams filling EVENT_STREAM_MAX_CLIENTS can't lock the board out
+        listener = self.bus.subscribe(internal=True)
+        while True:
+            events = listener.get(timeout=self.poll_seconds)
+            if listener.lagged:
+                listener.close()
+                listener = self.bus.subscribe(internal=True)
+            if events and not any(event['kind'].startswith('job.') for event in events):
+                continue
+            try:
+                self.refresh()
+            except Exception:
+                # A failed read (e.g. a locked database) is retried on the next wake-up
+                time.sleep(self.poll_seconds)
+
+
+def stream(subscription, first=None, keepalive=15.0, max_seconds=300.0):
+    """
+    text/event-stream body for one client: an optional first event, then bus
+    events as they arrive, keep-alive comments while idle, and a resync event
+    if the client fell too far behind.
+    """
+    try:
+        yield 'retry: 3000\n\n'
+        if first is not None:
+            yield format_sse(first)
+        deadline = time.monotonic() + max_seconds
+        while time.monotonic() < deadline:
+            events = subscription.get(timeout=keepalive)
+            if subscription.lagged:
+                yield format_sse({'kind': 'resync', 'data': {}})
+                return
+            if not events:
+                yield ': keep-alive\n\n'
+            for event in events:
+                yield format_sse(event)
+    finally:
+        subscription.close()
+
+
+live_board = LiveBoard()
+
+
+def configure_live_board(config):
+    live_board.configure(poll_seconds=config.get('BOARD_POLL_SECONDS'))
@@ -0,0 +1,123 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from werkzeug.security import DEFAULT_PBKDF2_ITERATIONS, generate_password_hash, check_password_hash
+
+from models.query_log import LatencyHistogram
+
+
+class HasherBusy(Exception):
+    """Raised when too many hash operations are already queued."""
+
+
+def canonical_method(method):
+    """
+    Method prefix Werkzeug writes into hashes made with `method`, which has the
+    default costs filled in (e.g. 'pbkdf2' -> 'pbkdf2:sha256:600000').
+    """
+    name, *args = method.split(':')
+    if name == 'scrypt':
+        n, r, p = map(int, args) if args else (2 ** 15, 8, 1)
+        return f'scrypt:{n}:{r}:{p}'
+    if name == 'pbkdf2' and len(args) <= 2:
+        hash_name = args[0] if args else 'sha256'
+        iterations = int(args[1]) if len(args) == 2 else DEFAULT_PBKDF2_ITERATIONS
+        return f'pbkdf2:{hash_name}:{iterations}'
+    raise ValueError(f"Invalid hash method '{method}'.")
+
+
+class PasswordHasher:
+    """
+    Hashes and verifies passwords on a small, bounded thread pool.
+
+    Key derivation releases the GIL, so a fixed number of hashing threads caps
+    the CPU a login burst can take while request threads simply wait for their
+    result. At most max_pending operations may be queued or running; callers
+    beyond that wait up to queue_timeout seconds and then get HasherBusy.
+    """
+    def __init__(self, method='pbkdf2:sha256:600000', salt_length=16, workers=2,
+                 max_pending=16, queue_timeout=5.0):
+        self.configure(method, salt_length, workers, max_pending, queue_timeout)
+
+    def configure(self, method, salt_length, workers, max_pending, queue_timeout):
+        self.method = method
+        # Worked out from the settings, so needs_rehash() never waits on the hashing pool
+        self.canonical_method = canonical_method(method)
+        self.salt_length = salt_length
+        self.workers = workers
+        self.queue_timeout = queue_timeout
+        self._slots = threading.BoundedSemaphore(max_pending)
+        if getattr(self, '_executor', None) is not None:
+            self._executor.shutdown(wait=False)
+        self._executor = None
+        self._executor_lock = threading.Lock()
+        self.hash_ms = LatencyHistogram()
+        self.login_ms = LatencyHistogram()
+        self.counters = {'login_success': 0, 'login_failure': 0, 'rejected': 0, 'rehashed': 0}
+        self._lock = threading.Lock()
+
+    def _pool(self):
+        # Created lazily so no threads exist before a pre-forking server forks
+        if self._executor is None:
+            with self._executor_lock:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(self.workers, thread_name_prefix='password-hash')
+        return self._executor
+
+    def _run(self, fn, *args):
+        if not self._slots.acquire(timeout=self.queue_timeout):
+            self.count('rejected')
+            raise HasherBusy()
+        try:
+            start = time.perf_counter()
+            result = self._pool().submit(fn, *args).result()
+            with self._lock:
+                self.hash_ms.add((time.perf_counter() - start) * 1000)
+            return result
+        finally:
+            self._slots.release()
+
+    def hash(self, password):
+        return self._run(generate_password_hash, password, self.method, self.salt_length)
+
+    def verify(self, pwhash, password):
+        return self._run(check_password_hash, pwhash, password)
+
+    def needs_rehash(self, pwhash):
+        """True if a stored hash was made with a different method, cost or salt length."""
+        method, _, rest = pwhash.partition('$')
+        salt = rest.partition('$')[0]
+        return method != self.canonical_method or len(salt) != self.salt_length
+
+    def count(self, name):
+        with self._lock:
+            self.counters[name] += 1
+
+    def record_login(self, elapsed_ms, success):
+        with self._lock:
+            self.login_ms.add(elapsed_ms)
+            self.counters['login_success' if success else 'login_failure'] += 1
+
+    def metrics(self):
+        with self._lock:
+            return {
+                'method': self.method,
+                'workers': self.workers,
+                'counters': dict(self.counters),
+                'login_ms': self.login_ms.as_dict(),
+                'hash_ms': self.hash_ms.as_dict(),
+            }
+
+
+password_hasher = PasswordHasher()
+
+
+def configure_password_hasher(config):
+    password_hasher.configure(
+        method=config.get('PASSWORD_HASH_METHOD', 'pbkdf2:sha256:600000'),
+        salt_length=config.get('PASSWORD_SALT_LENGTH', 16),
+        workers=config.get('PASSWORD_HASH_WORKERS', 2),
+        max_pending=config.get('PASSWORD_HASH_MAX_PENDING', 16),
+        queue_timeout=config.get('PASSWORD_HASH_QUEUE_TIMEOUT', 5.0),
+    )
@@ -0,0 +1,341 @@
+"""
+Daily route optimisation.
+
+Orders each technician's jobs for a day to cut drive time while keeping
+every job inside its time window (the customer's preferred_time, within the
+technician's working hours), then writes the new start times back. Jobs
+already under way or done and unavailable periods stay where they are and
+are driven around, and today's routes start no earlier than now.
+
+Routes start from nearest-neighbour, earliest-deadline and booked orders,
+are repaired until every window is met and are then shortened with 2-opt. Each route's
+distances come from one vectorised haversine matrix and each 2-opt move is
+scored for all segment ends at once, so a 50-technician, 400-job day
+optimises in well under a second.
+"""
+import time
+from datetime import datetime
+
+import numpy as np
+
+from models.availability import (
+    schedule_book, job_duration, working_window, preferred_windows, parse_hhmm, format_hhmm, ceil_slot,
+    INACTIVE_STATUSES
+)
+from models.database import get_db_connection, register_query, is_sqlite
+from models.events import publish_job
+from models.scheduler import DAY_BLOCKS_SQL
+
+EARTH_RADIUS_KM = 6371.0
+AVERAGE_SPEED_KMH = 40.0
+# Road distance is longer than the straight line between two homes
+ROAD_FACTOR = 1.3
+
+DAY_ROUTE_JOBS_SQL = register_query('day_route_jobs', """
+    SELECT j.id, j.technician_id, j.job_type, j.scheduled_time, j.duration_minutes,
+           c.lat, c.lon, c.preferred_time, t.availability
+    FROM jobs j
+    JOIN customers c ON c.id = j.customer_id
+    JOIN technicians t ON t.id = j.technician_id
+    WHERE j.scheduled_date = ? AND j.status = 'scheduled' AND j.scheduled_time IS NOT NULL
+""")
+
+# Booked jobs the optimiser must not move (in progress, completed, ...)
+DAY_FIXED_JOBS_SQL = register_query('day_fixed_jobs', f"""
+    SELECT technician_id, job_type, scheduled_time, duration_minutes
+    FROM jobs
+    WHERE scheduled_date = ? AND technician_id IS NOT NULL AND scheduled_time IS NOT NULL
+      AND status NOT IN ('scheduled', {', '.join(repr(s) for s in INACTIVE_STATUSES)})
+""")
+
+
+def parse_location(value):
+    """'lat,lon' (e.g. from config) -> (lat, lon), or None."""
+    if not value:
+        return None
+    lat, lon = (float(part) for part in str(value).split(','))
+    return lat, lon
+
+
+def haversine_km(lat1, lon1, lat2, lon2):
+    """Great-circle distance in km between points in degrees; broadcasts like NumPy."""
+    lat1, lon1, lat2, lon2 = (np.radians(np.asarray(v, dtype=float)) for v in (lat1, lon1, lat2, lon2))
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0, 1)))
+
+
+def distance_matrix(lat, lon):
+    """Great-circle distances in km between every pair of points (degrees)."""
+    lat, lon = np.asarray(lat, dtype=float), np.asarray(lon, dtype=float)
+    return haversine_km(lat[:, None], lon[:, None], lat[None, :], lon[None, :])
+
+
+def travel_minutes(km):
+    return km * ROAD_FACTOR / AVERAGE_SPEED_KMH * 60
+
+
+def route_matrix(lat, lon, depot=None):
+    """
+    Distances between stops plus a final depot row/column. Without a depot
+    that row is all zeros, which makes the route an open path.
+    """
+    lat, lon = np.asarray(lat, dtype=float), np.asarray(lon, dtype=float)
+    if depot is not None:
+        return distance_matrix(np.append(lat, depot[0]), np.append(lon, depot[1]))
+    distances = np.zeros((len(lat) + 1, len(lat) + 1))
+    distances[:-1, :-1] = distance_matrix(lat, lon)
+    return distances
+
+
+def next_free(start, duration, busy):
+    """Earliest slot-aligned start >= start whose duration misses every busy (start, end), sorted by start."""
+    for low, high in busy:
+        if start < high and low < start + duration:
+            start = ceil_slot(high)
+    return start
+
+
+def arrival(clock, drive, service, window, busy):
+    """Start minute at a stop reached drive minutes after clock: in its window and clear of busy time."""
+    return next_free(ceil_slot(max(clock + drive, window[0])), service, busy)
+
+
+def route_lateness(order, travel, service, windows, day_start, day_end, busy=()):
+    """
+    Slot-aligned start minute per stop for visiting in order, and the total
+    minutes by which stops miss their [earliest, latest) window or the day overruns.
+    travel is square over the stops plus a final depot row/column; stops wait
+    out the busy periods.
+    """
+    depot = len(travel) - 1
+    clock, previous, starts, late = day_start, depot, [], 0
+    for stop in order:
+        clock = arrival(clock, travel[previous, stop], service[stop], windows[stop], busy)
+        late += max(clock - (windows[stop][1] - 1), 0)
+        starts.append(clock)
+        clock += service[stop]
+        previous = stop
+    return starts, late + max(clock - day_end, 0)
+
+
+def schedule_route(order, travel, service, windows, day_start, day_end, busy=()):
+    """Start minutes for visiting stops in order, or None if any window is missed."""
+    starts, late = route_lateness(order, travel, service, windows, day_start, day_end, busy)
+    return starts if not late else None
+
+
+def route_length(order, distances):
+    """Length of depot -> stops -> depot; the depot is the last row/column."""
+    path = [len(distances) - 1, *order, len(distances) - 1]
+    return float(distances[path[:-1], path[1:]].sum())
+
+
+def nearest_neighbour(travel, service, windows, day_start, busy=()):
+    """Greedy route: repeatedly drive to the closest stop that can still start inside its window."""
+    remaining = set(range(len(travel) - 1))
+    order, clock, previous = [], day_start, len(travel) - 1
+    while remaining:
+        candidates = sorted(remaining, key=lambda stop: travel[previous, stop])
+        feasible = [stop for stop in candidates
+                    if arrival(clock, travel[previous, stop], service[stop], windows[stop], busy) < windows[stop][1]]
+        # If nothing fits any more, take the tightest window and let the caller reject the route
+        stop = feasible[0] if feasible else min(remaining, key=lambda s: windows[s][1])
+        clock = arrival(clock, travel[previous, stop], service[stop], windows[stop], busy) + service[stop]
+        order.append(stop)
+        remaining.discard(stop)
+        previous = stop
+    return order
+
+
+def two_opt(order, distances, is_feasible):
+    """
+    Reverse segments while that shortens the route and is_feasible(order) holds.
+    For each segment start, every segment end is scored in one vectorised step.
+    """
+    depot = len(distances) - 1
+    route = np.array([depot, *order, depot])
+    n = len(order)
+    improved = True
+    while improved:
+        improved = False
+        for i in range(1, n):
+            j = np.arange(i + 1, n + 1)
+            a, b, c, d = route[i - 1], route[i], route[j], route[j + 1]
+            delta = distances[a, c] + distances[b, d] - distances[a, b] - distances[c, d]
+            for k in np.argsort(delta):
+                if delta[k] > -1e-9:
+                    break
+                candidate = route.copy()
+                candidate[i:j[k] + 1] = candidate[i:j[k] + 1][::-1]
+                if is_feasible(candidate[1:-1].tolist()):
+                    route = candidate
+                    improved = True
+                    break
+    return route[1:-1].tolist()
+
+
+def repair(order, lateness):
+    """
+    Reduce total lateness with the best segment reversal or single-stop move
+    until the route is on time or no move helps.
+    """
+    late = lateness(order)
+    while late:
+        best, best_late = None, late
+        n = len(order)
+        for i in range(n - 1):
+            for j in range(i + 1, n):
+                reversed_ = order[:i] + order[i:j + 1][::-1] + order[j + 1:]
+                moved = order[:i] + order[i + 1:j + 1] + [order[i]] + order[j + 1:]
+                back = order[:i] + [order[j]] + order[i:j] + order[j + 1:]
+                for candidate in (reversed_, moved, back):
+                    candidate_late = lateness(candidate)
+                    if candidate_late < best_late:
+                        best, best_late = candidate, candidate_late
+        if best is None:
+            break
+        order, late = best, best_late
+    return order, late
+
+
+def optimise_route(distances, service, windows, day_start, day_end, current=None, busy=()):
+    """
+    Best order and start times for one technician's stops (see route_matrix),
+    also starting from the current order if given. No stop overlaps the busy
+    (start, end) periods, which must be sorted by start.
+    Returns (order, starts, km) or None when no order found keeps every window.
+    """
+    travel = travel_minutes(distances)
+
+    def lateness(order):
+        return route_lateness(order, travel, service, windows, day_start, day_end, busy)[1]
+
+    # Start from the best of nearest-neighbour, earliest-deadline and current
+    # order, repair any missed windows, then shorten without breaking them
+    starts = [nearest_neighbour(travel, service, windows, day_start, busy),
+              sorted(range(len(service)), key=lambda stop: (windows[stop][1], windows[stop][0]))]
+    if current is not None:
+        starts.append(list(current))
+    order, late = min((repair(order, lateness) for order in starts), key=lambda result: result[1])
+    if late:
+        return None
+    order = two_opt(order, distances, lambda candidate: not lateness(candidate))
+    return order, route_lateness(order, travel, service, windows, day_start, day_end, busy)[0], \
+        route_length(order, distances)
+
+
+def overlapping(intervals):
+    """Whether any two (start, end) intervals overlap."""
+    intervals = sorted(intervals)
+    return any(b[0] < a[1] for a, b in zip(intervals, intervals[1:]))
+
+
+def day_busy(conn, iso_day):
+    """{technician_id: sorted (start, end) minutes} of fixed jobs and unavailable periods on a date."""
+    busy = {}
+    for row in conn.execute(DAY_FIXED_JOBS_SQL, (iso_day,)):
+        start = parse_hhmm(row['scheduled_time'])
+        busy.setdefault(row['technician_id'], []).append(
+            (start, start + job_duration(row['job_type'], row['duration_minutes'])))
+    for row in conn.execute(DAY_BLOCKS_SQL, (iso_day,)):
+        busy.setdefault(row['technician_id'], []).append((parse_hhmm(row['start_time']), parse_hhmm(row['end_time'])))
+    return {technician_id: sorted(periods) for technician_id, periods in busy.items()}
+
+
+def optimise_day(day, business_hours, depot=None):
+    """
+    Re-sequence every technician's scheduled jobs on a date and write the new
+    start times. Runs under the write lock so no booking lands mid-way; each
+    new timeline is checked against the jobs and blocks read under that lock
+    before it is written. Returns a per-technician summary.
+    """
+    iso_day = day.isoformat()
+    started = time.perf_counter()
+    # Nothing is moved into the past: today starts now, earlier days not at all
+    now = datetime.now()
+    earliest = 0
+    if day == now.date():
+        earliest = now.hour * 60 + now.minute
+    elif day < now.date():
+        earliest = 24 * 60
+    conn = get_db_connection()
+    try:
+        if is_sqlite():
+            conn.execute('BEGIN IMMEDIATE')
+        routes = {}
+        for row in conn.execute(DAY_ROUTE_JOBS_SQL, (iso_day,)).fetchall():
+            routes.setdefault(row['technician_id'], []).append(dict(row))
+        busy = day_busy(conn, iso_day) if routes else {}
+
+        summary, updates = {}, []
+        for technician_id, jobs in routes.items():
+            result = _optimise_technician(jobs, day, business_hours, depot, busy.get(technician_id, ()), earliest)
+            summary[technician_id] = result['summary']
+            for job, start in result['updates']:
+                updates.append((format_hhmm(start), job['id']))
+        conn.executemany('UPDATE jobs SET scheduled_time = ? WHERE id = ?', updates)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+    if updates:
+        schedule_book.invalidate(day)
+    for scheduled_time, job_id in updates:
+        publish_job('job.assigned', job_id, scheduled_date=iso_day, scheduled_time=scheduled_time)
+    return {
+        'date': iso_day,
+        'technicians': summary,
+        'jobs_moved': len(updates),
+        'elapsed_ms': round((time.perf_counter() - started) * 1000, 1),
+    }
+
+
+def _optimise_technician(jobs, day, business_hours, depot, busy=(), earliest=0):
+    window = working_window(jobs[0]['availability'], day, business_hours) or \
+        (business_hours['start'] * 60, business_hours['end'] * 60)
+    day_start = max(window[0], ceil_slot(earliest))
+    reason = None
+    if len(jobs) < 2:
+        reason = 'single job'
+    elif day_start >= window[1]:
+        reason = 'day is over'
+    elif any(job['lat'] is None or job['lon'] is None for job in jobs):
+        reason = 'missing customer location'
+    if reason:
+        return {'summary': {'jobs': len(jobs), 'optimised': False, 'reason': reason}, 'updates': []}
+
+    service = [job_duration(job['job_type'], job['duration_minutes']) for job in jobs]
+    windows = []
+    for job in jobs:
+        preferred = preferred_windows(job['preferred_time'])
+        low, high = (preferred[0][0], max(w[1] for w in preferred)) if preferred else window
+        windows.append((max(low, day_start), min(high, window[1])))
+
+    distances = route_matrix([job['lat'] for job in jobs], [job['lon'] for job in jobs], depot)
+    current = sorted(range(len(jobs)), key=lambda k: parse_hhmm(jobs[k]['scheduled_time']))
+    result = optimise_route(distances, service, windows, day_start, window[1], current, busy)
+    if result is None:
+        return {'summary': {'jobs': len(jobs), 'optimised': False, 'reason': 'no feasible order'}, 'updates': []}
+
+    order, starts, km = result
+    if overlapping([(start, start + service[stop]) for stop, start in zip(order, starts)] + list(busy)):
+        return {'summary': {'jobs': len(jobs), 'optimised': False, 'reason': 'conflict'}, 'updates': []}
+    before = route_length(current, distances)
+    # Keep a current order that is no longer and already honours every window, as
+    # long as its booked times are not in the past and clear the busy periods
+    booked = [(parse_hhmm(job['scheduled_time']), parse_hhmm(job['scheduled_time']) + length)
+              for job, length in zip(jobs, service)]
+    current_ok = schedule_route(current, travel_minutes(distances), service, windows, day_start, window[1],
+                                busy) is not None and min(booked)[0] >= day_start and not overlapping(booked + list(busy))
+    if current_ok and km >= before - 1e-6:
+        return {'summary': {'jobs': len(jobs), 'optimised': False, 'reason': 'already optimal',
+                            'km': round(before, 1)}, 'updates': []}
+    updates = [(jobs[stop], start) for stop, start in zip(order, starts)
+               if parse_hhmm(jobs[stop]['scheduled_time']) != start]
+    return {
+        'summary': {'jobs': len(jobs), 'optimised': True, 'km_before': round(before, 1), 'km': round(km, 1)},
+        'updates': updates,
+    }
+
@@ -1,13 +1,118 @@
-// This file can be used for any site-wide JavaScript.
-// For now, it's a placeholder.
-console.log("HVAC Pro dashboard script loaded.");
-
-// Example: Add smooth scrolling for any anchor links
-document.querySelectorAll('a[href^="#"]').forEach(anchor => {
-    anchor.addEventListener('click', function (e) {
-        e.preventDefault();
-        document.querySelector(this.getAttribute('href')).scrollIntoView({
-            behavior: 'smooth'
+// Live dispatch board: applies server-sent job and KPI updates to the dashboard in place.
+(function () {
+    const table = document.getElementById('board-jobs');
+    if (!table || !window.EventSource) {
+        return;
+    }
+
+    // Same badge colours as templates/dashboard.html
+    const statusMap = {
+        completed: 'success',
+        in_progress: 'info',
+        scheduled: 'warning',
+        cancelled: 'danger'
+    };
+
+    const title = text => String(text || '').toLowerCase().replace(/\b\w/g, c => c.toUpperCase());
+
+    function cell(text) {
+        const td = document.createElement('td');
+        td.textContent = text == null ? '' : text;
+        return td;
+    }
+
+    function renderRow(job) {
+        const row = document.createElement('tr');
+        row.dataset.jobId = job.id;
+        row.dataset.time = job.scheduled_time || '';
+        row.append(cell(job.scheduled_time), cell(job.customer_name), cell(job.address),
+                   cell(title(job.job_type)), cell(job.technician_name));
+
+        const badge = document.createElement('span');
+        badge.className = 'badge bg-' + (statusMap[job.status] || 'secondary');
+        badge.textContent = title(String(job.status || '').replace(/_/g, ' '));
+        const status = document.createElement('td');
+        status.append(badge);
+
+        const details = document.createElement('button');
+        details.className = 'btn btn-sm btn-outline-secondary';
+        details.textContent = 'Details';
+        const actions = document.createElement('td');
+        actions.append(details);
+
+        row.append(status, actions);
+        return row;
+    }
+
+    function findRow(id) {
+        return table.querySelector(`tr[data-job-id="${id}"]`);
+    }
+
+    function removeRow(id) {
+        const row = findRow(id);
+        if (row) {
+            row.remove();
+        }
+    }
+
+    function upsertRow(job, highlight) {
+        const empty = table.querySelector('tr[data-empty]');
+        if (empty) {
+            empty.remove();
+        }
+        removeRow(job.id);
+        const row = renderRow(job);
+        // Keep the table ordered by scheduled time, as the server renders it
+        const next = Array.from(table.querySelectorAll('tr[data-job-id]'))
+            .find(other => other.dataset.time > row.dataset.time);
+        table.insertBefore(row, next || null);
+        if (highlight) {
+            row.classList.add('table-info');
+            setTimeout(() => row.classList.remove('table-info'), 2000);
+        }
+    }
+
+    function setKpis(kpis) {
+        Object.entries(kpis).forEach(([name, value]) => {
+            const element = document.querySelector(`[data-kpi="${name}"]`);
+            if (element) {
+                element.textContent = (name === 'revenue_this_week' ? '$' : '') + value;
+            }
         });
-    });
-});
+    }
+
+    const handlers = {
+        'board.snapshot': data => {
+            table.querySelectorAll('tr[data-job-id]').forEach(row => row.remove());
+            data.jobs.forEach(job => upsertRow(job, false));
+            setKpis(data.kpis);
+        },
+        'board.row': job => {
+            if (job.scheduled_date === table.dataset.date) {
+                upsertRow(job, true);
+            } else {
+                removeRow(job.id);
+            }
+        },
+        'board.remove': data => removeRow(data.id),
+        'board.kpis': data => setKpis(data.kpis),
+        // A new day or a client that fell behind starts over from the server render
+        'board.reset': () => window.location.reload(),
+        'resync': () => window.location.reload()
+    };
+
+    function connect() {
+        const source = new EventSource(table.dataset.stream);
+        Object.entries(handlers).forEach(([kind, handle]) => {
+            source.addEventListener(kind, event => handle(JSON.parse(event.data)));
+        });
+        source.onerror = () => {
+            // The browser retries dropped streams itself; a refused one (e.g. 503) is closed for good
+            if (source.readyState === EventSource.CLOSED) {
+                setTimeout(connect, 10000);
+            }
+        };
+    }
+
+    connect();
+})();
@@ -28,3 +28,57 @@ document.addEventListener('DOMContentLoaded', function() {
         });
     }
 });
+
+// --- Customer Typeahead ---
+// Wires a text input to the customer search endpoint; the chosen id lands in a hidden input.
+function initCustomerSearch(url, inputId, hiddenId, resultsId) {
+    const input = document.getElementById(inputId);
+    const hidden = document.getElementById(hiddenId);
+    const results = document.getElementById(resultsId);
+    let timer = null;
+    let latest = 0;
+
+    function clearResults() {
+        results.replaceChildren();
+    }
+
+    async function search(query) {
+        const requestId = ++latest;
+        const response = await fetch(`${url}?q=${encodeURIComponent(query)}&limit=10`);
+        if (!response.ok || requestId !== latest) {
+            return;
+        }
+        const data = await response.json();
+        clearResults();
+        data.results.forEach(customer => {
+            const item = document.createElement('button');
+            item.type = 'button';
+            item.className = 'list-group-item list-group-item-action';
+            item.textContent = customer.address ? `${customer.name} - ${customer.address}` : customer.name;
+            item.addEventListener('click', () => {
+                hidden.value = customer.id;
+                input.value = item.textContent;
+                clearResults();
+            });
+            results.appendChild(item);
+        });
+    }
+
+    input.addEventListener('input', () => {
+        hidden.value = '';
+        clearTimeout(timer);
+        const query = input.value.trim();
+        if (query.length < 2) {
+            latest++;
+            clearResults();
+            return;
+        }
+        timer = setTimeout(() => search(query), 200);
+    });
+
+    document.addEventListener('click', event => {
+        if (!results.contains(event.target) && event.target !== input) {
+            clearResults();
+        }
+    });
+}
@@ -7,7 +7,7 @@ def test_app():
     """Create and configure a new app instance for each test module."""
     app = create_app({
         'TESTING': True,
-        'DATABASE_URL': 'sqlite:///:memory:',  # Use an in-memory database for tests
+        'SQLALCHEMY_DATABASE_URI': 'sqlite:///:memory:',  # Use an in-memory database for tests
         'WTF_CSRF_ENABLED': False, # Disable CSRF for simpler form testing
         'LOGIN_DISABLED': False
     })
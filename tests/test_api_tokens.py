@@ -0,0 +1,57 @@
+from models.api_token import ApiToken
+from models.query_log import query_log
+from models.user import User
+
+def _api_user(test_client):
+    test_client.post('/signup', data={'email': 'device@example.com', 'password': 'pw'})
+    return User.find_by_email('device@example.com')
+
+def test_bearer_token_scopes_and_revocation(test_client):
+    """Test that a token authenticates API calls within its scopes until revoked."""
+    user = _api_user(test_client)
+    token, token_id = ApiToken.create(user.id, 'tablet', ['customers:read'])
+    headers = {'Authorization': f'Bearer {token}'}
+
+    assert test_client.get('/api/customers/search?q=x').status_code == 401
+    assert test_client.get('/api/customers/search?q=x', headers=headers).status_code == 200
+    # Cached after the first call: no further database round trips to authenticate
+    before = query_log.total_statements
+    assert test_client.get('/api/customers/search', headers=headers).status_code == 200
+    assert query_log.total_statements == before
+
+    response = test_client.post('/api/schedule-job', json={'customer_id': 1}, headers=headers)
+    assert response.status_code == 403
+    assert test_client.get('/api/customers/search', headers={'Authorization': 'Bearer hvac_wrong'}).status_code == 401
+
+    assert ApiToken.revoke(token_id)
+    assert test_client.get('/api/customers/search?q=x', headers=headers).status_code == 401
+
+def test_token_cli_stores_only_hash(test_app, runner):
+    """Test the create/revoke commands and that the plaintext is never persisted."""
+    from models.database import get_db_connection
+    _api_user(test_app.test_client())
+    result = runner.invoke(args=['create-api-token', '--email', 'device@example.com', '--name', 'crm',
+                                 '--scope', 'jobs:read', '--days', '30'])
+    assert result.exit_code == 0
+    token = result.output.strip().splitlines()[-1]
+    with get_db_connection() as conn:
+        row = conn.execute('SELECT * FROM api_tokens ORDER BY id DESC LIMIT 1').fetchone()
+    assert token not in tuple(row) and row['token_hint'] == token[-4:]
+    assert ApiToken.authenticate(token).expires_at is not None
+
+    assert runner.invoke(args=['revoke-api-token', str(row['id'])]).exit_code == 0
+    assert ApiToken.authenticate(token) is None
+
+def test_tokens_only_open_scoped_api_views(test_client):
+    """Test that a token is ignored by pages and form posts and refused by admin views."""
+    user = _api_user(test_client)
+    User.set_role(user.id, 'admin')
+    token, _ = ApiToken.create(user.id, 'kiosk', ['customers:read'])
+    headers = {'Authorization': f'Bearer {token}'}
+    client = test_client.application.test_client()
+
+    assert client.get('/api/customers/search?q=x', headers=headers).status_code == 200
+    for url in ('/dashboard', '/quotes', '/inventory'):
+        assert client.get(url, headers=headers).status_code == 302
+    assert client.post('/customers/add', data={'name': 'Token Customer'}, headers=headers).status_code == 302
+    assert client.get('/admin/slow-queries', headers=headers).status_code in (302, 403)
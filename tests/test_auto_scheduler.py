@@ -0,0 +1,103 @@
+import json
+import threading
+import pytest
+from datetime import datetime, timedelta
+from models.availability import DaySlots, parse_hhmm, schedule_book
+from models.database import get_db_connection
+from models.scheduler import HVACScheduler
+
+def test_day_slots_conflicts_and_window_search():
+    """Test bitmap conflict checks, incremental release and the cross-technician window search."""
+    day = DaySlots({1: (8 * 60, 17 * 60), 2: (12 * 60, 17 * 60)})
+    assert day.first_windows(60, n=3) == [(480, 1), (495, 1), (510, 1)]
+    assert day.reserve(1, 540, 660)
+    assert not day.is_free(1, 600, 630)
+    assert not day.reserve(1, 645, 700)
+    # 08:00 fits before the booking; 09:00-11:00 is taken, so the next start is 11:00
+    assert day.first_windows(60, n=2, earliest=490) == [(660, 1), (675, 1)]
+    # Ties on start time go to the technician with the lighter day
+    assert day.first_windows(60, windows=[(12 * 60, 17 * 60)]) == [(720, 2)]
+    day.release(1, 540, 660)
+    assert day.is_free(1, 480, 1020) and day.booked_slots(1) == 0
+    assert not day.is_free(2, 480, 540)
+
+    # While a caller holds the day's lock (e.g. a release-and-reoccupy probe), other threads wait
+    seen = []
+    with day.lock:
+        day.release(1, 480, 540)
+        other = threading.Thread(target=lambda: seen.append(day.reserve(1, 480, 540)))
+        other.start()
+        other.join(timeout=0.2)
+        assert other.is_alive()
+        day.occupy(1, 480, 540)
+    other.join()
+    assert seen == [False]
+
+def test_auto_schedule_books_without_conflicts(test_app):
+    """Test that the engine honours skills, preferred times and never double-books a technician."""
+    schedule_book.invalidate()
+    weekdays = json.dumps({d: ['08:00', '17:00'] for d in ('mon', 'tue', 'wed', 'thu', 'fri', 'sat', 'sun')})
+    with get_db_connection() as conn:
+        conn.execute('UPDATE technicians SET active = 0')
+        conn.executemany("INSERT INTO technicians (name, skills, availability) VALUES (?, ?, ?)",
+                         [('Boiler Tech', '["boiler"]', weekdays), ('Ductwork Tech', '["ductwork"]', weekdays)])
+        conn.execute("INSERT INTO customers (name, preferred_time) VALUES ('Afternoon Customer', '[\"afternoon\"]')")
+        customer_id = conn.execute('SELECT MAX(id) FROM customers').fetchone()[0]
+
+    scheduler = HVACScheduler()
+    jobs = [scheduler.auto_schedule_job(customer_id, 'repair', priority=3, skills=['boiler']) for _ in range(4)]
+    assert {job['technician_name'] for job in jobs} == {'Boiler Tech'}
+    assert all(parse_hhmm(job['scheduled_time']) >= 12 * 60 for job in jobs)
+    tomorrow = (datetime.now().date() + timedelta(days=1)).isoformat()
+    assert [job['scheduled_time'] for job in jobs if job['scheduled_date'] == tomorrow] == ['12:00', '14:00']
+
+    with get_db_connection() as conn:
+        rows = conn.execute('SELECT id, technician_id, scheduled_date, scheduled_time, duration_minutes '
+                            'FROM jobs WHERE id IN (%s)' % ','.join(str(job['id']) for job in jobs)).fetchall()
+    assert len(rows) == 4
+    by_day = {}
+    for row in rows:
+        by_day.setdefault(row['scheduled_date'], []).append(
+            (parse_hhmm(row['scheduled_time']), parse_hhmm(row['scheduled_time']) + row['duration_minutes']))
+    for intervals in by_day.values():
+        intervals.sort()
+        assert all(a[1] <= b[0] for a, b in zip(intervals, intervals[1:]))
+
+    assert scheduler.auto_schedule_job(customer_id, 'repair', skills=['refrigeration']) is None
+
+    # Cancelling frees the slot for the next booking; moving onto a booked slot is refused
+    first = min(jobs, key=lambda job: (job['scheduled_date'], job['scheduled_time']))
+    day = datetime.strptime(first['scheduled_date'], '%Y-%m-%d').date()
+    assert not scheduler.move_job(jobs[1]['id'], day, first['scheduled_time'])
+    assert scheduler.cancel_job(first['id'])
+    again = scheduler.auto_schedule_job(customer_id, 'repair', skills=['boiler'])
+    assert (again['scheduled_date'], again['scheduled_time']) == (first['scheduled_date'], first['scheduled_time'])
+    assert not scheduler.cancel_job(first['id'])
+
+    # Moves must land on an active, qualified technician inside their working hours
+    with get_db_connection() as conn:
+        ductwork = conn.execute("SELECT id FROM technicians WHERE name = 'Ductwork Tech'").fetchone()[0]
+        conn.execute("INSERT INTO technicians (name, skills, active) VALUES ('Retired Tech', '[\"boiler\"]', 0)")
+        retired = conn.execute('SELECT MAX(id) FROM technicians').fetchone()[0]
+    for technician_id, time in ((ductwork, '09:00'), (retired, '09:00'), (None, '07:00'), (None, '16:30'),
+                                (999999, '09:00')):
+        with pytest.raises(ValueError):
+            scheduler.move_job(again['id'], day, time, technician_id)
+
+def test_malformed_job_requests_are_refused(test_client):
+    """Test that a bare skills string or non-numeric priority is a ValueError / 400, not a bad booking or a 500."""
+    test_client.post('/signup', data={'email': 'malformed@example.com', 'password': 'password'})
+    test_client.post('/login', data={'email': 'malformed@example.com', 'password': 'password'})
+    with get_db_connection() as conn:
+        conn.execute("INSERT INTO customers (name) VALUES ('Malformed Customer')")
+        customer_id = conn.execute('SELECT MAX(id) FROM customers').fetchone()[0]
+
+    scheduler = HVACScheduler()
+    for kwargs in ({'skills': 'electrical'}, {'priority': 'high'}, {'duration': -30}):
+        with pytest.raises(ValueError):
+            scheduler.auto_schedule_job(customer_id, 'repair', **kwargs)
+
+    for fields in ({'skills': [1]}, {'priority': 'high'}, {'duration_minutes': -30}, {'duration_minutes': 'long'}):
+        response = test_client.post('/api/schedule-job', json={'customer_id': customer_id, 'job_type': 'repair',
+                                                               **fields})
+        assert response.status_code == 400 and not response.json['success']
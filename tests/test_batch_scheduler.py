@@ -0,0 +1,58 @@
+import json
+from models.availability import parse_hhmm, schedule_book
+from models.database import get_db_connection
+
+WEEK = json.dumps({d: ['08:00', '17:00'] for d in ('mon', 'tue', 'wed', 'thu', 'fri', 'sat', 'sun')})
+
+def _setup(conn):
+    schedule_book.invalidate()
+    conn.execute('UPDATE technicians SET active = 0')
+    conn.executemany("INSERT INTO technicians (name, skills, availability) VALUES (?, ?, ?)",
+                     [('West Tech', '["residential", "boiler"]', WEEK), ('East Tech', '["residential"]', WEEK)])
+    # Two neighbourhoods 30 km apart, listed alternately
+    conn.executemany("INSERT INTO customers (name, preferred_time, lat, lon) VALUES (?, '[]', 42.8, ?)",
+                     [(f'Batch {side} {k}', lon) for k in range(4) for side, lon in (('W', -71.7), ('E', -71.3))])
+    return [row['id'] for row in conn.execute("SELECT id FROM customers WHERE name LIKE 'Batch %' ORDER BY id")]
+
+def test_batch_clusters_neighbours_and_reports_per_job(test_client):
+    """Test the batch endpoint books all valid jobs, keeps neighbours together and reports failures in order."""
+    test_client.post('/signup', data={'email': 'batch@example.com', 'password': 'password'})
+    test_client.post('/login', data={'email': 'batch@example.com', 'password': 'password'})
+    with get_db_connection() as conn:
+        customer_ids = _setup(conn)
+
+    jobs = [{'customer_id': cid, 'job_type': 'maintenance'} for cid in customer_ids]
+    jobs += [{'customer_id': 999999, 'job_type': 'maintenance'}, {'job_type': 'maintenance'},
+             {'customer_id': customer_ids[0], 'job_type': 'repair', 'skills': ['refrigeration']},
+             {'customer_id': customer_ids[0], 'job_type': 'repair', 'skills': [1]}]
+    response = test_client.post('/api/schedule-jobs', json={'jobs': jobs})
+    assert response.status_code == 200
+    results = response.json['results']
+    assert [row['success'] for row in results] == [True] * 8 + [False] * 4
+    assert 'skills' in results[11]['error']
+    assert 'Unknown customer' in results[8]['error'] and results[10]['error'] == 'No available slots found.'
+
+    with get_db_connection() as conn:
+        rows = conn.execute("SELECT j.technician_id, j.scheduled_date, j.scheduled_time, j.duration_minutes, c.lon "
+                            "FROM jobs j JOIN customers c ON c.id = j.customer_id "
+                            "WHERE c.name LIKE 'Batch %'").fetchall()
+    days = {}
+    for row in rows:
+        start = parse_hhmm(row['scheduled_time'])
+        days.setdefault((row['technician_id'], row['scheduled_date']), []).append(
+            (start, start + row['duration_minutes'], row['lon']))
+    for stops in days.values():
+        stops.sort()
+        assert all(a[1] <= b[0] for a, b in zip(stops, stops[1:]))
+        assert len({lon for _, _, lon in stops}) == 1
+
+def test_batch_cli_reads_csv(runner, tmp_path):
+    """Test the schedule-batch command books jobs from a CSV file."""
+    with get_db_connection() as conn:
+        customer_id = conn.execute('SELECT MIN(id) FROM customers').fetchone()[0]
+    source = tmp_path / 'jobs.csv'
+    source.write_text('customer_id,job_type,skills,priority\n'
+                      f'{customer_id},inspection,residential;boiler,4\n{customer_id},bogus,,\n')
+    result = runner.invoke(args=['schedule-batch', str(source)])
+    assert result.exit_code == 0
+    assert 'Scheduled 2/2 jobs' in result.output
@@ -0,0 +1,17 @@
+from benchmarks.routes import compare, run
+
+def test_route_benchmark_smoke():
+    """Test that the benchmark harness runs a route and reports every metric."""
+    results = run(['tiny'], iterations=2, routes=['quote_detail'])
+    metrics = results['tiny']['quote_detail']
+    assert set(metrics) == {'p50_ms', 'p95_ms', 'p99_ms', 'queries_per_request', 'peak_memory_kb'}
+    assert metrics['queries_per_request'] > 0
+
+def test_compare_flags_regressions():
+    """Test that slower p95s and extra queries are reported against a baseline."""
+    baseline = {'tiny': {'quotes': {'p95_ms': 10.0, 'queries_per_request': 3}}}
+    within = {'tiny': {'quotes': {'p95_ms': 11.5, 'queries_per_request': 3}}}
+    slower = {'tiny': {'quotes': {'p95_ms': 13.0, 'queries_per_request': 4}}}
+
+    assert compare(within, baseline, max_regression=20) == []
+    assert len(compare(slower, baseline, max_regression=20)) == 2
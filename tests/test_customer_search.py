@@ -0,0 +1,34 @@
+from models.database import get_db_connection
+from models.scheduler import HVACScheduler
+
+def test_search_index_tracks_writes(test_app):
+    """Test that inserts, updates and deletes are reflected in prefix search."""
+    scheduler = HVACScheduler()
+    with get_db_connection() as conn:
+        conn.execute("INSERT INTO customers (name, address, phone, email) VALUES "
+                     "('Harriet Okafor', '12 Birchwood Lane', '555-0142', 'harriet@example.com')")
+        assert [c['name'] for c in scheduler.search_customers('harr birch')] == ['Harriet Okafor']
+        assert scheduler.search_customers('0142')[0]['name'] == 'Harriet Okafor'
+
+        conn.execute("UPDATE customers SET address = '9 Elm Court' WHERE name = 'Harriet Okafor'")
+        assert scheduler.search_customers('birchwood') == []
+        assert scheduler.search_customers('elm')[0]['address'] == '9 Elm Court'
+
+        conn.execute("DELETE FROM customers WHERE name = 'Harriet Okafor'")
+        assert scheduler.search_customers('harriet') == []
+    # Punctuation only never reaches MATCH
+    assert scheduler.search_customers('"*()') == []
+
+def test_search_endpoint_limits_results(test_client):
+    """Test the typeahead endpoint caps the result count."""
+    with get_db_connection() as conn:
+        conn.executemany("INSERT INTO customers (name, address) VALUES (?, ?)",
+                         [(f'Typeahead Customer {i}', f'{i} Main St') for i in range(60)])
+    test_client.post('/signup', data={'email': 'search@example.com', 'password': 'pw'})
+    test_client.post('/login', data={'email': 'search@example.com', 'password': 'pw'})
+
+    response = test_client.get('/api/customers/search?q=typeahead&limit=500')
+    assert response.status_code == 200
+    assert len(response.get_json()['results']) == 50
+    response = test_client.get('/api/customers/search?q=typeahead&limit=5')
+    assert len(response.get_json()['results']) == 5
@@ -0,0 +1,64 @@
+from datetime import datetime, timedelta
+from models.database import get_db_connection
+from models.query_log import query_log
+from models.scheduler import HVACScheduler
+from services.dashboard import DashboardStats
+from services.data_analyzer import CustomerDataAnalyzer
+
+def test_kpis_match_the_individual_queries(test_app):
+    """Test that the consolidated query agrees with the per-KPI methods it replaces."""
+    now = datetime.now()
+    with get_db_connection() as conn:
+        conn.executemany("INSERT INTO customers (name) VALUES (?)", [('KPI Recent',), ('KPI Lapsed',), ('KPI New',)])
+        recent, lapsed, _ = [row[0] for row in conn.execute(
+            "SELECT id FROM customers WHERE name LIKE 'KPI %' ORDER BY id")]
+        conn.executemany(
+            "INSERT INTO jobs (customer_id, job_type, status, scheduled_date, completed_at, job_value) "
+            "VALUES (?, 'repair', ?, ?, ?, 250)",
+            [(recent, 'completed', now.date().isoformat(), now.strftime('%Y-%m-%d %H:%M:%S')),
+             (lapsed, 'completed', '2020-01-01', '2020-01-01 10:00:00'),
+             (recent, 'scheduled', now.date().isoformat(), None)])
+
+    stats = DashboardStats().get(now.date())
+    scheduler = HVACScheduler()
+    assert stats['kpis'] == {
+        'jobs_today': len(scheduler.get_jobs_by_date(now.date())),
+        'revenue_this_week': scheduler.get_revenue_for_current_week(),
+        'open_invoices': scheduler.get_open_invoice_count(),
+        'at_risk_customers': len(CustomerDataAnalyzer().identify_at_risk_customers()),
+    }
+    assert len(stats['jobs']) == 2
+
+def test_cached_until_a_job_changes(test_client):
+    """Test that refreshes cost one version read and a completion or conversion shows up at once."""
+    test_client.post('/signup', data={'email': 'kpi@example.com', 'password': 'password'})
+    test_client.post('/login', data={'email': 'kpi@example.com', 'password': 'password'})
+    today = datetime.now().date()
+    dashboard = DashboardStats(ttl=300)
+    first = dashboard.get(today)
+
+    before = query_log.total_statements
+    assert dashboard.get(today) is first
+    # The pool's checkout ping plus the version read
+    assert query_log.total_statements - before <= 2
+
+    with get_db_connection() as conn:
+        conn.execute("UPDATE jobs SET status = 'completed', completed_at = ? WHERE scheduled_date = ? "
+                     "AND status = 'scheduled'", (datetime.now().strftime('%Y-%m-%d %H:%M:%S'), today.isoformat()))
+        conn.execute("INSERT INTO quotes (customer_id, status, total_amount) VALUES (1, 'approved', 900)")
+        quote_id = conn.execute('SELECT MAX(id) FROM quotes').fetchone()[0]
+    completed = dashboard.get(today)
+    assert completed['kpis']['open_invoices'] > first['kpis']['open_invoices']
+
+    test_client.post(f'/quotes/{quote_id}/convert')
+    assert dashboard.get(today)['version'] > completed['version']
+    assert dashboard.get(today + timedelta(days=1)) is not dashboard.get(today)
+
+    # The KPIs also count customers and the job list shows technician names
+    converted = dashboard.get(today)
+    with get_db_connection() as conn:
+        conn.execute("INSERT INTO customers (name) VALUES ('KPI Newcomer')")
+    assert dashboard.get(today)['kpis']['at_risk_customers'] == converted['kpis']['at_risk_customers'] + 1
+    with get_db_connection() as conn:
+        conn.execute("INSERT INTO technicians (name) VALUES ('KPI Tech')")
+    assert dashboard.get(today)['version'] > converted['version']
@@ -0,0 +1,62 @@
+from models.database import get_db_connection
+import pytest
+from services.data_generator import DatasetGenerator, generate_dataset
+
+def test_generate_tiny_dataset(test_app):
+    """Test that the generator fills every table with consistent rows."""
+    counts = generate_dataset('tiny', seed=7)
+    assert counts['customers'] == 200
+    assert counts['jobs'] == 2000
+
+    with get_db_connection() as conn:
+        assert conn.execute('SELECT COUNT(*) FROM jobs').fetchone()[0] >= 2000
+        # Completed jobs always carry a completion time, open ones never do
+        assert conn.execute("""
+            SELECT COUNT(*) FROM jobs
+            WHERE (status = 'completed') != (completed_at IS NOT NULL)
+        """).fetchone()[0] == 0
+        # Quote totals match their line items
+        mismatched = conn.execute("""
+            SELECT COUNT(*) FROM quotes q
+            JOIN (SELECT quote_id, SUM(quantity * unit_price) AS total
+                  FROM quote_line_items GROUP BY quote_id) li ON li.quote_id = q.id
+            WHERE ABS(q.total_amount - li.total) > 0.01
+        """).fetchone()[0]
+        assert mismatched == 0
+        # Managed indexes are rebuilt after the bulk load
+        names = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'index'")}
+        assert 'idx_jobs_status_completed' in names
+
+def test_seed_data_refuses_non_empty_database(runner):
+    """Test that seeding an already populated database needs --force."""
+    result = runner.invoke(args=['seed-data', '--size', 'tiny'])
+    assert result.exit_code != 0
+    assert '--force' in result.output
+
+def test_failed_load_restores_indexes_and_triggers(test_app, monkeypatch):
+    """Test that a load that dies part-way still puts back the indexes and triggers it dropped."""
+    def fail(self, conn, count):
+        raise RuntimeError('disk full')
+    monkeypatch.setattr(DatasetGenerator, '_quotes', fail)
+    with pytest.raises(RuntimeError):
+        DatasetGenerator(seed=3).generate(customers=10, technicians=2, jobs=20, quotes=5, parts=5)
+
+    with get_db_connection() as conn:
+        names = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type IN ('index', 'trigger')")}
+    assert {'idx_jobs_status_completed', 'trg_jobs_version_insert', 'trg_quotes_revision'} <= names
+
+def test_children_reference_real_parents_after_deletes(test_app):
+    """Test that jobs and quotes point at the generated customers when sqlite_sequence is past MAX(id)."""
+    with get_db_connection() as conn:
+        for table in ('customers', 'technicians'):
+            conn.execute(f"INSERT INTO {table} (name) VALUES ('Deleted Row')")
+            conn.execute(f"DELETE FROM {table} WHERE name = 'Deleted Row'")
+    DatasetGenerator(seed=5).generate(customers=10, technicians=2, jobs=30, quotes=5, parts=2)
+
+    with get_db_connection() as conn:
+        assert conn.execute("SELECT COUNT(*) FROM customers WHERE name = 'Deleted Row'").fetchone()[0] == 0
+        for sql in ('SELECT COUNT(*) FROM jobs j LEFT JOIN customers c ON c.id = j.customer_id WHERE c.id IS NULL',
+                    'SELECT COUNT(*) FROM jobs j LEFT JOIN technicians t ON t.id = j.technician_id '
+                    'WHERE j.technician_id IS NOT NULL AND t.id IS NULL',
+                    'SELECT COUNT(*) FROM quotes q LEFT JOIN customers c ON c.id = q.customer_id WHERE c.id IS NULL'):
+            assert conn.execute(sql).fetchone()[0] == 0
@@ -0,0 +1,93 @@
+import pytest
+from models import database
+from models.database import (
+    ConnectionPool, configure_database, get_db_connection, get_pool_stats, get_schema_version,
+    init_database, SCHEMA_VERSION
+)
+
+@pytest.fixture()
+def isolated_pool(monkeypatch):
+    """
+    Let a test re-point get_db_connection() and put the process-wide pool back
+    afterwards. configure_database() and bind_engine() close the pool they
+    replace, so the original is parked behind an unopened placeholder first.
+    """
+    monkeypatch.setattr(database, 'DATABASE_PATH', database.DATABASE_PATH)
+    monkeypatch.setattr(database, '_pool', ConnectionPool(database.DATABASE_PATH))
+    yield
+    database._pool.close_all()
+
+def test_pool_reuses_connections(tmp_path):
+    """Test that a released connection is handed out again instead of reopened."""
+    pool = ConnectionPool(str(tmp_path / 'pool.db'), max_size=2)
+
+    conn = pool.acquire()
+    conn.close()
+    conn = pool.acquire()
+    assert conn.execute('PRAGMA journal_mode').fetchone()[0] == 'wal'
+    conn.close()
+
+    assert pool.stats['opened'] == 1
+    assert pool.stats['reused'] == 1
+    pool.close_all()
+
+def test_pool_nested_acquire_shares_connection(tmp_path):
+    """Test that nested helpers on one thread share a single connection."""
+    pool = ConnectionPool(str(tmp_path / 'pool.db'), max_size=1)
+
+    outer = pool.acquire()
+    inner = pool.acquire()
+    assert inner is outer
+    inner.close()
+    # The outer caller still owns it until it closes too
+    assert outer.execute('SELECT 1').fetchone()[0] == 1
+
+    # A nested `with` neither commits nor rolls back the caller's transaction
+    outer.execute('CREATE TABLE t (x INTEGER)')
+    outer.execute('INSERT INTO t VALUES (1)')
+    with pool.acquire() as inner:
+        inner.execute('INSERT INTO t VALUES (2)')
+    assert outer.in_transaction
+    outer.rollback()
+    assert outer.execute('SELECT COUNT(*) FROM t').fetchone()[0] == 0
+    outer.close()
+    assert len(pool._idle) == 1
+    pool.close_all()
+
+def test_init_database_skips_when_current(tmp_path, isolated_pool):
+    """Test that migrations run once and later boots do no DDL."""
+    configure_database(str(tmp_path / 'schema.db'))
+
+    assert init_database() == SCHEMA_VERSION
+    assert init_database() == 0
+    with get_db_connection() as conn:
+        assert get_schema_version(conn) == SCHEMA_VERSION
+        # No sample data unless explicitly requested
+        assert conn.execute('SELECT COUNT(*) FROM customers').fetchone()[0] == 0
+
+def test_engine_backs_db_connections(tmp_path, isolated_pool):
+    """Test that get_db_connection() draws from the app's SQLAlchemy pool."""
+    from app import create_app
+    create_app({'TESTING': True, 'SQLALCHEMY_DATABASE_URI': f"sqlite:///{tmp_path / 'engine.db'}"})
+
+    for _ in range(3):
+        with get_db_connection() as conn:
+            assert conn.execute('SELECT COUNT(*) FROM users').fetchone()[0] == 0
+
+    stats = get_pool_stats()
+    assert stats['opened'] == 1
+    assert 'Checked out connections: 0' in stats['pool']
+
+def test_other_backends_leave_data_on_sqlite(tmp_path, isolated_pool):
+    """Test that a Postgres URI keeps get_db_connection() on the migrated SQLite file."""
+    from app import create_app
+    from sqlalchemy import create_engine
+    path = str(tmp_path / 'fallback.db')
+    create_app({'TESTING': True, 'SQLALCHEMY_DATABASE_URI': 'postgresql+psycopg2://hvac@localhost/hvac',
+                'DATABASE_PATH': path})
+
+    assert database.DATABASE_PATH == path
+    with get_db_connection() as conn:
+        assert get_schema_version(conn) == SCHEMA_VERSION
+    with pytest.raises(ValueError):
+        database.bind_engine(create_engine('postgresql+psycopg2://hvac@localhost/hvac'))
@@ -0,0 +1,85 @@
+import json
+from datetime import datetime, timedelta
+from models.availability import schedule_book
+from models.database import get_db_connection
+from models.scheduler import HVACScheduler
+from services.dispatch import Dispatcher, DispatchQueue
+
+WEEK = json.dumps({d: ['08:00', '17:00'] for d in ('mon', 'tue', 'wed', 'thu', 'fri', 'sat', 'sun')})
+
+def _technicians(conn, rows):
+    conn.executemany("INSERT INTO technicians (name, skills, availability) VALUES (?, ?, ?)",
+                     [(name, skills, WEEK) for name, skills in rows])
+    return [conn.execute('SELECT id FROM technicians WHERE name = ?', (name,)).fetchone()[0] for name, _ in rows]
+
+def _customer(conn, name, lat=None, lon=None):
+    conn.execute("INSERT INTO customers (name, preferred_time, lat, lon) VALUES (?, '[]', ?, ?)", (name, lat, lon))
+    return conn.execute('SELECT MAX(id) FROM customers').fetchone()[0]
+
+def _book(conn, customer_id, technician_id, day, start, priority):
+    conn.execute("INSERT INTO jobs (customer_id, technician_id, job_type, status, scheduled_date, scheduled_time, "
+                 "duration_minutes, priority) VALUES (?, ?, 'repair', 'scheduled', ?, ?, 120, ?)",
+                 (customer_id, technician_id, day, start, priority))
+    return conn.execute('SELECT MAX(id) FROM jobs').fetchone()[0]
+
+def test_call_goes_to_nearest_technician_or_bumps_routine_work(test_client):
+    """Test that a call takes the soonest arrival and bumps a routine job only when nobody can come soon."""
+    test_client.post('/signup', data={'email': 'dispatch@example.com', 'password': 'password'})
+    test_client.post('/login', data={'email': 'dispatch@example.com', 'password': 'password'})
+    schedule_book.invalidate()
+    today = datetime.now().date()
+    tomorrow = (today + timedelta(days=1)).isoformat()
+    with get_db_connection() as conn:
+        conn.execute('UPDATE technicians SET active = 0')
+        near, far = _technicians(conn, [('Near Tech', '[]'), ('Far Tech', '[]')])
+        # Priority-2 jobs can't be bumped
+        _book(conn, _customer(conn, 'Dispatch Near', 42.80, -71.50), near, tomorrow, '08:00', 2)
+        _book(conn, _customer(conn, 'Dispatch Far', 42.80, -71.10), far, tomorrow, '08:00', 2)
+        caller = _customer(conn, 'Dispatch Caller', 42.80, -71.49)
+    scheduler = HVACScheduler()
+    for technician_id in (near, far):
+        scheduler.mark_unavailable(technician_id, today)
+
+    assert test_client.post('/api/dispatch', json={'customer_id': caller, 'skills': [1]}).status_code == 400
+    response = test_client.post('/api/dispatch', json={'customer_id': caller})
+    assert response.status_code == 200 and response.json['status'] == 'dispatched'
+    job = response.json['job']
+    assert (job['technician_id'], job['scheduled_date'], job['scheduled_time']) == (near, tomorrow, '10:15')
+    assert response.json['bumped'] is None
+    assert test_client.get(f"/api/dispatch/{response.json['ticket']}").json['job'] == job
+    assert test_client.get('/api/dispatch/nope').status_code == 404
+
+    with get_db_connection() as conn:
+        routine, general = _technicians(conn, [('Routine Tech', '["refrigeration"]'), ('General Tech', '[]')])
+        # The only qualified technician is busy with a routine job at an unknown location
+        routine_job = _book(conn, _customer(conn, 'Dispatch Routine'), routine, tomorrow, '08:00', 3)
+    scheduler.mark_unavailable(routine, today)
+    response = test_client.post('/api/dispatch', json={'customer_id': caller, 'skills': ['refrigeration']})
+    assert response.json['job']['technician_id'] == routine and response.json['job']['scheduled_time'] == '08:00'
+    bumped = response.json['bumped']
+    assert (bumped['id'], bumped['technician_id'], bumped['scheduled_time']) == (routine_job, general, '08:00')
+    with get_db_connection() as conn:
+        row = conn.execute('SELECT technician_id, scheduled_time FROM jobs WHERE id = ?', (routine_job,)).fetchone()
+    assert (row['technician_id'], row['scheduled_time']) == (general, '08:00')
+
+def test_burst_is_placed_most_urgent_first(test_app):
+    """Test that calls queued together are dispatched in priority order, one batch at a time."""
+    schedule_book.invalidate()
+    with get_db_connection() as conn:
+        conn.execute('UPDATE technicians SET active = 0')
+        _technicians(conn, [(f'Burst Tech {k}', '[]') for k in range(6)])
+        customer_id = _customer(conn, 'Burst Customer')
+
+    queue = DispatchQueue(Dispatcher(), batch_size=100)
+    calls = [{'customer_id': customer_id, 'job_type': 'emergency', 'priority': 2 - k % 2, 'skills': set(),
+              'duration': 60, 'notes': '', 'allow_preempt': False} for k in range(40)]
+    # Hold the queue so the whole burst lands in one batch
+    with queue._cond:
+        tickets = [queue.submit(call) for call in calls]
+    results = [ticket.wait(10) for ticket in tickets]
+    assert all(result['status'] == 'dispatched' for result in results)
+    ids = {priority: [r['job']['id'] for r, c in zip(results, calls) if c['priority'] == priority]
+           for priority in (1, 2)}
+    assert max(ids[1]) < min(ids[2])
+    metrics = queue.metrics()
+    assert metrics['counters']['dispatched'] == 40 and metrics['pending'] == 0
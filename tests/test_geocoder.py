@@ -0,0 +1,55 @@
+from models.database import get_db_connection
+from services.geocoder import Gazetteer, geocoder, normalise_address, parse_address
+
+def test_normalised_addresses_resolve_most_specific_first():
+    """Test that spelling variants share a key and street beats ZIP beats town."""
+    assert normalise_address('123 Main Street, Nashua NH 03060-1234') == \
+        normalise_address('123 MAIN ST., Nashua, N.H. 03060') == '123 MAIN ST, NASHUA, NH 03060'
+    assert parse_address('12345 Main St Apt 2, Nashua, NH').number == '12345'
+
+    gazetteer = Gazetteer([
+        {'zip': '03060', 'city': 'Nashua', 'state': 'NH', 'street': '', 'lat': '42.76', 'lon': '-71.46'},
+        {'zip': '03062', 'city': 'Nashua', 'state': 'NH', 'street': '', 'lat': '42.72', 'lon': '-71.50'},
+        {'zip': '', 'city': 'Nashua', 'state': 'NH', 'street': 'Main Street', 'lat': '42.75', 'lon': '-71.47'},
+    ])
+    assert gazetteer.resolve(parse_address('9 Main St, Nashua, NH 03062'))[2] == 'street'
+    assert gazetteer.resolve(parse_address('9 Oak Ave, Nashua, NH 03062')) == (42.72, -71.50, 'zip')
+    lat, lon, precision = gazetteer.resolve(parse_address('9 Oak Ave, Nashua'))
+    assert (round(lat, 2), round(lon, 2), precision) == (42.74, -71.48, 'town')
+    assert gazetteer.resolve(parse_address('9 Oak Ave, Springfield, IL')) is None
+
+def test_backfill_geocodes_each_distinct_address_once(runner):
+    """Test the CLI backfill fills lat/lon, caches misses and leaves located customers alone."""
+    with get_db_connection() as conn:
+        conn.execute('UPDATE customers SET lat = 1, lon = 1')
+        conn.executemany("INSERT INTO customers (name, address) VALUES (?, ?)",
+                         [('Geo A', '1 Elm St, Hudson, NH 03051'), ('Geo B', '1 ELM STREET, Hudson NH 03051'),
+                          ('Geo C', '7 Nowhere Rd, Atlantis')])
+
+    result = runner.invoke(args=['geocode-customers', '--batch-size', '2'])
+    assert result.exit_code == 0
+    assert 'Located 2/3 customers' in result.output
+
+    with get_db_connection() as conn:
+        located = conn.execute("SELECT name, lat FROM customers WHERE name LIKE 'Geo %' ORDER BY name").fetchall()
+        cache = conn.execute('SELECT address_key, lat FROM geocode_cache ORDER BY address_key').fetchall()
+    assert [row['lat'] is not None for row in located] == [True, True, False]
+    assert located[0]['lat'] == located[1]['lat']
+    assert [(row['address_key'], row['lat'] is None) for row in cache] == \
+        [('1 ELM ST, HUDSON, NH 03051', False), ('7 NOWHERE RD, ATLANTIS', True)]
+
+def test_cached_misses_expire_with_the_gazetteer(test_app, tmp_path):
+    """Test that a miss cached against one gazetteer is resolved again once the gazetteer changes."""
+    path = tmp_path / 'gazetteer.csv'
+    path.write_text('zip,city,state,street,lat,lon\n03051,Hudson,NH,,42.76,-71.41\n')
+    try:
+        geocoder.configure(str(path))
+        assert geocoder.geocode('4 Pine St, Keene, NH 03431') is None
+        assert geocoder.geocode('4 Pine St, Keene, NH 03431') is None
+
+        with path.open('a') as f:
+            f.write('03431,Keene,NH,,42.93,-72.28\n')
+        geocoder.configure(str(path))
+        assert geocoder.geocode('4 Pine St, Keene, NH 03431') == (42.93, -72.28, 'zip')
+    finally:
+        geocoder.configure(test_app.config.get('GAZETTEER_PATH'))
@@ -0,0 +1,64 @@
+from models.database import get_db_connection
+
+def _login(client):
+    client.post('/signup', data={'email': 'etag@example.com', 'password': 'password'})
+    client.post('/login', data={'email': 'etag@example.com', 'password': 'password'})
+
+def test_list_pages_revalidate_until_their_table_changes(test_client):
+    """Test that parts and quotes lists answer 304 while unchanged and render again after a write."""
+    _login(test_client)
+    with get_db_connection() as conn:
+        conn.execute("INSERT INTO customers (name) VALUES ('ETag Customer')")
+        conn.execute("INSERT INTO quotes (customer_id, status, total_amount) "
+                     "VALUES ((SELECT MAX(id) FROM customers), 'draft', 120)")
+
+    for url in ('/inventory', '/quotes?status=draft'):
+        first = test_client.get(url)
+        etag = first.headers['ETag']
+        assert first.status_code == 200 and first.headers['Cache-Control'] == 'private, no-cache'
+        repeat = test_client.get(url, headers={'If-None-Match': etag})
+        assert repeat.status_code == 304 and repeat.data == b''
+
+    # Only the customer names show on the quote list, so other customer edits keep it valid
+    quotes_etag = test_client.get('/quotes?status=draft').headers['ETag']
+    with get_db_connection() as conn:
+        conn.execute("UPDATE customers SET phone = '555-0100' WHERE name = 'ETag Customer'")
+    assert test_client.get('/quotes?status=draft', headers={'If-None-Match': quotes_etag}).status_code == 304
+    with get_db_connection() as conn:
+        conn.execute("UPDATE customers SET name = 'ETag Renamed' WHERE name = 'ETag Customer'")
+    renamed = test_client.get('/quotes?status=draft', headers={'If-None-Match': quotes_etag})
+    assert renamed.status_code == 200 and b'ETag Renamed' in renamed.data
+
+    test_client.post('/inventory/add', data={'name': 'Capacitor', 'sku': 'CAP-1', 'quantity': 3,
+                                             'cost_price': 4, 'sale_price': 9})
+    page = test_client.get('/inventory', headers={'If-None-Match': etag})
+    # The redirect's flash message is pending, and the parts table changed
+    assert page.status_code == 200 and b'Capacitor' in page.data
+    assert test_client.get('/inventory', headers={'If-None-Match': page.headers['ETag']}).status_code == 304
+
+def test_quote_page_validators_follow_that_quote(test_client):
+    """Test that a quote page changes validators when its line items change, but not for other quotes."""
+    _login(test_client)
+    with get_db_connection() as conn:
+        conn.execute("INSERT INTO customers (name) VALUES ('Quote ETag Customer')")
+        conn.executemany("INSERT INTO quotes (customer_id, status, total_amount) "
+                         "VALUES ((SELECT MAX(id) FROM customers), 'draft', ?)", [(100,), (200,)])
+        quote_id, other_id = [row[0] for row in conn.execute('SELECT id FROM quotes ORDER BY id DESC LIMIT 2')]
+
+    first = test_client.get(f'/quotes/{quote_id}')
+    etag, last_modified = first.headers['ETag'], first.headers['Last-Modified']
+    assert test_client.get(f'/quotes/{quote_id}', headers={'If-None-Match': etag}).status_code == 304
+    assert test_client.get(f'/quotes/{quote_id}', headers={'If-Modified-Since': last_modified}).status_code == 304
+
+    with get_db_connection() as conn:
+        conn.execute("INSERT INTO quote_line_items (quote_id, description) VALUES (?, 'Other work')", (other_id,))
+    assert test_client.get(f'/quotes/{quote_id}', headers={'If-None-Match': etag}).status_code == 304
+
+    with get_db_connection() as conn:
+        conn.execute("INSERT INTO quote_line_items (quote_id, description, quantity, unit_price) "
+                     "VALUES (?, 'Coil cleaning', 1, 100)", (quote_id,))
+        revision = conn.execute('SELECT revision FROM quotes WHERE id = ?', (quote_id,)).fetchone()[0]
+    assert revision == 1
+    changed = test_client.get(f'/quotes/{quote_id}', headers={'If-None-Match': etag})
+    assert changed.status_code == 200 and b'Coil cleaning' in changed.data
+    assert changed.headers['ETag'] != etag
@@ -0,0 +1,73 @@
+from models.database import get_db_connection
+
+DAY = '2031-03-04'
+
+def _login(client):
+    client.post('/signup', data={'email': 'jobsapi@example.com', 'password': 'password'})
+    client.post('/login', data={'email': 'jobsapi@example.com', 'password': 'password'})
+
+def _seed():
+    with get_db_connection() as conn:
+        if conn.execute('SELECT 1 FROM jobs WHERE scheduled_date = ?', (DAY,)).fetchone():
+            return
+        conn.execute("INSERT INTO customers (name, address) VALUES ('Jobs API Customer', '1 Main St')")
+        customer_id = conn.execute('SELECT MAX(id) FROM customers').fetchone()[0]
+        conn.execute("INSERT INTO technicians (name) VALUES ('Jobs API Tech')")
+        technician_id = conn.execute('SELECT MAX(id) FROM technicians').fetchone()[0]
+        conn.executemany(
+            "INSERT INTO jobs (customer_id, technician_id, job_type, status, scheduled_date, scheduled_time) "
+            "VALUES (?, ?, 'repair', ?, ?, ?)",
+            [(customer_id, technician_id, 'scheduled', DAY, '10:00'),
+             (customer_id, technician_id, 'completed', DAY, '08:00'),
+             (customer_id, None, 'scheduled', DAY, None),
+             (customer_id, technician_id, 'scheduled', '2031-03-05', '09:00')])
+    return technician_id
+
+def test_filters_projection_and_pages(test_client):
+    """Test that filters apply, only the selected fields come back and cursors walk the range in time order."""
+    _login(test_client)
+    technician_id = _seed()
+    seen, cursor = [], None
+    while True:
+        query = {'date_from': DAY, 'date_to': '2031-03-05', 'fields': 'id,scheduled_time,customer_name',
+                 'per_page': 2}
+        if cursor:
+            query['cursor'] = cursor
+        body = test_client.get('/api/jobs', query_string=query).get_json()
+        assert all(set(job) == {'id', 'scheduled_time', 'customer_name'} for job in body['jobs'])
+        seen.extend(body['jobs'])
+        cursor = body['next_cursor']
+        if not cursor:
+            break
+    assert [job['scheduled_time'] for job in seen] == [None, '08:00', '10:00', '09:00']
+
+    body = test_client.get('/api/jobs', query_string={'date_from': DAY, 'technician_id': technician_id,
+                                                      'status': 'scheduled,in_progress'}).get_json()
+    assert [job['scheduled_time'] for job in body['jobs']] == ['10:00']
+    assert body['jobs'][0]['technician_name'] == 'Jobs API Tech'
+
+    assert test_client.get('/api/jobs', query_string={'fields': 'id,password'}).status_code == 400
+    assert test_client.get('/api/jobs', query_string={'status': 'lost'}).status_code == 400
+    assert test_client.get('/api/jobs', query_string={'date_from': DAY, 'date_to': '2031-03-01'}).status_code == 400
+
+def test_unchanged_pages_are_not_modified(test_client):
+    """Test that a repeat request gets a 304 until a job, or a joined customer name, changes."""
+    _login(test_client)
+    _seed()
+    query = {'date_from': DAY, 'fields': 'id,customer_name'}
+    first = test_client.get('/api/jobs', query_string=query)
+    etag = first.headers['ETag']
+    assert first.headers['Cache-Control'] == 'private, no-cache'
+    assert test_client.get('/api/jobs', query_string=query, headers={'If-None-Match': etag}).status_code == 304
+
+    with get_db_connection() as conn:
+        conn.execute("UPDATE customers SET name = 'Jobs API Renamed' WHERE name = 'Jobs API Customer'")
+    renamed = test_client.get('/api/jobs', query_string=query, headers={'If-None-Match': etag})
+    assert renamed.status_code == 200 and renamed.headers['ETag'] != etag
+    assert renamed.get_json()['jobs'][0]['customer_name'] == 'Jobs API Renamed'
+
+    etag = renamed.headers['ETag']
+    with get_db_connection() as conn:
+        conn.execute("UPDATE jobs SET status = 'in_progress' WHERE scheduled_date = ? AND scheduled_time = '10:00'",
+                     (DAY,))
+    assert test_client.get('/api/jobs', query_string=query, headers={'If-None-Match': etag}).status_code == 200
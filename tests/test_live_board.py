@@ -0,0 +1,128 @@
+import json
+import time
+from datetime import datetime
+import pytest
+from models.database import get_db_connection
+from models.scheduler import HVACScheduler
+from models.events import BusFull, EventBus, event_bus, format_sse
+from services.dashboard import DashboardStats
+from services.live_board import LiveBoard
+
+def test_reconnect_replays_missed_events_or_resyncs():
+    """Test that a client resuming from a recent id gets what it missed and a stale or foreign id is lagged."""
+    bus = EventBus(history=3, max_subscribers=2, max_queue=2)
+    first = bus.publish('job.created', {'id': 1})
+    bus.publish('job.assigned', {'id': 1})
+    subscription = bus.subscribe(first['id'])
+    assert [event['kind'] for event in subscription.get(timeout=0)] == ['job.assigned']
+    assert not subscription.lagged
+
+    bus.publish('job.status', {'id': 1})
+    bus.publish('job.status', {'id': 2})
+    bus.publish('job.completed', {'id': 3})
+    # The queue holds two events, so the third marks the subscriber as lagged
+    assert subscription.lagged and subscription.get(timeout=0) == []
+    assert bus.subscribe(first['id']).lagged
+    with pytest.raises(BusFull):
+        bus.subscribe('other-1')
+
+    frame = format_sse(first)
+    assert frame.startswith(f"id: {first['id']}\nevent: job.created\n") and frame.endswith('\n\n')
+    assert format_sse({'kind': 'resync', 'data': {}}) == 'event: resync\ndata: {}\n\n'
+
+def test_board_listens_even_when_streams_fill_the_bus():
+    """Test that the board thread still subscribes and reacts once browser streams use every slot."""
+    bus = EventBus(max_subscribers=1)
+    client = bus.subscribe()
+    reads = []
+    stats = type('Stats', (), {'get': lambda self, day: reads.append(day) or
+                               {'version': len(reads), 'jobs': [], 'kpis': {'jobs_today': len(reads)}}})()
+    board = LiveBoard(stats, bus, poll_seconds=30)
+    board.ensure_started()
+    try:
+        deadline = time.monotonic() + 2
+        while len(bus._subscribers) < 2 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        with pytest.raises(BusFull):
+            bus.subscribe()
+        before = len(reads)
+        bus.publish('job.created', {'id': 1})
+        while len(reads) == before and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert board._thread.is_alive() and len(reads) > before
+    finally:
+        client.close()
+
+def test_completion_reaches_the_board_as_row_and_kpi_deltas(test_client):
+    """Test that completing a job publishes job.completed, then a board row and KPI deltas, and that the stream opens on a snapshot."""
+    test_client.post('/signup', data={'email': 'board@example.com', 'password': 'password'})
+    test_client.post('/login', data={'email': 'board@example.com', 'password': 'password'})
+    today = datetime.now().date().isoformat()
+    with get_db_connection() as conn:
+        conn.execute("INSERT INTO customers (name) VALUES ('Board Customer')")
+        conn.execute("INSERT INTO jobs (customer_id, job_type, status, scheduled_date, scheduled_time, job_value) "
+                     "VALUES ((SELECT MAX(id) FROM customers), 'repair', 'scheduled', ?, '09:00', 300)", (today,))
+        job_id = conn.execute('SELECT MAX(id) FROM jobs').fetchone()[0]
+
+    bus = EventBus()
+    board = LiveBoard(DashboardStats(ttl=300), bus)
+    board.refresh()
+    earlier = board.stats.get()
+    jobs = event_bus.subscribe()
+    board_events = bus.subscribe()
+    try:
+        assert test_client.post(f'/api/jobs/{job_id}/status', json={'status': 'bogus'}).status_code == 400
+        assert test_client.post('/api/jobs/999999/status', json={'status': 'completed'}).status_code == 404
+        assert test_client.post(f'/api/jobs/{job_id}/status', json={'status': 'completed'}).status_code == 200
+        assert [event['kind'] for event in jobs.get(timeout=0)] == ['job.completed']
+
+        board.refresh()
+        events = {event['kind']: event['data'] for event in board_events.get(timeout=0)}
+        assert set(events) == {'board.row', 'board.kpis'}
+        assert events['board.row']['id'] == job_id and events['board.row']['status'] == 'completed'
+        assert events['board.kpis']['delta']['open_invoices'] == 1
+
+        # A snapshot read before the one just applied is dropped instead of reverting the board
+        board.stats = type('Stale', (), {'get': lambda self, day: earlier})()
+        board.refresh()
+        assert board_events.get(timeout=0) == []
+    finally:
+        jobs.close()
+        board_events.close()
+
+    response = test_client.get('/api/events', buffered=False)
+    assert response.mimetype == 'text/event-stream'
+    chunks = response.iter_encoded()
+    assert next(chunks) == b'retry: 3000\n\n'
+    snapshot = next(chunks).decode()
+    assert snapshot.startswith('event: board.snapshot\n')
+    assert job_id in [job['id'] for job in json.loads(snapshot.split('data: ', 1)[1])['jobs']]
+    response.close()
+
+def test_reactivating_a_job_needs_its_slot_back(test_client):
+    """Test that a cancelled job can only return to scheduled while nobody else holds its slot."""
+    day = '2031-06-03'
+    with get_db_connection() as conn:
+        conn.execute("INSERT INTO customers (name) VALUES ('Reactivate Customer')")
+        conn.execute("INSERT INTO technicians (name) VALUES ('Reactivate Tech')")
+        customer_id = conn.execute('SELECT MAX(id) FROM customers').fetchone()[0]
+        technician_id = conn.execute('SELECT MAX(id) FROM technicians').fetchone()[0]
+        insert = ("INSERT INTO jobs (customer_id, technician_id, job_type, status, scheduled_date, scheduled_time) "
+                  "VALUES (?, ?, 'repair', 'scheduled', ?, '08:00')")
+        conn.execute(insert, (customer_id, technician_id, day))
+        first = conn.execute('SELECT MAX(id) FROM jobs').fetchone()[0]
+
+    scheduler = HVACScheduler()
+    assert scheduler.set_job_status(first, 'cancelled')
+    with get_db_connection() as conn:
+        conn.execute(insert, (customer_id, technician_id, day))
+        second = conn.execute('SELECT MAX(id) FROM jobs').fetchone()[0]
+    with pytest.raises(ValueError):
+        scheduler.set_job_status(first, 'scheduled')
+
+    assert scheduler.set_job_status(second, 'no_show')
+    assert scheduler.set_job_status(first, 'scheduled')
+    with get_db_connection() as conn:
+        live = conn.execute("SELECT id FROM jobs WHERE technician_id = ? AND status = 'scheduled'",
+                            (technician_id,)).fetchall()
+    assert [row[0] for row in live] == [first]
@@ -0,0 +1,62 @@
+import re
+import pytest
+from models.pagination import decode_cursor, encode_cursor
+from models.database import get_db_connection
+from models.scheduler import HVACScheduler
+
+def _login(client):
+    client.post('/signup', data={'email': 'pager@example.com', 'password': 'pw'})
+    client.post('/login', data={'email': 'pager@example.com', 'password': 'pw'})
+
+def test_customer_pages_cover_every_row_once(test_app):
+    """Test that walking the keyset cursor visits each customer exactly once, even with duplicate names."""
+    with get_db_connection() as conn:
+        conn.execute('DELETE FROM customers')
+        conn.executemany('INSERT INTO customers (name) VALUES (?)',
+                         [('Avery',), ('Blake',), ('Blake',), ('Blake',), ('Casey',), ('Drew',), ('Emery',)])
+
+    scheduler = HVACScheduler()
+    seen, cursor = [], None
+    while True:
+        page, cursor = scheduler.get_customers_page(cursor, limit=2)
+        assert len(page) <= 2
+        seen.extend((c['name'], c['id']) for c in page)
+        if cursor is None:
+            break
+    assert seen == sorted(seen)
+    assert len(set(seen)) == 7
+
+    # Cursors carrying non-scalar values are refused rather than passed to the driver
+    crafted = encode_cursor([['Blake'], {'id': 1}])
+    with pytest.raises(ValueError):
+        decode_cursor(crafted, 2)
+    with pytest.raises(ValueError):
+        scheduler.get_customers_page(crafted)
+    assert decode_cursor(encode_cursor(['Blake', 3]), 2) == ['Blake', 3]
+
+def test_quotes_filters_and_cursor(test_client):
+    """Test status and date filters on the quotes list and that the next link keeps them."""
+    with get_db_connection() as conn:
+        conn.execute("INSERT INTO customers (name) VALUES ('Quote Customer')")
+        customer_id = conn.execute('SELECT MAX(id) FROM customers').fetchone()[0]
+        conn.executemany('INSERT INTO quotes (customer_id, total_amount, status, created_at) VALUES (?, ?, ?, ?)',
+                         [(customer_id, 100.0 + i, 'sent' if i % 2 else 'draft', f'2024-05-{i + 1:02d} 09:00:00')
+                          for i in range(10)])
+    _login(test_client)
+
+    response = test_client.get('/quotes?status=sent&date_from=2024-05-01&date_to=2024-05-08&per_page=2')
+    html = response.get_data(as_text=True)
+    assert response.status_code == 200
+    # Sent quotes in range are days 2, 4, 6 and 8; newest first, two per page
+    assert re.findall(r'<td>(2024-05-\d\d)</td>', html) == ['2024-05-08', '2024-05-06']
+    next_url = re.search(r'href="([^"]*cursor=[^"]*)"', html).group(1).replace('&amp;', '&')
+    assert 'status=sent' in next_url and 'date_to=2024-05-08' in next_url
+
+    html = test_client.get(next_url).get_data(as_text=True)
+    assert re.findall(r'<td>(2024-05-\d\d)</td>', html) == ['2024-05-04', '2024-05-02']
+    assert 'Next' not in html
+
+    crafted = encode_cursor([['2024-05-04'], {'id': 1}])
+    for url in ('/quotes', '/inventory', '/customers'):
+        assert test_client.get(f'{url}?cursor={crafted}').status_code == 400
+    assert test_client.get(f'/api/jobs?cursor={encode_cursor([[1], 2, 3])}').status_code == 400
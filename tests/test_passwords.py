@@ -0,0 +1,30 @@
+from werkzeug.security import generate_password_hash
+from models.user import User
+from services.passwords import PasswordHasher, password_hasher
+
+def test_needs_rehash_tracks_configured_cost():
+    """Test that hashes made with a different cost or salt length are flagged for upgrade."""
+    hasher = PasswordHasher(method='pbkdf2:sha256:1000', salt_length=16, workers=1)
+    assert not hasher.needs_rehash(hasher.hash('secret'))
+    assert hasher.verify(hasher.hash('secret'), 'secret')
+    assert hasher.needs_rehash(generate_password_hash('secret', 'pbkdf2:sha256:2000', 16))
+    assert hasher.needs_rehash(generate_password_hash('secret', 'pbkdf2:sha256:1000', 8))
+    assert hasher.metrics()['hash_ms']['count'] == 3
+    for method in ('pbkdf2', 'pbkdf2:sha512', 'scrypt', 'scrypt:16384:8:1'):
+        assert PasswordHasher(method=method).canonical_method == generate_password_hash('x', method).split('$')[0]
+
+def test_login_upgrades_legacy_hash(test_client):
+    """Test that a successful login transparently rehashes with the configured method."""
+    test_client.post('/signup', data={'email': 'legacy@example.com', 'password': 'pw'})
+    user = User.find_by_email('legacy@example.com')
+    User.set_password(user.id, generate_password_hash('pw', 'pbkdf2:sha256:1000'))
+    before = password_hasher.metrics()['counters']
+
+    response = test_client.post('/login', data={'email': 'legacy@example.com', 'password': 'pw'})
+    assert response.status_code == 302
+    stored = User.find_by_email('legacy@example.com').password
+    assert stored.startswith(password_hasher.canonical_method + '$')
+
+    counters = password_hasher.metrics()['counters']
+    assert counters['rehashed'] == before['rehashed'] + 1
+    assert counters['login_success'] == before['login_success'] + 1
@@ -0,0 +1,37 @@
+from models.query_log import QueryLog, normalize_sql, query_log
+from models.user import User
+
+def test_normalize_sql_collapses_literals():
+    """Test that literal values and whitespace do not split one query shape."""
+    assert normalize_sql("SELECT *  FROM jobs\n WHERE id = 42 AND status = 'done'") == \
+        normalize_sql("SELECT * FROM jobs WHERE id = 7 AND status = 'open'")
+    assert normalize_sql('SELECT * FROM jobs WHERE id IN (?, ?, ?)') == 'SELECT * FROM jobs WHERE id IN (?, ...)'
+
+def test_slow_statement_captures_plan():
+    """Test that statements over the threshold are counted and explained."""
+    log = QueryLog(threshold_ms=5)
+    log.record('SELECT 1', 1.0, explain=lambda: ['never called'])
+    log.record('SELECT 1', 12.0, explain=lambda: ['SCAN jobs'])
+
+    [stats] = log.top()
+    assert stats['count'] == 2
+    assert stats['slow_count'] == 1
+    assert stats['last_plan'] == ['SCAN jobs']
+    assert stats['p50_ms'] == 1
+
+def test_slow_queries_endpoint_is_admin_only(test_client):
+    """Test that only admins can read the slow-query report."""
+    test_client.post('/signup', data={'email': 'dba@example.com', 'password': 'password'})
+    test_client.post('/login', data={'email': 'dba@example.com', 'password': 'password'})
+    assert test_client.get('/admin/slow-queries').status_code == 403
+
+    # Role changes go through User so the cached session user is invalidated
+    User.set_role(User.find_by_email('dba@example.com').id, 'admin')
+    query_log.record('SELECT * FROM parts ORDER BY name', 3.0)
+
+    response = test_client.get('/admin/slow-queries?limit=200&order_by=count')
+    assert response.status_code == 200
+    assert response.json['threshold_ms'] > 0
+    assert any('FROM parts' in row['sql'] for row in response.json['statements'])
+    # Zero or negative limits still return the slowest statement rather than slicing from the end
+    assert len(test_client.get('/admin/slow-queries?limit=-1').json['statements']) == 1
@@ -0,0 +1,12 @@
+from models.database import find_full_scans, QUERY_REGISTRY
+
+def test_hot_queries_use_indexes(test_app):
+    """Test that no registered hot query falls back to a full table scan."""
+    assert QUERY_REGISTRY
+    assert find_full_scans() == {}
+
+def test_check_query_plans_command(runner):
+    """Test the CLI check reports success."""
+    result = runner.invoke(args=['check-query-plans'])
+    assert result.exit_code == 0
+    assert 'registered queries use indexes' in result.output
@@ -0,0 +1,35 @@
+from datetime import datetime
+from models.database import get_db_connection, rebuild_daily_job_stats
+from models.scheduler import HVACScheduler
+
+def _rollup(conn):
+    rows = conn.execute('SELECT day, job_type, completed_jobs, revenue FROM daily_job_stats '
+                        'WHERE completed_jobs != 0 ORDER BY day, job_type').fetchall()
+    return [tuple(row) for row in rows]
+
+def test_triggers_match_full_rebuild(test_app):
+    """Test that incremental trigger maintenance agrees with a from-scratch rebuild."""
+    now = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    with get_db_connection() as conn:
+        conn.executemany(
+            "INSERT INTO jobs (customer_id, job_type, status, completed_at, job_value) VALUES (1, ?, ?, ?, ?)",
+            [('repair', 'completed', now, 400.0), ('repair', 'completed', now, 100.0),
+             ('maintenance', 'scheduled', None, 150.0), ('installation', 'completed', '2024-03-01 10:00:00', 5000.0)])
+        # Complete a scheduled job, re-price one, and delete another
+        conn.execute("UPDATE jobs SET status = 'completed', completed_at = ? WHERE job_type = 'maintenance'", (now,))
+        conn.execute("UPDATE jobs SET job_value = 450.0 WHERE job_value = 400.0")
+        conn.execute("DELETE FROM jobs WHERE job_type = 'installation'")
+
+        incremental = _rollup(conn)
+        rebuild_daily_job_stats(conn.cursor())
+        assert _rollup(conn) == incremental
+
+    scheduler = HVACScheduler()
+    assert scheduler.get_revenue_for_current_week() == 700.0
+    assert scheduler.get_open_invoice_count() == 3
+
+def test_rebuild_rollups_command(runner):
+    """Test the backfill command."""
+    result = runner.invoke(args=['rebuild-rollups'])
+    assert result.exit_code == 0
+    assert 'Rebuilt daily_job_stats' in result.output
@@ -0,0 +1,79 @@
+import time
+from datetime import date
+
+import numpy as np
+
+from models.availability import parse_hhmm
+from models.database import get_db_connection
+from services.route_optimizer import optimise_day, optimise_route, route_matrix
+
+def test_zig_zag_route_is_shortened_within_windows(test_app):
+    """Test that a zig-zag day is re-sequenced shorter while a morning-only job stays in the morning."""
+    day = date(2031, 3, 3)
+    with get_db_connection() as conn:
+        conn.execute("INSERT INTO technicians (name, skills, availability) VALUES ('Route Tech', '[]', '{}')")
+        tech_id = conn.execute('SELECT MAX(id) FROM technicians').fetchone()[0]
+        # Stops along a line, booked far-near-far so the driver crosses town repeatedly
+        for k, lon in enumerate((-71.60, -71.40, -71.58, -71.42, -71.56)):
+            preferred = '["morning"]' if k == 4 else '[]'
+            conn.execute("INSERT INTO customers (name, preferred_time, lat, lon) VALUES (?, ?, 42.8, ?)",
+                         (f'Route Customer {k}', preferred, lon))
+            customer_id = conn.execute('SELECT MAX(id) FROM customers').fetchone()[0]
+            conn.execute("INSERT INTO jobs (customer_id, technician_id, job_type, status, scheduled_date, "
+                         "scheduled_time, duration_minutes) VALUES (?, ?, 'maintenance', 'scheduled', ?, ?, 60)",
+                         (customer_id, tech_id, day.isoformat(), f'{8 + 2 * k:02d}:00'))
+        # Assigned but not yet given a time: left alone
+        conn.execute("INSERT INTO jobs (customer_id, technician_id, job_type, status, scheduled_date) "
+                     "VALUES (?, ?, 'maintenance', 'scheduled', ?)", (customer_id, tech_id, day.isoformat()))
+
+    result = optimise_day(day, {'start': 8, 'end': 18})
+    route = result['technicians'][tech_id]
+    assert route['optimised'] and route['km'] < route['km_before']
+
+    with get_db_connection() as conn:
+        rows = conn.execute("SELECT j.scheduled_time, c.preferred_time FROM jobs j "
+                            "JOIN customers c ON c.id = j.customer_id "
+                            "WHERE j.technician_id = ? AND j.scheduled_time IS NOT NULL",
+                            (tech_id,)).fetchall()
+    starts = sorted(parse_hhmm(row['scheduled_time']) for row in rows)
+    assert all(b - a >= 60 for a, b in zip(starts, starts[1:]))
+    assert all(parse_hhmm(row['scheduled_time']) < 12 * 60 for row in rows if row['preferred_time'] == '["morning"]')
+
+def test_fifty_technician_day_optimises_quickly():
+    """Test that 50 routes of 8 stops each solve well inside a second."""
+    rng = np.random.default_rng(7)
+    service, windows = [60] * 8, [(480, 1080)] * 8
+    start = time.perf_counter()
+    for _ in range(50):
+        distances = route_matrix(42.8 + rng.normal(0, 0.03, 8), -71.5 + rng.normal(0, 0.04, 8))
+        assert optimise_route(distances, service, windows, 480, 1080) is not None
+    assert time.perf_counter() - start < 1.0
+
+def test_routes_go_around_blocks_and_running_jobs(test_app):
+    """Test that re-sequencing never lands a job in a sick-call block or on a job already under way."""
+    day = date(2031, 3, 10)
+    with get_db_connection() as conn:
+        conn.execute("INSERT INTO technicians (name, skills, availability) VALUES ('Blocked Route Tech', '[]', '{}')")
+        tech_id = conn.execute('SELECT MAX(id) FROM technicians').fetchone()[0]
+        for k, lon in enumerate((-71.60, -71.40, -71.58, -71.42)):
+            conn.execute("INSERT INTO customers (name, lat, lon) VALUES (?, 42.8, ?)", (f'Blocked Customer {k}', lon))
+            customer_id = conn.execute('SELECT MAX(id) FROM customers').fetchone()[0]
+            conn.execute("INSERT INTO jobs (customer_id, technician_id, job_type, status, scheduled_date, "
+                         "scheduled_time, duration_minutes) VALUES (?, ?, 'maintenance', 'scheduled', ?, ?, 60)",
+                         (customer_id, tech_id, day.isoformat(), f'{8 + 2 * k:02d}:00'))
+        conn.execute("INSERT INTO jobs (customer_id, technician_id, job_type, status, scheduled_date, "
+                     "scheduled_time, duration_minutes) VALUES (?, ?, 'repair', 'in_progress', ?, '13:00', 60)",
+                     (customer_id, tech_id, day.isoformat()))
+        conn.execute("INSERT INTO technician_unavailability (technician_id, day, start_time, end_time, reason) "
+                     "VALUES (?, ?, '09:00', '11:00', 'sick')", (tech_id, day.isoformat()))
+
+    result = optimise_day(day, {'start': 8, 'end': 18})
+    assert result['technicians'][tech_id]['optimised']
+
+    with get_db_connection() as conn:
+        starts = [parse_hhmm(row[0]) for row in conn.execute(
+            "SELECT scheduled_time FROM jobs WHERE technician_id = ? AND status = 'scheduled'", (tech_id,))]
+    assert len(starts) == 4
+    for start in starts:
+        assert not (start < 11 * 60 and 9 * 60 < start + 60)
+        assert not (start < 14 * 60 and 13 * 60 < start + 60)
@@ -0,0 +1,64 @@
+import json
+from datetime import datetime, timedelta
+from models.availability import schedule_book
+from models.database import get_db_connection
+from models.scheduler import HVACScheduler
+
+WEEK = json.dumps({d: ['08:00', '17:00'] for d in ('mon', 'tue', 'wed', 'thu', 'fri', 'sat', 'sun')})
+
+def _book(conn, customer_id, technician_id, day, start, skills=None):
+    conn.execute("INSERT INTO jobs (customer_id, technician_id, job_type, status, scheduled_date, scheduled_time, "
+                 "duration_minutes, priority, required_skills) VALUES (?, ?, 'repair', 'scheduled', ?, ?, 120, 3, ?)",
+                 (customer_id, technician_id, day, start, json.dumps(skills) if skills else None))
+    return conn.execute('SELECT MAX(id) FROM jobs').fetchone()[0]
+
+def test_sick_call_moves_only_overlapping_jobs(test_app):
+    """Test that a morning block re-homes only the morning jobs, near their old time, to qualified technicians."""
+    schedule_book.invalidate()
+    day = datetime.now().date() + timedelta(days=1)
+    with get_db_connection() as conn:
+        conn.execute('UPDATE technicians SET active = 0')
+        conn.executemany("INSERT INTO technicians (name, skills, availability) VALUES (?, ?, ?)",
+                         [('Sick Tech', '["boiler"]', WEEK), ('Boiler Cover', '["boiler"]', WEEK),
+                          ('General Cover', '[]', WEEK)])
+        sick, boiler, general = [row[0] for row in conn.execute(
+            "SELECT id FROM technicians WHERE active = 1 ORDER BY id")]
+        conn.execute("INSERT INTO customers (name, preferred_time) VALUES ('Repair Customer', '[]')")
+        customer_id = conn.execute('SELECT MAX(id) FROM customers').fetchone()[0]
+        boiler_job = _book(conn, customer_id, sick, day.isoformat(), '09:00', ['boiler'])
+        plain_job = _book(conn, customer_id, sick, day.isoformat(), '11:00')
+        afternoon_job = _book(conn, customer_id, sick, day.isoformat(), '14:00')
+        other_job = _book(conn, customer_id, boiler, day.isoformat(), '08:00')
+
+    scheduler = HVACScheduler()
+    # Warm the cache the way live bookings do, so the repair edits it in place
+    scheduler.find_open_windows(day, 'repair')
+    result = scheduler.mark_unavailable(sick, day, '08:00', '12:00', reason='sick')
+    assert result['unplaced'] == []
+    moved = {job['id']: job for job in result['moved']}
+    assert set(moved) == {boiler_job, plain_job}
+    assert (moved[boiler_job]['technician_id'], moved[boiler_job]['scheduled_time']) == (boiler, '10:00')
+    assert (moved[plain_job]['technician_id'], moved[plain_job]['scheduled_time']) == (general, '11:00')
+
+    with get_db_connection() as conn:
+        rows = {row['id']: (row['technician_id'], row['scheduled_time']) for row in conn.execute(
+            'SELECT id, technician_id, scheduled_time FROM jobs WHERE id IN (?, ?)', (afternoon_job, other_job))}
+    assert rows == {afternoon_job: (sick, '14:00'), other_job: (boiler, '08:00')}
+    # The block holds for later bookings too
+    assert all(w['technician_id'] != sick for w in scheduler.find_open_windows(day, 'repair', n=20)
+               if w['scheduled_time'] < '12:00')
+
+def test_job_nobody_can_take_is_unplaced(test_app):
+    """Test that a job with no qualified cover loses its technician instead of failing the repair."""
+    schedule_book.invalidate()
+    day = datetime.now().date() + timedelta(days=2)
+    with get_db_connection() as conn:
+        sick = conn.execute("SELECT id FROM technicians WHERE name = 'Sick Tech'").fetchone()[0]
+        customer_id = conn.execute("SELECT id FROM customers WHERE name = 'Repair Customer'").fetchone()[0]
+        job_id = _book(conn, customer_id, sick, day.isoformat(), '09:00', ['refrigeration'])
+
+    result = HVACScheduler().mark_unavailable(sick, day)
+    assert [job['id'] for job in result['unplaced']] == [job_id] and result['moved'] == []
+    assert result['elapsed_ms'] < 100
+    with get_db_connection() as conn:
+        assert conn.execute('SELECT technician_id FROM jobs WHERE id = ?', (job_id,)).fetchone()[0] is None
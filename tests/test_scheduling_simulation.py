@@ -0,0 +1,23 @@
+from datetime import date, timedelta
+from benchmarks.scheduling import _requests, run, synthetic_stream
+
+def test_synthetic_stream_is_reproducible():
+    """Test that a seed fixes the stream and requests ask for their arrival day plus lead."""
+    stream = synthetic_stream([1, 2, 3], days=3, per_day=10, seed=5)
+    assert stream == synthetic_stream([1, 2, 3], days=3, per_day=10, seed=5)
+    assert all(item['lead'] == 0 for item in stream if item['priority'] <= 2)
+
+    start = date(2030, 1, 7)
+    days = _requests(stream, start)
+    assert sum(len(requests) for requests in days) == len(stream)
+    first = stream[0]
+    assert days[first['day']][0]['preferred_date'] == (start + timedelta(days=first['day'] + first['lead'])).isoformat()
+
+def test_strategies_run_side_by_side():
+    """Test that each strategy replays the same stream in its own process and reports every metric."""
+    results = run(['sequential', 'batch'], size='tiny', days=2, per_day=12)
+    assert set(results) == {'sequential', 'batch'}
+    assert results['sequential']['requests'] == results['batch']['requests'] > 0
+    for metrics in results.values():
+        assert metrics['placed'] + metrics['unplaced'] == metrics['requests']
+        assert 0 < metrics['utilisation'] <= 1 and metrics['drive_minutes'] >= 0
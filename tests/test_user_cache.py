@@ -0,0 +1,36 @@
+from models.cache import TTLCache
+from models.query_log import query_log
+from models.user import User, user_cache
+
+def test_ttl_cache_expiry_and_bound():
+    """Test that entries expire after the TTL and the least recently used is evicted."""
+    now = [0.0]
+    cache = TTLCache(max_size=2, ttl=10, clock=lambda: now[0])
+    cache.set('a', 1)
+    cache.set('b', 2)
+    assert cache.get('a') == 1
+    cache.set('c', 3)  # evicts 'b', the least recently used
+    assert cache.get('b') is None
+    now[0] = 11
+    assert cache.get('a') is None
+    assert cache.stats['evictions'] == 1
+
+def test_session_user_cached_and_invalidated(test_client):
+    """Test that authenticated requests reuse the cached user and role or status changes take effect at once."""
+    test_client.post('/signup', data={'email': 'cached@example.com', 'password': 'pw'})
+    test_client.post('/login', data={'email': 'cached@example.com', 'password': 'pw'})
+    user_id = User.find_by_email('cached@example.com').id
+
+    user = User.get(user_id)
+    assert user.password is None
+    before = query_log.total_statements
+    assert User.get(str(user_id)) is user
+    assert query_log.total_statements == before
+
+    assert test_client.get('/admin/slow-queries').status_code == 403
+    User.set_role(user_id, 'admin')
+    assert user_id not in user_cache._entries
+    assert test_client.get('/admin/slow-queries').status_code == 200
+
+    User.set_active(user_id, False)
+    assert test_client.get('/admin/slow-queries').status_code == 302